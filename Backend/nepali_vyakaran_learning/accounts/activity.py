@@ -0,0 +1,198 @@
+"""
+Activity event pipeline.
+
+ActivityLog.log_activity() hands events to this module instead of inserting
+a row inside the request. With settings.ACTIVITY_LOG_ASYNC on, events are
+queued in process (once the surrounding transaction commits) and written
+with bulk_create by a background thread whenever ACTIVITY_LOG_BATCH_SIZE
+events are waiting or ACTIVITY_LOG_FLUSH_INTERVAL seconds have passed. An
+atexit hook flushes what is left when the worker shuts down.
+
+With ACTIVITY_LOG_ASYNC off (as in tests, see TEST_RUNNER), each
+event is written immediately, as before.
+
+Only raw request headers are captured on the request path; the client IP
+is parsed and the user agent interned (see user_agents.py) when the batch
+is built.
+"""
+
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import user_agents
+
+
+logger = logging.getLogger(__name__)
+
+# Batches that failed this many times are dropped
+MAX_FLUSH_ATTEMPTS = 3
+
+
+def request_meta(request):
+    """The request headers an activity row needs, captured as raw strings."""
+    if request is None:
+        return {}
+    return {
+        'forwarded_for': request.META.get('HTTP_X_FORWARDED_FOR', ''),
+        'remote_addr': request.META.get('REMOTE_ADDR'),
+        'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+    }
+
+
+def client_ip(meta):
+    """First X-Forwarded-For hop, else REMOTE_ADDR."""
+    forwarded_for = meta.get('forwarded_for')
+    if forwarded_for:
+        return forwarded_for.split(',')[0].strip() or None
+    return meta.get('remote_addr')
+
+
+def build_rows(events):
+    """Turn queued events into unsaved ActivityLog rows."""
+    from .models import ActivityLog
+
+    return [
+        ActivityLog(
+            user_id=event['user_id'],
+            activity_type=event['activity_type'],
+            description=event['description'],
+            metadata=event['metadata'],
+            ip_address=client_ip(event['meta']),
+            user_agent_id=user_agents.intern(event['meta'].get('user_agent')),
+            created_at=event['created_at'],
+        )
+        for event in events
+    ]
+
+
+def write(events):
+    """
+    Insert a list of events in one bulk_create and fold them into the daily
+    rollups and the analytics cube.
+    """
+    from . import activity_rollups, analytics
+    from .models import ActivityLog
+
+    rows = build_rows(events)
+    with transaction.atomic():
+        ActivityLog.objects.bulk_create(rows)
+        new_days = activity_rollups.record(rows)
+        analytics.record_activity(rows, new_days)
+    return rows
+
+
+class ActivityWriter:
+    """
+    In-process queue of activity events with a background flush thread.
+    """
+
+    def __init__(self, batch_size, flush_interval):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def enqueue(self, event):
+        self._ensure_thread()
+        self._queue.append(event)
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        # Threads don't survive fork, so each worker process starts its own
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass  # Already logged; the batch is retried on the next round
+
+    def flush(self):
+        """Write everything queued so far, batch_size rows at a time."""
+        with self._flush_lock:
+            close_old_connections()
+            try:
+                while self._queue:
+                    batch = []
+                    while self._queue and len(batch) < self.batch_size:
+                        batch.append(self._queue.popleft())
+                    self._write(batch)
+            finally:
+                close_old_connections()
+
+    def _write(self, batch):
+        try:
+            write(batch)
+        except Exception:
+            retry = [event for event in batch if event.setdefault('attempts', 0) + 1 < MAX_FLUSH_ATTEMPTS]
+            for event in retry:
+                event['attempts'] += 1
+            logger.exception('Activity log flush failed (%d events, %d kept for retry)', len(batch), len(retry))
+            self._queue.extendleft(reversed(retry))
+            raise
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Return the process-wide writer, created on first use."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ActivityWriter(
+                    settings.ACTIVITY_LOG_BATCH_SIZE, settings.ACTIVITY_LOG_FLUSH_INTERVAL
+                )
+                atexit.register(flush)
+    return _writer
+
+
+def flush():
+    """Write out queued events now (no-op in synchronous mode)."""
+    if _writer is not None:
+        try:
+            _writer.flush()
+        except Exception:
+            pass  # Already logged; remaining events stay queued
+
+
+def log(user, activity_type, description='', metadata=None, request=None):
+    """
+    Record one activity event. Queued for the background writer in async
+    mode, written immediately otherwise. Returns None either way, so callers
+    behave the same in both modes.
+    """
+    event = {
+        'user_id': user.pk,
+        'activity_type': activity_type,
+        'description': description,
+        'metadata': metadata or {},
+        'meta': request_meta(request),
+        'created_at': timezone.now(),
+    }
+
+    if not settings.ACTIVITY_LOG_ASYNC:
+        write([event])
+        return
+    # Events of a rolled-back transaction are dropped, as their rows would be
+    transaction.on_commit(lambda: get_writer().enqueue(event))
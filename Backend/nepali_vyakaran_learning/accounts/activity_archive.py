@@ -0,0 +1,157 @@
+"""
+Monthly archival of ActivityLog rows.
+
+ActivityLog is append-only and only recent rows are read by the app, so
+rows of whole calendar months older than the retention window are moved
+out of the table: each month is written to a gzipped NDJSON file under
+settings.ACTIVITY_LOG_ARCHIVE_DIR (activity_log-YYYY-MM[.N].ndjson.gz) and
+then deleted in small batches, each in its own short transaction, so
+SQLite is never locked for long.
+
+Rows are written and deleted in id order. Ids only grow (AUTOINCREMENT),
+so each archive file holds every row of its month up to its last id, and
+the last id of a month's newest file marks how far the month is archived.
+Only rows up to that mark are deleted, a batch of ids at a time. Archiving
+is idempotent: a run interrupted between writing a file and deleting its
+rows skips the archived rows and finishes the deletes next time, and rows
+added to the month after its file was written go to the next file.
+Memory stays bounded by the batch size whatever the size of the month.
+"""
+
+import datetime
+import gzip
+import json
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ActivityLog
+
+
+ARCHIVE_FIELDS = ['id', 'user_id', 'activity_type', 'description', 'metadata',
+                  'ip_address', 'created_at']
+
+
+def month_bounds(month):
+    """Aware [start, end) datetimes of the month containing `month` (a date)."""
+    start = month.replace(day=1)
+    end = (start + datetime.timedelta(days=32)).replace(day=1)
+    return (
+        timezone.make_aware(datetime.datetime.combine(start, datetime.time.min)),
+        timezone.make_aware(datetime.datetime.combine(end, datetime.time.min)),
+    )
+
+
+def archive_dir():
+    return Path(settings.ACTIVITY_LOG_ARCHIVE_DIR)
+
+
+def archive_files(month):
+    """Existing archive files of a month, in write order."""
+    def part(path):
+        # activity_log-YYYY-MM.ndjson.gz is part 0, then .1, .2, ...
+        suffix = path.name[len(f'activity_log-{month:%Y-%m}'):-len('.ndjson.gz')]
+        return int(suffix[1:] or 0)
+
+    return sorted(archive_dir().glob(f'activity_log-{month:%Y-%m}*.ndjson.gz'), key=part)
+
+
+def archived_through(month):
+    """Last id written to the month's archive files, or 0 if none were written."""
+    files = archive_files(month)
+    if not files:
+        return 0
+    last = None
+    with gzip.open(files[-1], 'rt', encoding='utf-8') as archive:
+        for last in archive:
+            pass
+    return json.loads(last)['id'] if last else 0
+
+
+def iter_rows(queryset, batch_size=1000):
+    """Yield the queryset's rows as archive dicts in id order, a batch at a time."""
+    last = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last).order_by('id').values(
+            *ARCHIVE_FIELDS, user_agent_string=F('user_agent__user_agent')
+        )[:batch_size])
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        last = batch[-1]['id']
+
+
+def write_archive(month, rows):
+    """
+    Write rows (dicts of ARCHIVE_FIELDS plus user_agent_string) to a new
+    archive file for the month. The file is written under a temporary name
+    and renamed when complete.
+    Returns (path, last id written), or (None, None) if there were no rows.
+    """
+    directory = archive_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    part = len(archive_files(month))
+    suffix = f'.{part}' if part else ''
+    path = directory / f'activity_log-{month:%Y-%m}{suffix}.ndjson.gz'
+    partial = path.with_name(path.name + '.partial')
+
+    last = None
+    with gzip.open(partial, 'wt', encoding='utf-8') as archive:
+        for row in rows:
+            archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+            last = row['id']
+    if last is None:
+        partial.unlink()
+        return None, None
+    os.replace(partial, path)
+    return path, last
+
+
+def delete_in_batches(queryset, batch_size=1000, pause=0.0):
+    """
+    Delete the queryset's rows by id range, a batch at a time, each batch in
+    its own transaction. Returns the number deleted.
+    """
+    deleted, last = 0, 0
+    while True:
+        ids = list(queryset.filter(id__gt=last).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            count, _ = queryset.filter(id__gte=ids[0], id__lte=ids[-1]).delete()
+        deleted, last = deleted + count, ids[-1]
+        if pause:
+            time.sleep(pause)
+
+
+def archive_month(month, batch_size=1000, pause=0.0, write=True):
+    """
+    Move one month's rows out of ActivityLog. With write=False the rows are
+    deleted without being archived. Returns (archive path or None, rows deleted).
+    """
+    start, end = month_bounds(month)
+    rows = ActivityLog.objects.filter(created_at__gte=start, created_at__lt=end)
+
+    path = None
+    if write:
+        through = archived_through(month)
+        path, last = write_archive(month, iter_rows(rows.filter(id__gt=through), batch_size))
+        # Rows added after the file was written are left for the next one
+        rows = rows.filter(id__lte=last or through)
+
+    return path, delete_in_batches(rows, batch_size, pause)
+
+
+def read_archive(month):
+    """Yield the archived rows of a month as dicts, for restores and audits."""
+    for path in archive_files(month):
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            for line in archive:
+                yield json.loads(line)
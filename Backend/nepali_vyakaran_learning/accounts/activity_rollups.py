@@ -0,0 +1,154 @@
+"""
+Daily per-user activity rollups.
+
+Every written batch of ActivityLog rows is folded into one DailyActivity
+row per (user, local day), holding the day's total and a count per activity
+type. Days are the user's local days, as for streaks. Progress and history
+views read these rows instead of grouping the raw log, so a year of
+progress is at most 365 small rows, and the rollups outlive the raw rows
+moved out by activity_archive.py.
+
+Rows are merged with a compare-and-swap on `total`, which grows with every
+change. `manage.py rebuild_activity_rollups` recomputes rollups (and the
+active user sketches built from them) from the raw log and can be re-run
+safely.
+"""
+
+import datetime
+import logging
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import analytics, streaks
+from .models import ActivityLog, DailyActivity, UserSettings
+
+
+logger = logging.getLogger(__name__)
+
+# Compare-and-swap attempts per row before giving up
+CAS_RETRIES = 5
+
+
+def record(rows):
+    """
+    Fold newly written ActivityLog rows into their daily rollups. Returns the
+    (user_id, day) pairs whose rollup row was created, i.e. the users active
+    for the first time that day.
+    """
+    changes = defaultdict(Counter)
+    for row in rows:
+        day = timezone.localdate(row.created_at, streaks.user_timezone(row.user_id))
+        changes[(row.user_id, day)][row.activity_type] += 1
+
+    return [user_day for user_day, counts in changes.items() if _merge(*user_day, counts)]
+
+
+def _merge(user_id, day, counts):
+    """Add counts to the user's rollup for the day; returns True if the row was created."""
+    added = sum(counts.values())
+    rollups = DailyActivity.objects.filter(user_id=user_id, day=day)
+
+    for _ in range(CAS_RETRIES):
+        current = rollups.values('total', 'counts').first()
+        if current is None:
+            try:
+                with transaction.atomic():
+                    DailyActivity.objects.create(user_id=user_id, day=day, total=added, counts=dict(counts))
+                return True
+            except IntegrityError:
+                continue  # Created concurrently; merge into it
+
+        merged = Counter(current['counts'])
+        merged.update(counts)
+        if rollups.filter(total=current['total']).update(total=current['total'] + added, counts=dict(merged)):
+            return False
+
+    logger.warning('Could not merge activity rollup for user %s on %s', user_id, day)
+    return False
+
+
+# =============================================================================
+# REBUILD
+# =============================================================================
+
+def _timezone_groups(logs):
+    """
+    Yield (tzinfo, logs of the users in that time zone) pairs covering every
+    user once. Users are selected with subqueries on UserSettings rather than
+    id lists, which could exceed SQLite's parameter limit.
+    """
+    custom = UserSettings.objects.exclude(timezone='')
+    yield timezone.get_default_timezone(), logs.exclude(user_id__in=custom.values('user_id'))
+
+    names = custom.order_by().values_list('timezone', flat=True).distinct()
+    for name in names:
+        users = UserSettings.objects.filter(timezone=name).values('user_id')
+        yield streaks.get_timezone(name), logs.filter(user_id__in=users)
+
+
+@transaction.atomic
+def rebuild(since):
+    """
+    Recompute the rollups of every day from `since` (a date) on from the raw
+    log, then the active user sketches of those days. Returns the number of
+    rollup rows written.
+    """
+    rows = defaultdict(Counter)
+    # A day's rows may start up to a day earlier in UTC, depending on time zone
+    logs = ActivityLog.objects.filter(
+        created_at__gte=timezone.make_aware(datetime.datetime.combine(since, datetime.time.min))
+        - datetime.timedelta(days=1)
+    )
+
+    for tzinfo, group in _timezone_groups(logs):
+        counts = group.annotate(day=TruncDate('created_at', tzinfo=tzinfo)).values(
+            'user_id', 'day', 'activity_type'
+        ).annotate(n=Count('id')).order_by()
+
+        for row in counts.iterator():
+            if row['day'] >= since:
+                rows[(row['user_id'], row['day'])][row['activity_type']] = row['n']
+
+    DailyActivity.objects.filter(day__gte=since).delete()
+    DailyActivity.objects.bulk_create([
+        DailyActivity(user_id=user_id, day=day, total=sum(counts.values()), counts=dict(counts))
+        for (user_id, day), counts in rows.items()
+    ], batch_size=2000)
+    analytics.rebuild_sketches(since)
+    return len(rows)
+
+
+# =============================================================================
+# READS
+# =============================================================================
+
+def daily(user, since):
+    """[(day, total)] for the user's active days from `since` on, oldest first."""
+    return list(
+        DailyActivity.objects.filter(user=user, day__gte=since).order_by('day').values_list('day', 'total')
+    )
+
+
+def weekly(days):
+    """Sum (day, total) pairs into [(week start, total)] (weeks start on Monday)."""
+    weeks = Counter()
+    for day, total in days:
+        weeks[day - datetime.timedelta(days=day.weekday())] += total
+    return sorted(weeks.items())
+
+
+def monthly(days):
+    """Sum (day, total) pairs into [(first day of month, total)]."""
+    months = Counter()
+    for day, total in days:
+        months[day.replace(day=1)] += total
+    return sorted(months.items())
+
+
+def active_days(user):
+    """Number of days the user has been active on."""
+    return DailyActivity.objects.filter(user=user).count()
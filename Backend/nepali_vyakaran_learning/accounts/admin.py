@@ -6,7 +6,10 @@ Customized admin panel for user management.
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.utils.html import format_html
-from .models import CustomUser, GameState, UserSettings, OTPVerification, ActivityLog
+
+from learning_vyakaran import economy, leaderboards
+
+from .models import CustomUser, GameState, UserSettings, OTPVerification, ActivityLog, UserAgent, DailyActivity, PlatformDailyStat, ActiveUserSketch, Job
 
 
 # =============================================================================
@@ -22,6 +25,12 @@ admin.site.index_title = "Welcome to Nepali Vyakaran Learning Administration"
 # INLINE ADMIN CLASSES
 # =============================================================================
 
+def _record_game_state_changes(form):
+    """Mirror admin edits of points, level or streak onto the leaderboards."""
+    if set(form.changed_data) & set(leaderboards.GAME_STATE_FIELDS.values()):
+        leaderboards.record_game_state(form.instance.user_id)
+
+
 class GameStateInline(admin.StackedInline):
     """Inline admin for GameState."""
     model = GameState
@@ -33,7 +42,7 @@ class GameStateInline(admin.StackedInline):
             'fields': ('level', 'points', 'coins', 'experience', 'experience_to_next_level')
         }),
         ('Streak', {
-            'fields': ('current_streak', 'longest_streak', 'last_activity_date')
+            'fields': ('current_streak', 'longest_streak', 'last_activity_date', 'streak_milestone')
         }),
         ('Progress', {
             'fields': ('total_correct_answers', 'total_questions_attempted', 'total_time_spent', 'accuracy')
@@ -52,7 +61,7 @@ class UserSettingsInline(admin.StackedInline):
     verbose_name_plural = 'Settings'
     fieldsets = (
         ('Display', {
-            'fields': ('language', 'theme', 'difficulty', 'daily_goal_minutes')
+            'fields': ('language', 'theme', 'difficulty', 'daily_goal_minutes', 'timezone')
         }),
         ('Audio/Visual', {
             'fields': ('sound_enabled', 'music_enabled', 'animations_enabled')
@@ -101,6 +110,12 @@ class CustomUserAdmin(UserAdmin):
     
     actions = ['activate_users', 'deactivate_users', 'verify_emails']
     
+    def save_formset(self, request, form, formset, change):
+        super().save_formset(request, form, formset, change)
+        if formset.model is GameState:
+            for inline_form in formset.forms:
+                _record_game_state_changes(inline_form)
+    
     def get_avatar(self, obj):
         if obj.avatar:
             return format_html('<img src="{}" width="30" height="30" style="border-radius: 50%;" />', obj.avatar.url)
@@ -135,7 +150,7 @@ class GameStateAdmin(admin.ModelAdmin):
     fieldsets = (
         ('User', {'fields': ('user',)}),
         ('Core Metrics', {'fields': ('level', 'points', 'coins', 'experience', 'experience_to_next_level')}),
-        ('Streak', {'fields': ('current_streak', 'longest_streak', 'last_activity_date')}),
+        ('Streak', {'fields': ('current_streak', 'longest_streak', 'last_activity_date', 'streak_milestone')}),
         ('Progress', {'fields': ('total_correct_answers', 'total_questions_attempted', 'total_time_spent', 'accuracy')}),
         ('Data', {'fields': ('unlocked_zones', 'completed_lessons', 'achievements', 'badges'), 'classes': ('collapse',)}),
         ('Timestamps', {'fields': ('created_at', 'updated_at')}),
@@ -143,23 +158,28 @@ class GameStateAdmin(admin.ModelAdmin):
     
     actions = ['reset_streak', 'add_bonus_points', 'add_bonus_coins']
     
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        _record_game_state_changes(form)
+    
     @admin.action(description='Reset streak for selected users')
     def reset_streak(self, request, queryset):
-        count = queryset.update(current_streak=0)
+        user_ids = list(queryset.values_list('user_id', flat=True))
+        count = queryset.update(current_streak=0, streak_milestone=0)
+        for user_id in user_ids:
+            leaderboards.record(user_id, 'streak', 0, mode='set')
         self.message_user(request, f'Streak reset for {count} user(s).')
     
     @admin.action(description='Add 100 bonus points')
     def add_bonus_points(self, request, queryset):
         for game_state in queryset:
-            game_state.points += 100
-            game_state.save()
+            game_state.add_points(100, 'Admin bonus', experience=0)
         self.message_user(request, f'Added 100 bonus points to {queryset.count()} user(s).')
     
     @admin.action(description='Add 50 bonus coins')
     def add_bonus_coins(self, request, queryset):
-        for game_state in queryset:
-            game_state.coins += 50
-            game_state.save()
+        for game_state in queryset.select_related('user'):
+            economy.grant(game_state.user, {'coins': 50}, reason='admin_bonus')
         self.message_user(request, f'Added 50 bonus coins to {queryset.count()} user(s).')
 
 
@@ -172,7 +192,7 @@ class UserSettingsAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('User', {'fields': ('user',)}),
-        ('Display', {'fields': ('language', 'theme', 'difficulty', 'daily_goal_minutes')}),
+        ('Display', {'fields': ('language', 'theme', 'difficulty', 'daily_goal_minutes', 'timezone')}),
         ('Audio/Visual', {'fields': ('sound_enabled', 'music_enabled', 'animations_enabled')}),
         ('Notifications', {'fields': ('email_notifications', 'push_notifications', 'reminder_notifications', 'achievement_notifications')}),
         ('Privacy', {'fields': ('profile_public', 'show_on_leaderboard')}),
@@ -202,13 +222,26 @@ class OTPVerificationAdmin(admin.ModelAdmin):
         self.message_user(request, f'{count} OTP(s) invalidated.')
 
 
+@admin.register(UserAgent)
+class UserAgentAdmin(admin.ModelAdmin):
+    """Admin for UserAgent model."""
+    list_display = ['browser', 'os', 'device', 'created_at']
+    list_filter = ['device', 'browser', 'os']
+    search_fields = ['user_agent']
+    readonly_fields = ['ua_hash', 'user_agent', 'device', 'browser', 'os', 'created_at']
+
+
 @admin.register(ActivityLog)
 class ActivityLogAdmin(admin.ModelAdmin):
     """Admin for ActivityLog model."""
     list_display = ['user', 'activity_type', 'description_short', 'ip_address', 'created_at']
     list_filter = ['activity_type', 'created_at']
     search_fields = ['user__username', 'user__email', 'description', 'ip_address']
-    readonly_fields = ['user', 'activity_type', 'description', 'metadata', 'ip_address', 'user_agent', 'created_at']
+    readonly_fields = [
+        'user', 'activity_type', 'description', 'metadata', 'ip_address', 'user_agent', 'user_agent_string',
+        'created_at',
+    ]
+    list_select_related = ['user']
     ordering = ['-created_at']
     date_hierarchy = 'created_at'
     
@@ -218,9 +251,74 @@ class ActivityLogAdmin(admin.ModelAdmin):
         return obj.description or '-'
     description_short.short_description = 'Description'
     
+    def user_agent_string(self, obj):
+        # The interned string itself, next to its parsed summary
+        return obj.user_agent.user_agent if obj.user_agent_id else '-'
+    user_agent_string.short_description = 'User agent string'
+    
     def has_add_permission(self, request):
         return False
     
     def has_change_permission(self, request, obj=None):
         return False
 
+
+@admin.register(DailyActivity)
+class DailyActivityAdmin(admin.ModelAdmin):
+    """Admin for DailyActivity model."""
+    list_display = ['user', 'day', 'total']
+    list_filter = ['day']
+    search_fields = ['user__username', 'user__email']
+    readonly_fields = ['user', 'day', 'total', 'counts']
+    ordering = ['-day']
+    date_hierarchy = 'day'
+
+
+@admin.register(PlatformDailyStat)
+class PlatformDailyStatAdmin(admin.ModelAdmin):
+    """Admin for PlatformDailyStat model."""
+    list_display = ['metric', 'key', 'day', 'value']
+    list_filter = ['metric', 'day']
+    search_fields = ['key']
+    readonly_fields = ['metric', 'key', 'day', 'value']
+    ordering = ['-day', 'metric']
+    date_hierarchy = 'day'
+
+
+@admin.register(ActiveUserSketch)
+class ActiveUserSketchAdmin(admin.ModelAdmin):
+    """Admin for ActiveUserSketch model."""
+    list_display = ['day', 'estimated_users', 'version']
+    readonly_fields = ['day', 'estimated_users', 'version']
+    exclude = ['registers']
+    ordering = ['-day']
+    date_hierarchy = 'day'
+    
+    def estimated_users(self, obj):
+        from .hll import HyperLogLog
+        return HyperLogLog(obj.registers).count()
+    estimated_users.short_description = 'Estimated Users'
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Admin for Job model."""
+    list_display = ['task', 'status', 'progress', 'attempts', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'task']
+    search_fields = ['id', 'task']
+    readonly_fields = ['id', 'task', 'args', 'status', 'run_at', 'attempts', 'max_attempts', 'progress',
+                       'progress_message', 'result', 'error', 'worker', 'heartbeat_at', 'created_by',
+                       'created_at', 'started_at', 'finished_at']
+    list_select_related = ['created_by']
+    ordering = ['-created_at']
+    
+    actions = ['cancel_jobs']
+    
+    @admin.action(description='Cancel selected queued jobs')
+    def cancel_jobs(self, request, queryset):
+        from .jobs import cancel
+        count = sum(cancel(job_id) for job_id in queryset.values_list('id', flat=True))
+        self.message_user(request, f'{count} job(s) cancelled.')
+    
+    def has_add_permission(self, request):
+        return False
@@ -7,7 +7,8 @@ from accounts.admin_views import (
     AdminLessonListCreateView, AdminLessonDetailView,
     AdminQuizListCreateView, AdminQuestListCreateView,
     AdminUsersView, AdminAnalyticsView, AdminBulkUploadView,
-    AdminAwardBadgeView
+    AdminAwardBadgeView, AdminExportView,
+    AdminJobListCreateView, AdminJobDetailView, AdminJobCancelView
 )
 
 app_name = 'admin_api'
@@ -29,9 +30,17 @@ urlpatterns = [
     # Users
     path('users/', AdminUsersView.as_view(), name='admin-users'),
     
+    # Export
+    path('export/<str:dataset>/', AdminExportView.as_view(), name='admin-export'),
+    
     # Analytics
     path('analytics/', AdminAnalyticsView.as_view(), name='admin-analytics'),
     
     # Bulk Upload
     path('content/bulk-upload/', AdminBulkUploadView.as_view(), name='admin-bulk-upload'),
+    
+    # Background Jobs
+    path('jobs/', AdminJobListCreateView.as_view(), name='admin-jobs'),
+    path('jobs/<uuid:job_id>/', AdminJobDetailView.as_view(), name='admin-job-detail'),
+    path('jobs/<uuid:job_id>/cancel/', AdminJobCancelView.as_view(), name='admin-job-cancel'),
 ]
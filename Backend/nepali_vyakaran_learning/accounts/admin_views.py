@@ -3,15 +3,20 @@ Admin content management views.
 Handles CRUD operations for lessons, quizzes, quests, and user management.
 """
 
+import datetime
+
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from rest_framework import status, generics, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 
 from accounts.utils import success_response, error_response
-from accounts.models import GameState, ActivityLog
+from accounts import analytics, bulk_import, exports, jobs, user_search
+from accounts.models import GameState, ActivityLog, Job
+from accounts.serializers import JobSerializer
 from learning_vyakaran.models import (
     Lesson, Quiz, Quest, Category
 )
@@ -239,37 +244,47 @@ class AdminUsersView(APIView):
     
     @extend_schema(
         summary="List All Users (Admin)",
-        description="Get all users with pagination",
+        description="Get users newest first with cursor pagination. Pass the returned nextCursor "
+                    "as cursor to get the next page.",
         tags=["Admin - Users"],
         parameters=[
-            OpenApiParameter(name='page', description='Page number', type=int),
-            OpenApiParameter(name='limit', description='Items per page', type=int),
+            OpenApiParameter(name='cursor', description='Cursor from the previous page'),
+            OpenApiParameter(name='limit', description='Items per page (max 100)', type=int),
             OpenApiParameter(name='search', description='Search by username or email'),
+            OpenApiParameter(name='match', description='contains (default) or prefix',
+                             enum=user_search.MATCH_MODES),
+            OpenApiParameter(name='count', description='estimate (default), exact or none',
+                             enum=user_search.COUNT_MODES),
         ]
     )
     def get(self, request):
-        page = int(request.query_params.get('page', 1))
-        limit = int(request.query_params.get('limit', 20))
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return error_response('Invalid limit', code='VALIDATION_ERROR')
         search = request.query_params.get('search', '')
+        match = request.query_params.get('match', 'contains')
+        count_mode = request.query_params.get('count', 'estimate')
+        if match not in user_search.MATCH_MODES or count_mode not in user_search.COUNT_MODES:
+            return error_response('Invalid match or count mode', code='VALIDATION_ERROR', details={
+                'match': user_search.MATCH_MODES, 'count': user_search.COUNT_MODES
+            })
         
-        users_query = User.objects.all()
+        users_query = user_search.search(User.objects.all(), search, match)
         
-        if search:
-            users_query = users_query.filter(
-                Q(username__icontains=search) | Q(email__icontains=search)
+        try:
+            users, next_cursor = user_search.page(
+                users_query.select_related('game_state'), request.query_params.get('cursor'), limit
             )
-        
-        total = users_query.count()
-        start = (page - 1) * limit
-        end = start + limit
-        
-        users = users_query.select_related('gamestate')[start:end]
+        except user_search.InvalidCursor:
+            return error_response('Invalid cursor', code='VALIDATION_ERROR')
+        total, total_is_exact = user_search.count(users_query, count_mode, filtered=bool(search.strip()))
         
         users_data = []
         for user in users:
             try:
-                game_state = user.gamestate
-            except:
+                game_state = user.game_state
+            except GameState.DoesNotExist:
                 game_state = None
             
             users_data.append({
@@ -285,11 +300,69 @@ class AdminUsersView(APIView):
         
         return success_response(data={
             'users': users_data,
+            'nextCursor': next_cursor,
             'total': total,
-            'currentPage': page
+            'totalIsExact': total_is_exact
         })
 
 
+# =============================================================================
+# ADMIN DATA EXPORT
+# =============================================================================
+
+class AdminExportView(APIView):
+    """
+    GET /api/v1/admin/export/{dataset} - Stream a dataset as CSV or NDJSON
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    @extend_schema(
+        summary="Export Data (Admin)",
+        description="Stream users (with game state), quiz results, lesson progress or activity logs "
+                    "as CSV or NDJSON. Rows are read in primary key order a page at a time, so "
+                    "exports of any size run in constant memory.",
+        tags=["Admin - Export"],
+        parameters=[
+            OpenApiParameter(name='dataset', location=OpenApiParameter.PATH,
+                             enum=list(exports.DATASETS)),
+            OpenApiParameter(name='output', description='Output format (default: csv)',
+                             enum=list(exports.FORMATS)),
+            OpenApiParameter(name='since', description='Only rows on or after this date (YYYY-MM-DD)'),
+            OpenApiParameter(name='until', description='Only rows before this date (YYYY-MM-DD)'),
+        ]
+    )
+    def get(self, request, dataset):
+        if dataset not in exports.DATASETS:
+            return error_response('Unknown dataset', code='NOT_FOUND', status_code=404,
+                                  details={'datasets': list(exports.DATASETS)})
+        
+        # Not 'format', which DRF reserves for choosing a renderer
+        export_format = request.query_params.get('output', 'csv')
+        if export_format not in exports.FORMATS:
+            return error_response('Invalid format', code='VALIDATION_ERROR',
+                                  details={'formats': list(exports.FORMATS)})
+        
+        bounds = {}
+        for name in ('since', 'until'):
+            value = request.query_params.get(name)
+            if not value:
+                continue
+            try:
+                day = datetime.date.fromisoformat(value)
+            except ValueError:
+                return error_response(f'Invalid {name} date, expected YYYY-MM-DD', code='VALIDATION_ERROR')
+            bounds[name] = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+        
+        rows = exports.dataset(dataset, **bounds)
+        response = StreamingHttpResponse(
+            exports.encode(exports.keyset_pages(rows), export_format, exports.columns(rows)),
+            content_type=exports.FORMATS[export_format],
+        )
+        filename = f'{dataset}-{timezone.localdate():%Y%m%d}.{export_format}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
 # =============================================================================
 # ADMIN ANALYTICS
 # =============================================================================
@@ -302,67 +375,77 @@ class AdminAnalyticsView(APIView):
     
     @extend_schema(
         summary="Platform Analytics (Admin)",
-        description="Get comprehensive platform analytics",
-        tags=["Admin - Analytics"]
+        description="Get comprehensive platform analytics. Active user counts are "
+                    "HyperLogLog estimates (about 1.6% error) unless exact=true.",
+        tags=["Admin - Analytics"],
+        parameters=[
+            OpenApiParameter(name='exact', description='Count active users exactly (slower, for audits)', type=bool),
+        ]
     )
     def get(self, request):
         from datetime import timedelta
         from django.utils import timezone
-        from learning_vyakaran.models import LessonProgress, QuizResult
         
-        now = timezone.now()
-        week_ago = now - timedelta(days=7)
-        month_ago = now - timedelta(days=30)
+        today = timezone.localdate()
+        month_start = today - timedelta(days=29)
+        exact = request.query_params.get('exact', '').lower() in ('true', '1')
         
-        # Total users
-        total_users = User.objects.count()
+        # Total users (signups net of deletions)
+        total_users = analytics.total('signups')
         
-        # Active users (logged in last 7 days)
-        active_users = ActivityLog.objects.filter(
-            created_at__gte=week_ago
-        ).values('user').distinct().count()
+        # Active users (last 1, 7 and 30 days)
+        active_users = {
+            'daily': analytics.active_users(1, today, exact=exact),
+            'weekly': analytics.active_users(7, today, exact=exact),
+            'monthly': analytics.active_users(30, today, exact=exact),
+        }
         
-        # Completion rates
+        # Completion rates (first completions of published lessons)
         total_lessons = Lesson.objects.filter(is_published=True).count()
-        completed_lessons_count = LessonProgress.objects.filter(completed=True).count()
+        completed_lessons_count = analytics.total('lessons_completed')
         completion_rate = (completed_lessons_count / (total_users * total_lessons) * 100) if total_users > 0 and total_lessons > 0 else 0
         
-        # Popular lessons
-        popular_lessons = Lesson.objects.annotate(
-            completions=Count('progress', filter=Q(progress__completed=True))
-        ).order_by('-completions')[:5]
+        quiz_attempts = analytics.total('quiz_attempts', since=month_start)
+        quiz_pass_rate = (analytics.total('quiz_passes', since=month_start) / quiz_attempts * 100) if quiz_attempts else 0
         
+        # Popular lessons
+        ranked = analytics.top_keys('lessons_completed', limit=None)
+        titles = {
+            str(lesson_id): title
+            for lesson_id, title in Lesson.objects.filter(
+                id__in=analytics.uuid_keys(key for key, _ in ranked)
+            ).values_list('id', 'title')
+        }
         popular_lessons_data = [
             {
-                'id': str(lesson.id),
-                'title': lesson.title,
-                'completions': lesson.completions
+                'id': key,
+                'title': titles[key],
+                'completions': completions
             }
-            for lesson in popular_lessons
-        ]
+            for key, completions in ranked if key in titles
+        ][:5]
         
         # User growth (last 30 days)
-        user_growth = []
-        for i in range(30):
-            day = now - timedelta(days=i)
-            count = User.objects.filter(date_joined__date=day.date()).count()
-            user_growth.append({
-                'date': day.date().isoformat(),
-                'count': count
-            })
-        user_growth.reverse()
+        user_growth = [
+            {'date': day.isoformat(), 'count': count}
+            for day, count in analytics.daily_series('signups', 30, today)
+        ]
         
-        analytics = {
+        analytics_data = {
             'totalUsers': total_users,
-            'activeUsers': active_users,
+            'activeUsers': active_users['weekly'],
+            'activeUserCounts': active_users,
+            'activeUserCountsExact': exact,
             'completionRates': {
-                'overall': round(completion_rate, 2)
+                'overall': round(completion_rate, 2),
+                'quizPassRate': round(quiz_pass_rate, 2)
             },
+            'pointsAwarded': analytics.total('points_awarded', since=month_start),
             'popularLessons': popular_lessons_data,
             'userGrowth': user_growth
         }
         
-        return success_response(data=analytics)
+        return success_response(data=analytics_data)
 
 
 # =============================================================================
@@ -377,55 +460,176 @@ class AdminBulkUploadView(APIView):
     
     @extend_schema(
         summary="Bulk Upload Content (Admin)",
-        description="Bulk upload lessons, quizzes, or questions",
-        tags=["Admin - Content"]
+        description="Bulk upload lessons, quizzes (with nested questions), questions or lesson "
+                    "prerequisites. Send JSON {type, data: [...]}, or stream NDJSON (one item per line, "
+                    "Content-Type: application/x-ndjson) with ?type=. All items are validated first "
+                    "and the upload is imported in one transaction: if any item is invalid, nothing "
+                    "is imported and every error is returned.",
+        tags=["Admin - Content"],
+        parameters=[
+            OpenApiParameter(name='type', description='Content type, for NDJSON uploads',
+                             enum=bulk_import.TYPES),
+            OpenApiParameter(name='background', type=bool,
+                             description='Import in a background job and return it (202)'),
+        ]
     )
     def post(self, request):
-        content_type = request.data.get('type')
-        data = request.data.get('data', [])
+        if request.content_type.startswith('application/x-ndjson'):
+            content_type = request.query_params.get('type')
+            try:
+                data = bulk_import.read_ndjson(request.stream) if request.stream else []
+            except ValueError as e:
+                return error_response(str(e), code='VALIDATION_ERROR')
+        else:
+            content_type = request.data.get('type')
+            data = request.data.get('data', [])
         
         if not content_type or not data:
             return error_response('Type and data are required', status_code=400)
+        if content_type not in bulk_import.TYPES:
+            return error_response('Invalid content type', code='VALIDATION_ERROR',
+                                  details={'types': bulk_import.TYPES})
+        if not isinstance(data, list):
+            return error_response('Data must be a list of items', code='VALIDATION_ERROR')
         
-        uploaded = 0
-        failed = 0
-        errors = []
-        
-        if content_type == 'lessons':
-            for item in data:
-                try:
-                    serializer = LessonDetailSerializer(data=item)
-                    if serializer.is_valid():
-                        serializer.save()
-                        uploaded += 1
-                    else:
-                        failed += 1
-                        errors.append({
-                            'item': item.get('title', 'Unknown'),
-                            'errors': serializer.errors
-                        })
-                except Exception as e:
-                    failed += 1
-                    errors.append({
-                        'item': item.get('title', 'Unknown'),
-                        'error': str(e)
-                    })
+        if request.query_params.get('background', '').lower() in ('true', '1'):
+            job = jobs.enqueue('bulk_import', {'content_type': content_type, 'items': data},
+                               user=request.user, max_attempts=1)
+            return success_response(data=JobSerializer(job).data, status_code=status.HTTP_202_ACCEPTED)
+        
+        try:
+            created = bulk_import.run(content_type, data)
+        except ValueError as e:
+            return error_response(str(e), code='VALIDATION_ERROR')
+        except bulk_import.ImportFailed as e:
+            return error_response(
+                'Bulk upload has invalid items; nothing was imported', code='VALIDATION_ERROR',
+                details={'uploaded': 0, 'failed': len(e.errors), 'errors': e.errors[:100]}
+            )
         
         # Log bulk upload
         ActivityLog.log_activity(
             request.user, 'admin_bulk_upload',
-            f'Bulk uploaded {uploaded} {content_type}',
-            metadata={'type': content_type, 'uploaded': uploaded, 'failed': failed},
+            f'Bulk uploaded {len(data)} {content_type}',
+            metadata={'type': content_type, 'uploaded': len(data), 'created': created},
             request=request
         )
         
         return success_response(data={
-            'uploaded': uploaded,
-            'failed': failed,
-            'errors': errors
+            'uploaded': len(data),
+            'failed': 0,
+            'errors': [],
+            'created': created
         })
 
 
+# =============================================================================
+# ADMIN BACKGROUND JOBS
+# =============================================================================
+
+class AdminJobListCreateView(APIView):
+    """
+    GET /api/v1/admin/jobs - List recent background jobs
+    POST /api/v1/admin/jobs - Queue a background job
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    @extend_schema(
+        summary="List Jobs (Admin)",
+        description="Get the most recent background jobs and the tasks that can be queued",
+        tags=["Admin - Jobs"],
+        parameters=[
+            OpenApiParameter(name='status', description='Filter by status',
+                             enum=[choice for choice, _ in Job.STATUS_CHOICES]),
+            OpenApiParameter(name='task', description='Filter by task name'),
+            OpenApiParameter(name='limit', description='Items to return (max 100)', type=int),
+        ]
+    )
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return error_response('Invalid limit', code='VALIDATION_ERROR')
+        
+        job_query = Job.objects.select_related('created_by')
+        for field in ('status', 'task'):
+            if request.query_params.get(field):
+                job_query = job_query.filter(**{field: request.query_params[field]})
+        
+        return success_response(data={
+            'jobs': JobSerializer(job_query[:limit], many=True).data,
+            'tasks': sorted(jobs.TASKS)
+        })
+    
+    @extend_schema(
+        summary="Queue Job (Admin)",
+        description="Queue a registered task to run in the background. Poll the returned job for progress.",
+        tags=["Admin - Jobs"],
+        request={
+            'type': 'object',
+            'properties': {
+                'task': {'type': 'string'},
+                'args': {'type': 'object'},
+                'maxAttempts': {'type': 'integer'}
+            },
+            'required': ['task']
+        }
+    )
+    def post(self, request):
+        task = request.data.get('task')
+        args = request.data.get('args') or {}
+        max_attempts = request.data.get('maxAttempts')
+        
+        if not isinstance(args, dict):
+            return error_response('Args must be an object', code='VALIDATION_ERROR')
+        if max_attempts is not None and (not isinstance(max_attempts, int) or max_attempts < 1):
+            return error_response('maxAttempts must be a positive integer', code='VALIDATION_ERROR')
+        
+        try:
+            job = jobs.enqueue(task, args, user=request.user, max_attempts=max_attempts)
+        except ValueError as e:
+            return error_response(str(e), code='VALIDATION_ERROR', details={'tasks': sorted(jobs.TASKS)})
+        
+        return success_response(data=JobSerializer(job).data, status_code=status.HTTP_202_ACCEPTED)
+
+
+class AdminJobDetailView(APIView):
+    """
+    GET /api/v1/admin/jobs/{id} - Get a job's status and progress
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    @extend_schema(
+        summary="Job Status (Admin)",
+        description="Get a background job's status, progress and result",
+        tags=["Admin - Jobs"]
+    )
+    def get(self, request, job_id):
+        job = Job.objects.select_related('created_by').filter(id=job_id).first()
+        if job is None:
+            return error_response('Job not found', status_code=404)
+        return success_response(data=JobSerializer(job).data)
+
+
+class AdminJobCancelView(APIView):
+    """
+    POST /api/v1/admin/jobs/{id}/cancel - Cancel a queued job
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    @extend_schema(
+        summary="Cancel Job (Admin)",
+        description="Cancel a job that has not started running yet",
+        tags=["Admin - Jobs"]
+    )
+    def post(self, request, job_id):
+        if not Job.objects.filter(id=job_id).exists():
+            return error_response('Job not found', status_code=404)
+        if not jobs.cancel(job_id):
+            return error_response('Only queued jobs can be cancelled', code='CONFLICT', status_code=status.HTTP_409_CONFLICT)
+        return success_response(data=JobSerializer(Job.objects.get(id=job_id)).data)
+
+
 # =============================================================================
 # ADMIN BADGE MANAGEMENT
 # =============================================================================
@@ -0,0 +1,333 @@
+"""
+Platform analytics cube.
+
+PlatformDailyStat holds one value per (metric, day, key), where key is a
+lesson or quiz id for per-item metrics and '' otherwise. Admin dashboards
+read a few small ranges of it instead of scanning users, progress and the
+activity log on every load.
+
+Cells are maintained incrementally:
+
+- signups: on user creation, and taken back from the join day when a
+  user is deleted (see apps.py), so their sum is the number of users
+- game_states: net changes in the number of game states, on GameState
+  creation and deletion; its sum is the number of game states
+- points_total, level_total: the points and levels all game states hold,
+  written only by `manage.py refresh_analytics`. Rewards are the hottest
+  write path, so they do not touch the cube; these totals are as fresh as
+  the last refresh.
+- active_users, activities, lesson_completions, lessons_completed,
+  quiz_attempts, quiz_passes: when the activity writer flushes a batch
+- points_awarded: from the daily points leaderboards by
+  `manage.py refresh_analytics`
+
+Active users over a window of days are not additive, so each day also
+has an ActiveUserSketch, a HyperLogLog of the users active that day.
+Sketches are merged for DAU/WAU/MAU in a few KB of memory, whatever the
+number of users; exact counts over DailyActivity remain available for
+audits.
+
+`refresh_analytics` also recomputes every metric for recent days from the
+source tables, which repairs any drift and backfills new deployments. Days
+are users' local days for activity metrics (as in DailyActivity) and the
+server's local day otherwise.
+"""
+
+import datetime
+import logging
+import uuid
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import streaks
+from .hll import HyperLogLog
+from .models import ActiveUserSketch, ActivityLog, DailyActivity, PlatformDailyStat
+
+
+logger = logging.getLogger(__name__)
+
+# Compare-and-swap attempts per sketch before giving up
+CAS_RETRIES = 5
+
+
+def bump(metric, amount=1, key='', day=None):
+    """Add `amount` to one cell of the cube."""
+    day = day or timezone.localdate()
+    cells = PlatformDailyStat.objects.filter(metric=metric, day=day, key=key)
+    if cells.update(value=F('value') + amount):
+        return
+    try:
+        with transaction.atomic():
+            PlatformDailyStat.objects.create(metric=metric, day=day, key=key, value=amount)
+    except IntegrityError:
+        # Created concurrently
+        cells.update(value=F('value') + amount)
+
+
+def _activity_cells(rows):
+    """Counter of (metric, day, key) for a set of activity rows or value dicts."""
+    cells = Counter()
+    for row in rows:
+        get = row.get if isinstance(row, dict) else lambda name: getattr(row, name)
+        user_id, activity_type, metadata = get('user_id'), get('activity_type'), get('metadata') or {}
+        day = timezone.localdate(get('created_at'), streaks.user_timezone(user_id))
+
+        cells[('activities', day, '')] += 1
+        if activity_type == 'lesson_complete' and metadata.get('lesson_id'):
+            lesson_id = str(metadata['lesson_id'])
+            cells[('lesson_completions', day, lesson_id)] += 1
+            if metadata.get('first_completion'):
+                cells[('lessons_completed', day, lesson_id)] += 1
+        elif activity_type == 'quiz_complete' and metadata.get('quiz_id'):
+            quiz_id = str(metadata['quiz_id'])
+            cells[('quiz_attempts', day, quiz_id)] += 1
+            if metadata.get('passed'):
+                cells[('quiz_passes', day, quiz_id)] += 1
+    return cells
+
+
+def record_activity(rows, new_days):
+    """
+    Fold a written batch of ActivityLog rows into the cube. `new_days` are
+    the (user_id, day) rollups the batch created, i.e. newly active users.
+    """
+    cells = _activity_cells(rows)
+    active = defaultdict(list)
+    for user_id, day in new_days:
+        cells[('active_users', day, '')] += 1
+        active[day].append(user_id)
+    for (metric, day, key), amount in cells.items():
+        bump(metric, amount, key, day)
+    for day, user_ids in active.items():
+        add_active_users(day, user_ids)
+
+
+def add_active_users(day, user_ids):
+    """Add users to the day's active user sketch."""
+    sketches = ActiveUserSketch.objects.filter(day=day)
+    added = HyperLogLog().update(str(user_id) for user_id in user_ids)
+
+    for _ in range(CAS_RETRIES):
+        current = sketches.values('registers', 'version').first()
+        if current is None:
+            try:
+                with transaction.atomic():
+                    ActiveUserSketch.objects.create(day=day, registers=bytes(added))
+                return
+            except IntegrityError:
+                continue  # Created concurrently; merge into it
+
+        merged = HyperLogLog(current['registers']).merge(added)
+        if sketches.filter(version=current['version']).update(
+            registers=bytes(merged), version=current['version'] + 1
+        ):
+            return
+
+    logger.warning('Could not merge active user sketch for %s', day)
+
+
+def record_signup(sender, instance, created, **kwargs):
+    """Signal handler: count a new user."""
+    if created:
+        transaction.on_commit(lambda: bump('signups', day=timezone.localdate(instance.date_joined)))
+
+
+def record_user_deleted(sender, instance, **kwargs):
+    """Signal handler: take a deleted user back out of their join day's signups."""
+    day = timezone.localdate(instance.date_joined)
+    transaction.on_commit(lambda: bump('signups', -1, day=day))
+
+
+def record_game_state_saved(sender, instance, created, **kwargs):
+    """Signal handler: count a new game state."""
+    if created:
+        bump('game_states')
+
+
+def record_game_state_deleted(sender, instance, **kwargs):
+    """Signal handler: take a deleted game state out of the count."""
+    bump('game_states', -1)
+
+
+# =============================================================================
+# REFRESH
+# =============================================================================
+
+# Metrics only derivable from raw activity rows
+LOG_METRICS = ['lesson_completions', 'lessons_completed', 'quiz_attempts', 'quiz_passes']
+
+# Totals reconciled with GameState through today's cell: metric -> aggregate
+TOTAL_METRICS = {
+    'game_states': Count('id'),
+    'points_total': Sum('points'),
+    'level_total': Sum('level'),
+}
+
+
+@transaction.atomic
+def refresh(since):
+    """
+    Recompute the cube for days from `since` on from the source tables.
+    Metrics read from the raw activity log or the daily points boards are
+    only rebuilt for days those tables still cover; older cells are kept.
+    The game state totals are reconciled through today's cell. Returns the
+    number of cells written.
+    """
+    from learning_vyakaran.models import Leaderboard
+    from .models import GameState
+
+    cells = Counter()
+    rebuilt_from = {}
+    start = timezone.make_aware(datetime.datetime.combine(since, datetime.time.min))
+
+    signups = get_user_model().objects.filter(date_joined__gte=start).annotate(
+        day=TruncDate('date_joined')
+    ).values('day').annotate(n=Count('id')).order_by()
+    for row in signups:
+        cells[('signups', row['day'], '')] = row['n']
+    rebuilt_from['signups'] = since
+
+    rollups = DailyActivity.objects.filter(day__gte=since).values('day').annotate(
+        users=Count('id'), activities=Sum('total')
+    ).order_by()
+    for row in rollups:
+        cells[('active_users', row['day'], '')] = row['users']
+        cells[('activities', row['day'], '')] = row['activities']
+    rebuilt_from['active_users'] = rebuilt_from['activities'] = since
+
+    oldest = ActivityLog.objects.order_by('created_at').values_list('created_at', flat=True).first()
+    log_since = max(since, timezone.localdate(oldest)) if oldest else since
+    # Local days may start up to a day earlier in UTC
+    logs = ActivityLog.objects.filter(
+        created_at__gte=start - datetime.timedelta(days=1),
+        activity_type__in=['lesson_complete', 'quiz_complete']
+    ).values('user_id', 'activity_type', 'metadata', 'created_at')
+    for (metric, day, key), amount in _activity_cells(logs.iterator(chunk_size=2000)).items():
+        if metric in LOG_METRICS and day >= log_since:
+            cells[(metric, day, key)] = amount
+    rebuilt_from.update(dict.fromkeys(LOG_METRICS, log_since))
+
+    boards = Leaderboard.objects.filter(leaderboard_type='points', period='daily')
+    oldest_board = boards.order_by('period_start').values_list('period_start', flat=True).first()
+    points_since = max(since, oldest_board) if oldest_board else since
+    points = boards.filter(period_start__gte=points_since).values('period_start').annotate(
+        total=Sum('score')
+    ).order_by()
+    for row in points:
+        cells[('points_awarded', row['period_start'], '')] = row['total']
+    rebuilt_from['points_awarded'] = points_since
+
+    today = timezone.localdate()
+    held = GameState.objects.aggregate(**TOTAL_METRICS)
+    for metric in TOTAL_METRICS:
+        before = total(metric, until=today - datetime.timedelta(days=1))
+        cells[(metric, today, '')] = (held[metric] or 0) - before
+        rebuilt_from[metric] = today
+
+    for metric, day in rebuilt_from.items():
+        PlatformDailyStat.objects.filter(metric=metric, day__gte=day).delete()
+    PlatformDailyStat.objects.bulk_create([
+        PlatformDailyStat(metric=metric, day=day, key=key, value=value)
+        for (metric, day, key), value in cells.items()
+    ], batch_size=2000)
+
+    rebuild_sketches(since)
+    return len(cells)
+
+
+def rebuild_sketches(since):
+    """Recompute the active user sketches of days from `since` on from DailyActivity."""
+    sketches = defaultdict(HyperLogLog)
+    rollups = DailyActivity.objects.filter(day__gte=since).values_list('user_id', 'day')
+    for user_id, day in rollups.iterator(chunk_size=2000):
+        sketches[day].add(str(user_id))
+
+    ActiveUserSketch.objects.filter(day__gte=since).delete()
+    ActiveUserSketch.objects.bulk_create([
+        ActiveUserSketch(day=day, registers=bytes(sketch)) for day, sketch in sketches.items()
+    ], batch_size=500)
+
+
+# =============================================================================
+# READS
+# =============================================================================
+
+def series(metric, since, until=None):
+    """{day: value} for a metric summed over keys, for days in [since, until]."""
+    cells = PlatformDailyStat.objects.filter(metric=metric, day__gte=since)
+    if until is not None:
+        cells = cells.filter(day__lte=until)
+    return dict(cells.values('day').annotate(total=Sum('value')).order_by().values_list('day', 'total'))
+
+
+def daily_series(metric, days, today=None):
+    """[(day, value)] for the last `days` days, oldest first, with zeros filled in."""
+    today = today or timezone.localdate()
+    since = today - datetime.timedelta(days=days - 1)
+    values = series(metric, since, today)
+    return [(since + datetime.timedelta(days=i), values.get(since + datetime.timedelta(days=i), 0))
+            for i in range(days)]
+
+
+def total(metric, since=None, until=None):
+    """Sum of a metric over all keys, for days in [since, until] or over all time."""
+    cells = PlatformDailyStat.objects.filter(metric=metric)
+    if since is not None:
+        cells = cells.filter(day__gte=since)
+    if until is not None:
+        cells = cells.filter(day__lte=until)
+    return cells.aggregate(total=Sum('value'))['total'] or 0
+
+
+def totals(*metrics):
+    """{metric: sum over all days and keys} for several metrics, in one query."""
+    sums = dict(
+        PlatformDailyStat.objects.filter(metric__in=metrics).values('metric').annotate(
+            total=Sum('value')
+        ).order_by().values_list('metric', 'total')
+    )
+    return {metric: sums.get(metric) or 0 for metric in metrics}
+
+
+def top_keys(metric, limit=5, since=None):
+    """[(key, value)] with the highest totals of a per-key metric (all keys if limit is None)."""
+    cells = PlatformDailyStat.objects.filter(metric=metric).exclude(key='')
+    if since is not None:
+        cells = cells.filter(day__gte=since)
+    ranked = cells.values('key').annotate(total=Sum('value')).order_by('-total').values_list('key', 'total')
+    return list(ranked if limit is None else ranked[:limit])
+
+
+def uuid_keys(keys):
+    """The keys that are valid UUIDs (lesson and quiz ids), for id__in filters."""
+    valid = []
+    for key in keys:
+        try:
+            valid.append(uuid.UUID(key))
+        except ValueError:
+            pass
+    return valid
+
+
+def active_users(days, today=None, exact=False):
+    """
+    Distinct users active over the last `days` days (1 = DAU, 7 = WAU,
+    30 = MAU). Estimated from the daily sketches unless `exact` is set, in
+    which case the users are de-duplicated over DailyActivity.
+    """
+    today = today or timezone.localdate()
+    since = today - datetime.timedelta(days=days - 1)
+    if exact:
+        return DailyActivity.objects.filter(day__gte=since, day__lte=today).values('user').distinct().count()
+
+    union = HyperLogLog()
+    for registers in ActiveUserSketch.objects.filter(day__gte=since, day__lte=today).values_list(
+        'registers', flat=True
+    ):
+        union.merge(HyperLogLog(registers))
+    return union.count()
@@ -1,5 +1,20 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save, post_delete
 
 
 class AccountsConfig(AppConfig):
     name = 'accounts'
+
+    def ready(self):
+        from . import analytics, streaks, user_cards
+        from . import job_tasks  # noqa: F401 (registers background job tasks)
+        from .models import CustomUser, GameState, UserSettings
+
+        post_save.connect(analytics.record_signup, sender=CustomUser)
+        post_delete.connect(analytics.record_user_deleted, sender=CustomUser)
+        post_save.connect(analytics.record_game_state_saved, sender=GameState)
+        post_delete.connect(analytics.record_game_state_deleted, sender=GameState)
+        post_save.connect(user_cards.invalidate, sender=CustomUser)
+        post_delete.connect(user_cards.invalidate, sender=CustomUser)
+        post_save.connect(streaks.invalidate_timezone, sender=UserSettings)
+        post_delete.connect(streaks.invalidate_timezone, sender=UserSettings)
@@ -0,0 +1,349 @@
+"""
+Bulk content import for admins.
+
+An upload is a list of lessons, quizzes (optionally with their questions),
+questions or lesson prerequisites, sent as JSON or streamed as NDJSON.
+Imports are all-or-nothing:
+
+1. Every item is validated up front, with one serializer instance for the
+   whole list.
+2. Slugs, categories, quizzes and prerequisite lessons are resolved with
+   one query per kind, and conflicts and dangling references are reported
+   for all items at once.
+3. Rows are written with bulk_create in chunks inside one transaction,
+   reporting rows written after each chunk to an optional progress
+   callback (a job's Progress, see job_tasks.py).
+
+Nothing is written unless every item is valid.
+"""
+
+import json
+from collections import Counter
+
+from django.db import transaction
+from rest_framework import serializers
+
+from learning_vyakaran.models import Category, Lesson, Question, Quiz
+
+from .jobs import no_progress
+
+
+CHUNK_SIZE = 500
+LOOKUP_CHUNK = 900  # Values per IN (...) query, under SQLite's parameter limit
+MAX_ITEMS = 50000
+TYPES = ['lessons', 'quizzes', 'questions', 'prerequisites']
+
+
+class ImportFailed(Exception):
+    """Raised with every item error found; nothing has been written."""
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} invalid item(s)')
+        self.errors = errors
+
+
+# =============================================================================
+# ITEM SERIALIZERS
+# =============================================================================
+
+class LessonImportSerializer(serializers.ModelSerializer):
+    category = serializers.SlugField(required=False, allow_null=True)
+    prerequisites = serializers.ListField(child=serializers.SlugField(), required=False, default=list)
+
+    class Meta:
+        model = Lesson
+        fields = [
+            'title', 'title_nepali', 'slug', 'description', 'description_nepali',
+            'category', 'level', 'difficulty', 'order',
+            'content', 'examples', 'explanations', 'media', 'exercises',
+            'prerequisites', 'points_reward', 'coins_reward', 'estimated_time',
+            'is_published', 'is_premium'
+        ]
+        # Slug uniqueness is checked for the whole upload in one query
+        extra_kwargs = {'slug': {'validators': []}}
+
+
+class QuestionImportSerializer(serializers.ModelSerializer):
+    quiz = serializers.UUIDField(required=False, allow_null=True)
+    lesson = serializers.SlugField(required=False, allow_null=True)
+
+    class Meta:
+        model = Question
+        fields = [
+            'quiz', 'lesson', 'difficulty', 'question_type', 'question_text', 'question_text_nepali',
+            'options', 'correct_answer', 'explanation', 'explanation_nepali', 'hint', 'media',
+            'points', 'order', 'is_active'
+        ]
+
+
+class QuizQuestionImportSerializer(QuestionImportSerializer):
+    """A question nested in a quiz item, which belongs to that quiz."""
+
+    class Meta(QuestionImportSerializer.Meta):
+        fields = [field for field in QuestionImportSerializer.Meta.fields if field not in ('quiz', 'lesson')]
+
+
+class QuizImportSerializer(serializers.ModelSerializer):
+    id = serializers.UUIDField(required=False)  # lets question items refer to the quiz
+    category = serializers.SlugField(required=False, allow_null=True)
+    questions = QuizQuestionImportSerializer(many=True, required=False)
+
+    class Meta:
+        model = Quiz
+        fields = [
+            'id', 'title', 'title_nepali', 'description', 'category', 'quiz_type', 'difficulty',
+            'time_limit', 'pass_percentage', 'show_answers', 'shuffle_questions',
+            'points_reward', 'coins_reward', 'is_published', 'is_premium', 'questions'
+        ]
+
+
+class PrerequisiteImportSerializer(serializers.Serializer):
+    lesson = serializers.SlugField()
+    prerequisites = serializers.ListField(child=serializers.SlugField(), allow_empty=False)
+
+
+SERIALIZERS = {
+    'lessons': LessonImportSerializer,
+    'quizzes': QuizImportSerializer,
+    'questions': QuestionImportSerializer,
+    'prerequisites': PrerequisiteImportSerializer,
+}
+
+
+# =============================================================================
+# PARSING AND VALIDATION
+# =============================================================================
+
+def read_ndjson(stream):
+    """Read an NDJSON upload line by line into a list of items."""
+    items = []
+    for number, line in enumerate(iter(stream.readline, b''), start=1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            raise ValueError(f'Line {number} is not valid JSON')
+        items.append(item)
+        if len(items) > MAX_ITEMS:
+            raise ValueError(f'Uploads are limited to {MAX_ITEMS} items')
+    return items
+
+
+def _label(item):
+    if not isinstance(item, dict):
+        return 'Unknown'
+    label = item.get('slug') or item.get('title') or item.get('lesson') or item.get('question_text') or 'Unknown'
+    return str(label)[:50]
+
+
+def validate(content_type, items):
+    """Validate items field by field; returns their validated data or raises ImportFailed."""
+    serializer = SERIALIZERS[content_type](data=items, many=True)
+    if serializer.is_valid():
+        return serializer.validated_data
+    errors = serializer.errors
+    # Recent DRF versions key list errors by index and leave out valid items
+    per_item = errors.items() if isinstance(errors, dict) else enumerate(errors)
+    raise ImportFailed([
+        {'index': index, 'item': _label(items[index]), 'errors': item_errors}
+        for index, item_errors in sorted(per_item, key=lambda pair: pair[0]) if item_errors
+    ])
+
+
+def _lookup(queryset, field, values):
+    """{value: id} for the rows whose `field` is one of `values`."""
+    values, found = list(set(values)), {}
+    for start in range(0, len(values), LOOKUP_CHUNK):
+        chunk = values[start:start + LOOKUP_CHUNK]
+        found.update(queryset.filter(**{f'{field}__in': chunk}).values_list(field, 'id'))
+    return found
+
+
+def _duplicates(values):
+    return {value for value, count in Counter(values).items() if count > 1}
+
+
+class _Resolver:
+    """Collects per-item errors while resolving references in bulk."""
+
+    def __init__(self, items):
+        self.items = items
+        self.errors = {}
+
+    def error(self, index, field, message):
+        self.errors.setdefault(index, {}).setdefault(field, []).append(message)
+
+    def categories(self, field='category'):
+        slugs = {item[field] for item in self.items if item.get(field)}
+        found = _lookup(Category.objects.all(), 'slug', slugs)
+        for index, item in enumerate(self.items):
+            if item.get(field) and item[field] not in found:
+                self.error(index, field, f'Unknown category "{item[field]}"')
+        return found
+
+    def lesson_ids(self, slugs):
+        return _lookup(Lesson.objects.all(), 'slug', slugs)
+
+    def fail_if_errors(self):
+        if self.errors:
+            raise ImportFailed([
+                {'index': index, 'item': _label(self.items[index]), 'errors': errors}
+                for index, errors in sorted(self.errors.items())
+            ])
+
+
+# =============================================================================
+# IMPORTERS
+# =============================================================================
+
+class _Writer:
+    """bulk_create in CHUNK_SIZE chunks, reporting the rows written after each chunk."""
+
+    def __init__(self, progress, total):
+        self.progress = progress
+        self.total = total
+        self.written = 0
+
+    def create(self, model, rows, **kwargs):
+        for start in range(0, len(rows), CHUNK_SIZE):
+            chunk = rows[start:start + CHUNK_SIZE]
+            model.objects.bulk_create(chunk, **kwargs)
+            self.written += len(chunk)
+            self.progress(self.written, self.total, f'Imported {self.written} of {self.total} rows')
+
+
+def _import_lessons(items, progress):
+    check = _Resolver(items)
+    categories = check.categories()
+
+    slugs = [item['slug'] for item in items]
+    new_slugs = set(slugs)
+    referenced = {slug for item in items for slug in item['prerequisites']}
+    existing = check.lesson_ids(new_slugs | referenced)
+    repeated = _duplicates(slugs)
+    for index, item in enumerate(items):
+        if item['slug'] in repeated:
+            check.error(index, 'slug', 'Slug appears more than once in the upload')
+        if item['slug'] in existing:
+            check.error(index, 'slug', 'A lesson with this slug already exists')
+        for slug in item['prerequisites']:
+            if slug == item['slug']:
+                check.error(index, 'prerequisites', 'A lesson cannot be its own prerequisite')
+            elif slug not in existing and slug not in new_slugs:
+                check.error(index, 'prerequisites', f'Unknown lesson "{slug}"')
+    check.fail_if_errors()
+
+    lessons = []
+    for item in items:
+        fields = {name: value for name, value in item.items() if name not in ('category', 'prerequisites')}
+        lessons.append(Lesson(**fields, category_id=categories.get(item.get('category'))))
+    pairs = {(item['slug'], slug) for item in items for slug in item['prerequisites']}
+    write = _Writer(progress, len(lessons) + len(pairs))
+    write.create(Lesson, lessons)
+
+    ids = {**existing, **{lesson.slug: lesson.id for lesson in lessons}}
+    links = _link_prerequisites(((ids[lesson], ids[slug]) for lesson, slug in pairs), write)
+    return {'lessons': len(lessons), 'prerequisites': links}
+
+
+def _import_quizzes(items, progress):
+    check = _Resolver(items)
+    categories = check.categories()
+
+    given_ids = [item['id'] for item in items if item.get('id')]
+    existing = _lookup(Quiz.objects.all(), 'id', given_ids)
+    repeated = _duplicates(given_ids)
+    for index, item in enumerate(items):
+        if item.get('id') in repeated:
+            check.error(index, 'id', 'Id appears more than once in the upload')
+        if item.get('id') in existing:
+            check.error(index, 'id', 'A quiz with this id already exists')
+    check.fail_if_errors()
+
+    quizzes, questions = [], []
+    for item in items:
+        fields = {name: value for name, value in item.items() if name not in ('category', 'questions')}
+        quiz = Quiz(**fields, category_id=categories.get(item.get('category')))
+        quizzes.append(quiz)
+        questions.extend(Question(**question, quiz=quiz) for question in item.get('questions', []))
+    write = _Writer(progress, len(quizzes) + len(questions))
+    write.create(Quiz, quizzes)
+    write.create(Question, questions)
+    return {'quizzes': len(quizzes), 'questions': len(questions)}
+
+
+def _import_questions(items, progress):
+    check = _Resolver(items)
+    quizzes = _lookup(Quiz.objects.all(), 'id', (item['quiz'] for item in items if item.get('quiz')))
+    lessons = check.lesson_ids(item['lesson'] for item in items if item.get('lesson'))
+    for index, item in enumerate(items):
+        if not item.get('quiz') and not item.get('lesson'):
+            check.error(index, 'non_field_errors', 'A question needs a quiz or a lesson')
+        if item.get('quiz') and item['quiz'] not in quizzes:
+            check.error(index, 'quiz', f'Unknown quiz "{item["quiz"]}"')
+        if item.get('lesson') and item['lesson'] not in lessons:
+            check.error(index, 'lesson', f'Unknown lesson "{item["lesson"]}"')
+    check.fail_if_errors()
+
+    questions = [
+        Question(
+            **{name: value for name, value in item.items() if name not in ('quiz', 'lesson')},
+            quiz_id=item.get('quiz'),
+            lesson_id=lessons.get(item.get('lesson'))
+        )
+        for item in items
+    ]
+    _Writer(progress, len(questions)).create(Question, questions)
+    return {'questions': len(questions)}
+
+
+def _import_prerequisites(items, progress):
+    check = _Resolver(items)
+    ids = check.lesson_ids(
+        slug for item in items for slug in [item['lesson'], *item['prerequisites']]
+    )
+    for index, item in enumerate(items):
+        for field, slugs in (('lesson', [item['lesson']]), ('prerequisites', item['prerequisites'])):
+            for slug in slugs:
+                if slug not in ids:
+                    check.error(index, field, f'Unknown lesson "{slug}"')
+        if item['lesson'] in item['prerequisites']:
+            check.error(index, 'prerequisites', 'A lesson cannot be its own prerequisite')
+    check.fail_if_errors()
+
+    pairs = {(ids[item['lesson']], ids[slug]) for item in items for slug in item['prerequisites']}
+    links = _link_prerequisites(pairs, _Writer(progress, len(pairs)))
+    return {'prerequisites': links}
+
+
+def _link_prerequisites(pairs, write):
+    """Add (lesson id, prerequisite id) links, skipping existing ones. Returns the number of pairs."""
+    Through = Lesson.prerequisites.through
+    links = [Through(from_lesson_id=lesson_id, to_lesson_id=prerequisite_id)
+             for lesson_id, prerequisite_id in set(pairs)]
+    write.create(Through, links, ignore_conflicts=True)
+    return len(links)
+
+
+IMPORTERS = {
+    'lessons': _import_lessons,
+    'quizzes': _import_quizzes,
+    'questions': _import_questions,
+    'prerequisites': _import_prerequisites,
+}
+
+
+def run(content_type, items, progress=no_progress):
+    """
+    Validate and import a list of items of one content type in a single
+    transaction. Returns {kind: rows created}; raises ImportFailed with
+    every item error, having written nothing. `progress` is called as
+    progress(done, total, message) as rows are written.
+    """
+    if len(items) > MAX_ITEMS:
+        raise ValueError(f'Uploads are limited to {MAX_ITEMS} items')
+    progress(0, message=f'Validating {len(items)} {content_type}')
+    validated = [dict(item) for item in validate(content_type, items)]
+    with transaction.atomic():
+        return IMPORTERS[content_type](validated, progress)
@@ -0,0 +1,147 @@
+"""
+Streaming data exports for admins.
+
+Each dataset is a queryset of `.values()` rows read in keyset pages: every
+page is a short query for the next `page_size` rows after the last primary
+key seen, so no read transaction or server-side cursor stays open for the
+whole download, and memory stays flat however many rows are exported.
+Rows are encoded as CSV or NDJSON and streamed as they are read.
+"""
+
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from .models import ActivityLog, CustomUser
+
+
+PAGE_SIZE = 2000
+LINES_PER_CHUNK = 500  # Encoded rows sent to the client per write
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _users():
+    return CustomUser.objects.values(
+        'id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff',
+        'date_joined', 'last_login',
+        level=F('game_state__level'),
+        points=F('game_state__points'),
+        coins=F('game_state__coins'),
+        experience=F('game_state__experience'),
+        current_streak=F('game_state__current_streak'),
+        longest_streak=F('game_state__longest_streak'),
+        last_activity_date=F('game_state__last_activity_date'),
+    ), 'date_joined'
+
+
+def _quiz_results():
+    from learning_vyakaran.models import QuizResult
+
+    return QuizResult.objects.values(
+        'id', 'user_id', 'quiz_id', 'score', 'percentage', 'correct_answers', 'total_questions',
+        'time_spent', 'points_earned', 'coins_earned', 'passed', 'started_at', 'completed_at',
+        username=F('user__username'),
+        quiz_title=F('quiz__title'),
+    ), 'completed_at'
+
+
+def _lesson_progress():
+    from learning_vyakaran.models import LessonProgress
+
+    return LessonProgress.objects.values(
+        'id', 'user_id', 'lesson_id', 'status', 'score', 'best_score', 'time_spent', 'attempts',
+        'started_at', 'completed_at', 'updated_at',
+        username=F('user__username'),
+        lesson_title=F('lesson__title'),
+    ), 'updated_at'
+
+
+def _activity():
+    return ActivityLog.objects.values(
+        'id', 'user_id', 'activity_type', 'description', 'metadata', 'ip_address', 'created_at',
+        username=F('user__username'),
+        user_agent_string=F('user_agent__user_agent'),
+    ), 'created_at'
+
+
+# name -> callable returning (values queryset, datetime field filtered by since/until)
+DATASETS = {
+    'users': _users,
+    'quiz-results': _quiz_results,
+    'lesson-progress': _lesson_progress,
+    'activity': _activity,
+}
+
+
+def dataset(name, since=None, until=None):
+    """The values queryset of a dataset, limited to [since, until) on its date field."""
+    rows, date_field = DATASETS[name]()
+    if since is not None:
+        rows = rows.filter(**{f'{date_field}__gte': since})
+    if until is not None:
+        rows = rows.filter(**{f'{date_field}__lt': until})
+    return rows
+
+
+def keyset_pages(rows, page_size=PAGE_SIZE):
+    """Yield the rows of a values queryset (which must include 'id') in primary key order."""
+    last = None
+    while True:
+        page = rows.order_by('pk')
+        if last is not None:
+            page = page.filter(pk__gt=last)
+        count = 0
+        for row in page[:page_size].iterator(chunk_size=page_size):
+            count += 1
+            last = row['id']
+            yield row
+        if count < page_size:
+            return
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return value
+
+
+def _lines(rows, export_format, columns):
+    if export_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow([_cell(row[column]) for column in columns])
+    else:
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def encode(rows, export_format, columns):
+    """Yield the rows encoded as CSV (with a header line) or NDJSON, a few hundred lines at a time."""
+    chunk = []
+    for line in _lines(rows, export_format, columns):
+        chunk.append(line)
+        if len(chunk) >= LINES_PER_CHUNK:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def columns(rows):
+    """Column names of a values queryset, in select order."""
+    query = rows.query
+    return [*query.values_select, *query.annotation_select]
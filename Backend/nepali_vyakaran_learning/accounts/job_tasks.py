@@ -0,0 +1,98 @@
+"""
+Tasks that can run as background jobs (see accounts/jobs.py).
+
+Imported from AccountsConfig.ready() so the registry is complete in web
+processes and workers alike.
+"""
+
+import contextlib
+import datetime
+import io
+
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+
+from . import analytics, bulk_import
+from .jobs import JobFailed, task
+from .models import ActivityLog, Job
+
+
+# Characters of command output kept in a job's result
+OUTPUT_LIMIT = 4000
+
+
+@task('bulk_import')
+def run_bulk_import(progress, content_type, items):
+    """
+    Import admin bulk upload items (accounts/bulk_import.py) and log the
+    upload for the admin who queued it, as a synchronous upload is.
+    """
+    try:
+        created = bulk_import.run(content_type, items, progress)
+    except bulk_import.ImportFailed as e:
+        raise JobFailed('Bulk upload has invalid items; nothing was imported',
+                        result={'failed': len(e.errors), 'errors': e.errors[:100]})
+    except ValueError as e:
+        raise JobFailed(str(e))
+
+    job = Job.objects.select_related('created_by').filter(id=progress.job_id).first()
+    if job is not None and job.created_by is not None:
+        ActivityLog.log_activity(
+            job.created_by, 'admin_bulk_upload',
+            f'Bulk uploaded {len(items)} {content_type}',
+            metadata={'type': content_type, 'uploaded': len(items), 'created': created, 'job_id': str(job.id)}
+        )
+    return created
+
+
+@task('refresh_analytics')
+def run_refresh_analytics(progress, days=2):
+    """Recompute recent days of the analytics cube."""
+    since = timezone.localdate() - datetime.timedelta(days=days - 1)
+    return {'cells': analytics.refresh(since), 'since': since.isoformat()}
+
+
+@task('setup_database')
+def run_setup_database(progress):
+    """Create or update all lesson content and sample users (setup_database.py, without --clear)."""
+    import setup_database
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        progress(0, message='Populating lesson content')
+        if not setup_database.LessonDataPopulator(clear_existing=False).run():
+            raise JobFailed('Failed to populate lessons', result={'output': output.getvalue()[-OUTPUT_LIMIT:]})
+        progress(50, message='Generating users and gamification data')
+        if not setup_database.GamificationGenerator().generate_all():
+            raise JobFailed('Failed to generate gamification data',
+                            result={'output': output.getvalue()[-OUTPUT_LIMIT:]})
+    return {'output': output.getvalue()[-OUTPUT_LIMIT:]}
+
+
+# Management commands that can run as jobs, with their options as job args.
+# Each accepts a `progress` callback option (see accounts/jobs.py).
+COMMANDS = [
+    'rebuild_activity_rollups',
+    'rollover_leaderboards',
+    'archive_activity_logs',
+    'award_streak_milestones',
+    'populate_data',
+    'populate_lesson_questions',
+]
+
+
+def _command_task(name):
+    def run_command(progress, **options):
+        output = io.StringIO()
+        try:
+            # Each command reports its own progress through the `progress` stealth option
+            call_command(name, stdout=output, stderr=output, progress=progress, **options)
+        except (CommandError, TypeError) as e:
+            raise JobFailed(f'{name}: {e}', result={'output': output.getvalue()[-OUTPUT_LIMIT:]})
+        return {'output': output.getvalue()[-OUTPUT_LIMIT:]}
+    run_command.__doc__ = f'Run `manage.py {name}`.'
+    return run_command
+
+
+for _name in COMMANDS:
+    task(_name)(_command_task(_name))
@@ -0,0 +1,250 @@
+"""
+Database-backed background jobs.
+
+Heavy admin operations (bulk imports, analytics and leaderboard rebuilds,
+data population) are queued as Job rows and run by `manage.py run_jobs`
+workers instead of inside a request. Tasks are plain functions registered
+with @task (see accounts/job_tasks.py) and called as fn(progress, **args);
+their return value is stored as the job's result.
+
+- Claiming is a conditional UPDATE from 'queued' to 'running', so any
+  number of workers can share the queue, on SQLite too.
+- A failed job is retried with exponential backoff until max_attempts.
+  A task raises JobFailed for errors that retrying cannot fix.
+- While a job runs, its worker bumps heartbeat_at. Jobs whose worker
+  died are retried once their heartbeat is older than JOB_STALE_AFTER.
+- With REDIS_URL set (and the redis package installed), enqueueing wakes
+  idle workers through a Redis list. Otherwise workers poll every
+  JOB_POLL_INTERVAL seconds.
+
+Management commands run as jobs take the job's Progress as a `progress`
+option (a stealth option, so it is only settable from call_command) and
+report through it, defaulting to no_progress on the command line.
+"""
+
+import datetime
+import inspect
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+WAKEUP_KEY = 'jobs:wakeup'
+# Progress is written at most this often (seconds)
+PROGRESS_INTERVAL = 1.0
+
+TASKS = {}
+
+
+class JobFailed(Exception):
+    """Raised by a task for a failure that retrying will not fix."""
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+def task(name):
+    """Register a function as the task `name`."""
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+# =============================================================================
+# ENQUEUEING
+# =============================================================================
+
+def enqueue(task_name, args=None, user=None, max_attempts=None, run_at=None):
+    """Queue a job for a registered task; workers are woken once the transaction commits."""
+    if task_name not in TASKS:
+        raise ValueError(f'Unknown task "{task_name}"')
+    try:
+        inspect.signature(TASKS[task_name]).bind(None, **(args or {}))
+    except TypeError as e:
+        raise ValueError(f'Invalid arguments for "{task_name}": {e}')
+    job = Job.objects.create(
+        task=task_name,
+        args=args or {},
+        created_by=user if user is not None and user.is_authenticated else None,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_at=run_at or timezone.now(),
+    )
+    transaction.on_commit(_wake)
+    return job
+
+
+def cancel(job_id):
+    """Cancel a job that has not started yet. Returns True if it was cancelled."""
+    return bool(Job.objects.filter(id=job_id, status='queued').update(
+        status='cancelled', finished_at=timezone.now()
+    ))
+
+
+_redis_client = None
+
+
+def _redis():
+    """Redis client for worker wake-ups, or None to poll."""
+    global _redis_client
+    if _redis_client is None and settings.REDIS_URL:
+        try:
+            import redis
+        except ImportError:
+            logger.warning('REDIS_URL is set but the redis package is not installed; job workers will poll')
+            _redis_client = False
+        else:
+            _redis_client = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis_client or None
+
+
+def _wake():
+    client = _redis()
+    if client is None:
+        return
+    try:
+        client.rpush(WAKEUP_KEY, 1)
+        client.ltrim(WAKEUP_KEY, -100, -1)
+    except Exception:
+        logger.warning('Could not wake job workers through Redis', exc_info=True)
+
+
+def wait_for_work(timeout):
+    """Block until a job may be available or `timeout` seconds pass."""
+    client = _redis()
+    if client is not None:
+        try:
+            client.blpop([WAKEUP_KEY], timeout=max(1, int(timeout)))
+            return
+        except Exception:
+            logger.warning('Could not wait on Redis; polling instead', exc_info=True)
+    time.sleep(timeout)
+
+
+# =============================================================================
+# RUNNING
+# =============================================================================
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker):
+    """Take the oldest due queued job for this worker, or return None."""
+    now = timezone.now()
+    candidates = Job.objects.filter(status='queued', run_at__lte=now).order_by('run_at', 'created_at')
+    for job_id in candidates.values_list('id', flat=True)[:10]:
+        claimed = Job.objects.filter(id=job_id, status='queued').update(
+            status='running', worker=worker, attempts=F('attempts') + 1,
+            started_at=now, heartbeat_at=now, progress=0, progress_message=''
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def requeue_stale():
+    """Retry (or fail) running jobs whose worker stopped sending heartbeats. Returns how many."""
+    cutoff = timezone.now() - datetime.timedelta(seconds=settings.JOB_STALE_AFTER)
+    stale = Job.objects.filter(status='running', heartbeat_at__lt=cutoff)
+    count = 0
+    for job in stale:
+        count += _finish_failed(job, 'Worker stopped responding', expect_worker=job.worker)
+    return count
+
+
+class Progress:
+    """
+    Passed to tasks to report progress: progress(done, total, message), or
+    progress(percent, message=...) without a total.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._written = 0.0
+
+    def __call__(self, done, total=None, message=''):
+        now = time.monotonic()
+        if now - self._written < PROGRESS_INTERVAL and not (total and done >= total):
+            return
+        self._written = now
+        percent = min(100.0, done * 100.0 / total) if total else done
+        Job.objects.filter(id=self.job_id).update(
+            progress=round(percent, 1), progress_message=message[:255], heartbeat_at=timezone.now()
+        )
+
+
+def no_progress(done, total=None, message=''):
+    """Progress callback for code that can run outside a job."""
+
+
+class _Heartbeat(threading.Thread):
+    """Bumps a running job's heartbeat until stopped."""
+
+    def __init__(self, job_id):
+        super().__init__(name=f'job-heartbeat-{job_id}', daemon=True)
+        self.job_id = job_id
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(settings.JOB_HEARTBEAT_INTERVAL):
+                try:
+                    Job.objects.filter(id=self.job_id, status='running').update(heartbeat_at=timezone.now())
+                except Exception:
+                    logger.warning('Could not record heartbeat for job %s', self.job_id, exc_info=True)
+        finally:
+            connection.close()
+
+
+def run(job):
+    """Run a claimed job and record its outcome. Returns the job's final status."""
+    func = TASKS.get(job.task)
+    heartbeat = _Heartbeat(job.id)
+    heartbeat.start()
+    try:
+        if func is None:
+            raise JobFailed(f'Unknown task "{job.task}"')
+        result = func(Progress(job.id), **job.args)
+    except JobFailed as e:
+        _finish_failed(job, str(e), result=e.result, retry=False)
+    except Exception:
+        logger.exception('Job %s (%s) failed', job.id, job.task)
+        _finish_failed(job, traceback.format_exc(limit=20))
+    else:
+        Job.objects.filter(id=job.id, status='running').update(
+            status='succeeded', progress=100, result=result, error='', finished_at=timezone.now()
+        )
+    finally:
+        heartbeat.stopped.set()
+        heartbeat.join()
+    job.refresh_from_db()
+    return job.status
+
+
+def _finish_failed(job, error, result=None, retry=True, expect_worker=None):
+    """Queue a failed job for another attempt, or mark it failed. Returns 1 if the row changed."""
+    running = Job.objects.filter(id=job.id, status='running')
+    if expect_worker is not None:
+        running = running.filter(worker=expect_worker)
+
+    if retry and job.attempts < job.max_attempts:
+        delay = settings.JOB_RETRY_BACKOFF * 2 ** max(job.attempts - 1, 0)
+        return running.update(
+            status='queued', error=error, result=result,
+            run_at=timezone.now() + datetime.timedelta(seconds=delay)
+        )
+    return running.update(status='failed', error=error, result=result, finished_at=timezone.now())
@@ -0,0 +1,72 @@
+"""
+Management command to archive and prune old activity logs.
+
+Every whole month that ended before the retention window is written to a
+gzipped NDJSON archive and deleted from ActivityLog in bounded batches.
+"""
+
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts import activity_archive
+from accounts.jobs import no_progress
+from accounts.models import ActivityLog
+
+
+class Command(BaseCommand):
+    help = 'Move activity logs of months older than the retention window to compressed archives'
+    stealth_options = ('progress',)  # A job's Progress (see accounts/jobs.py)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.ACTIVITY_LOG_RETENTION_DAYS,
+            help='Days of activity logs to keep (default: ACTIVITY_LOG_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows deleted per transaction (default: 1000)',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.05,
+            help='Seconds to wait between delete batches (default: 0.05)',
+        )
+        parser.add_argument(
+            '--no-archive',
+            action='store_true',
+            help='Delete old rows without writing archives',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.localdate() - datetime.timedelta(days=options['days'])
+        # Only whole months before the cutoff's month are archived
+        first_kept = cutoff.replace(day=1)
+
+        oldest = ActivityLog.objects.order_by('created_at').values_list('created_at', flat=True).first()
+        if oldest is None or timezone.localdate(oldest) >= first_kept:
+            self.stdout.write(self.style.SUCCESS('✓ No activity logs to archive'))
+            return
+
+        progress = options.get('progress') or no_progress
+        month, total = timezone.localdate(oldest).replace(day=1), 0
+        months = (first_kept.year - month.year) * 12 + first_kept.month - month.month
+        for done in range(months):
+            progress(done, months, f'Archiving {month:%Y-%m}')
+            path, deleted = activity_archive.archive_month(
+                month, options['batch_size'], options['pause'], write=not options['no_archive']
+            )
+            if deleted:
+                target = f' -> {path}' if path else ''
+                self.stdout.write(f'  {month:%Y-%m}: {deleted} rows{target}')
+            total += deleted
+            month = (month + datetime.timedelta(days=32)).replace(day=1)
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Archived {total} activity logs older than {first_kept}'))
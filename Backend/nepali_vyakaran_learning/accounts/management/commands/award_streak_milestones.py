@@ -0,0 +1,20 @@
+"""
+Management command to pay streak milestone rewards.
+"""
+
+from django.core.management.base import BaseCommand
+
+from accounts import streaks
+from accounts.jobs import no_progress
+
+
+class Command(BaseCommand):
+    help = 'Pay coin rewards for streak milestones reached but not yet rewarded'
+    stealth_options = ('progress',)  # A job's Progress (see accounts/jobs.py)
+
+    def handle(self, *args, **options):
+        (options.get('progress') or no_progress)(0, message='Paying streak milestones')
+        paid = streaks.award_milestones()
+        for user, milestone, coins in paid:
+            self.stdout.write(f'  {user.username}: {milestone}-day streak, {coins} coins')
+        self.stdout.write(self.style.SUCCESS(f'✓ Paid {len(paid)} streak milestones'))
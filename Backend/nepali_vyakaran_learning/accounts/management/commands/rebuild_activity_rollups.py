@@ -0,0 +1,40 @@
+"""
+Management command to rebuild daily activity rollups from the activity log.
+"""
+
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts import activity_rollups
+from accounts.jobs import no_progress
+from accounts.models import ActivityLog
+
+
+class Command(BaseCommand):
+    help = 'Recompute daily per-user activity rollups from the raw activity log'
+    stealth_options = ('progress',)  # A job's Progress (see accounts/jobs.py)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Only rebuild the last N days (default: every day still in the activity log)',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] is not None:
+            since = timezone.localdate() - datetime.timedelta(days=options['days'])
+        else:
+            oldest = ActivityLog.objects.order_by('created_at').values_list('created_at', flat=True).first()
+            if oldest is None:
+                self.stdout.write(self.style.SUCCESS('✓ No activity to roll up'))
+                return
+            # Earlier days were archived (whole months at a time); keep their rollups
+            since = timezone.localdate(oldest)
+
+        (options.get('progress') or no_progress)(0, message=f'Rebuilding rollups since {since}')
+        written = activity_rollups.rebuild(since)
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt {written} daily activity rollups since {since}'))
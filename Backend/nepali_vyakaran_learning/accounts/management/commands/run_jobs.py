@@ -0,0 +1,66 @@
+"""
+Management command to run background jobs.
+
+Run one or more workers next to the web server, e.g. under systemd or as
+an extra container: `python manage.py run_jobs`. On SIGTERM or SIGINT the
+worker finishes its current job and exits.
+"""
+
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the jobs that are due and exit instead of waiting for more',
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=settings.JOB_POLL_INTERVAL,
+            help='Seconds to wait between checks for new jobs (default: JOB_POLL_INTERVAL)',
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        worker = jobs.worker_name()
+        self.stdout.write(f'Worker {worker} started ({len(jobs.TASKS)} tasks)')
+
+        ran = 0
+        while not self.stopping:
+            close_old_connections()
+            stale = jobs.requeue_stale()
+            if stale:
+                self.stdout.write(self.style.WARNING(f'  Requeued {stale} stale job(s)'))
+
+            job = jobs.claim(worker)
+            if job is None:
+                if options['once']:
+                    break
+                jobs.wait_for_work(options['poll'])
+                continue
+
+            self.stdout.write(f'  {job.task} [{job.id}] attempt {job.attempts}/{job.max_attempts}')
+            status = jobs.run(job)
+            style = self.style.SUCCESS if status == 'succeeded' else self.style.ERROR
+            self.stdout.write(style(f'  {job.task} [{job.id}] {status}'))
+            ran += 1
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Worker {worker} stopped after {ran} job(s)'))
+
+    def stop(self, signum, frame):
+        self.stdout.write('Stopping after the current job...')
+        self.stopping = True
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:18
+
+from django.db import migrations, models
+
+
+# Milestone streak lengths at the time of this migration (accounts/streaks.py)
+MILESTONES = [7, 30, 100]
+
+
+def backfill_streak_milestones(apps, schema_editor):
+    """
+    Mark the milestones existing streaks have already passed as rewarded,
+    so award_streak_milestones does not pay them a second time.
+    """
+    GameState = apps.get_model('accounts', 'GameState')
+    
+    for low, high in zip(MILESTONES, MILESTONES[1:] + [None]):
+        streaks = GameState.objects.filter(current_streak__gte=low)
+        if high is not None:
+            streaks = streaks.filter(current_streak__lt=high)
+        streaks.update(streak_milestone=low)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamestate',
+            name='streak_milestone',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_streak_milestones, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='usersettings',
+            name='timezone',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_streak_milestone_timezone'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gamestate',
+            index=models.Index(fields=['-points', 'user'], name='gamestate_points_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gamestate',
+            index=models.Index(fields=['-level', 'user'], name='gamestate_level_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gamestate',
+            index=models.Index(fields=['-current_streak', 'user'], name='gamestate_streak_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,153 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:34
+
+import hashlib
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copies of the helpers in accounts/user_agents.py as of this
+# migration, so later changes to that module do not change what it does
+MAX_LENGTH = 1024
+CHUNK_SIZE = 900  # Rows per chunk; also bounds the IN (...) lookups under SQLite's parameter limit
+
+BROWSERS = [
+    ('Edge', re.compile(r'Edg(?:e|A|iOS)?/')),
+    ('Opera', re.compile(r'OPR/|Opera')),
+    ('Samsung Internet', re.compile(r'SamsungBrowser/')),
+    ('Chrome', re.compile(r'Chrome/|CriOS/')),
+    ('Firefox', re.compile(r'Firefox/|FxiOS/')),
+    ('Safari', re.compile(r'Safari/')),
+    ('Internet Explorer', re.compile(r'MSIE |Trident/')),
+]
+
+OPERATING_SYSTEMS = [
+    ('Android', re.compile(r'Android')),
+    ('iOS', re.compile(r'iPhone|iPad|iPod')),
+    ('Windows', re.compile(r'Windows')),
+    ('macOS', re.compile(r'Macintosh|Mac OS X')),
+    ('Linux', re.compile(r'Linux|X11')),
+]
+
+BOT = re.compile(r'bot|crawl|spider|slurp|curl|wget|python-requests|httpclient', re.IGNORECASE)
+TABLET = re.compile(r'iPad|Tablet|Android(?!.*Mobile)')
+MOBILE = re.compile(r'Mobi|iPhone|iPod|Android')
+
+
+def _first_match(patterns, user_agent):
+    for name, pattern in patterns:
+        if pattern.search(user_agent):
+            return name
+    return 'Other'
+
+
+def parse(user_agent):
+    if BOT.search(user_agent):
+        device = 'bot'
+    elif TABLET.search(user_agent):
+        device = 'tablet'
+    elif MOBILE.search(user_agent):
+        device = 'mobile'
+    else:
+        device = 'desktop'
+    return {
+        'device': device,
+        'browser': _first_match(BROWSERS, user_agent),
+        'os': _first_match(OPERATING_SYSTEMS, user_agent),
+    }
+
+
+def ua_hash(user_agent):
+    return hashlib.sha1(user_agent.encode('utf-8')).hexdigest()
+
+
+def _chunks(queryset, fields):
+    """Yield lists of rows in primary key order, CHUNK_SIZE at a time."""
+    last = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last).order_by('pk').only('pk', *fields)[:CHUNK_SIZE])
+        if not rows:
+            return
+        yield rows
+        last = rows[-1].pk
+
+
+def intern_user_agents(apps, schema_editor):
+    """
+    Move existing user agent strings into UserAgent rows in one pass over
+    ActivityLog: each chunk creates the agents it has not seen yet and
+    links its rows with bulk_update.
+    """
+    ActivityLog = apps.get_model('accounts', 'ActivityLog')
+    UserAgent = apps.get_model('accounts', 'UserAgent')
+    
+    ids = {}  # truncated user agent string -> UserAgent id
+    logs = ActivityLog.objects.exclude(user_agent_string='')
+    for rows in _chunks(logs, ['user_agent_string']):
+        new = {row.user_agent_string[:MAX_LENGTH] for row in rows} - ids.keys()
+        if new:
+            UserAgent.objects.bulk_create(
+                [UserAgent(ua_hash=ua_hash(value), user_agent=value, **parse(value)) for value in new],
+                ignore_conflicts=True
+            )
+            hashes = {ua_hash(value): value for value in new}
+            for digest, agent_id in UserAgent.objects.filter(ua_hash__in=hashes).values_list('ua_hash', 'id'):
+                ids[hashes[digest]] = agent_id
+        
+        for row in rows:
+            row.user_agent_id = ids[row.user_agent_string[:MAX_LENGTH]]
+        ActivityLog.objects.bulk_update(rows, ['user_agent'])
+
+
+def restore_user_agents(apps, schema_editor):
+    ActivityLog = apps.get_model('accounts', 'ActivityLog')
+    UserAgent = apps.get_model('accounts', 'UserAgent')
+    
+    strings = dict(UserAgent.objects.values_list('id', 'user_agent'))
+    logs = ActivityLog.objects.filter(user_agent__isnull=False)
+    for rows in _chunks(logs, ['user_agent']):
+        for row in rows:
+            row.user_agent_string = strings[row.user_agent_id]
+        ActivityLog.objects.bulk_update(rows, ['user_agent_string'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_activitylog_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAgent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ua_hash', models.CharField(max_length=40, unique=True)),
+                ('user_agent', models.TextField()),
+                ('device', models.CharField(choices=[('desktop', 'Desktop'), ('mobile', 'Mobile'), ('tablet', 'Tablet'), ('bot', 'Bot')], default='desktop', max_length=10)),
+                ('browser', models.CharField(default='Other', max_length=30)),
+                ('os', models.CharField(default='Other', max_length=30)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'User Agent',
+                'verbose_name_plural': 'User Agents',
+            },
+        ),
+        migrations.RenameField(
+            model_name='activitylog',
+            old_name='user_agent',
+            new_name='user_agent_string',
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='user_agent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='activity_logs', to='accounts.useragent'),
+        ),
+        migrations.RunPython(intern_user_agents, restore_user_agents),
+        migrations.RemoveField(
+            model_name='activitylog',
+            name='user_agent_string',
+        ),
+    ]
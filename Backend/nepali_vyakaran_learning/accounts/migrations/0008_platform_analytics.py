@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_daily_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('metric', models.CharField(choices=[('signups', 'Signups'), ('active_users', 'Active Users'), ('activities', 'Activities'), ('lesson_completions', 'Lesson Completions'), ('lessons_completed', 'Lessons Completed (first time)'), ('quiz_attempts', 'Quiz Attempts'), ('quiz_passes', 'Quiz Passes'), ('points_awarded', 'Points Awarded')], max_length=30)),
+                ('key', models.CharField(blank=True, default='', max_length=255)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Platform Daily Stat',
+                'verbose_name_plural': 'Platform Daily Stats',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='dailyactivity',
+            index=models.Index(fields=['day', 'user'], name='dailyactivity_day_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='platformdailystat',
+            constraint=models.UniqueConstraint(fields=('metric', 'day', 'key'), name='unique_platform_daily_stat'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_platform_analytics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActiveUserSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('registers', models.BinaryField()),
+                ('version', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Active User Sketch',
+                'verbose_name_plural': 'Active User Sketches',
+                'ordering': ['-day'],
+            },
+        ),
+    ]
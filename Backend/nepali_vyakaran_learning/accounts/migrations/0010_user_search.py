@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:44
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+FTS_SQL = [
+    """CREATE VIRTUAL TABLE accounts_user_search USING fts5(
+        user_id UNINDEXED, username, email, tokenize='trigram'
+    )""",
+    """CREATE TRIGGER accounts_user_search_insert AFTER INSERT ON accounts_customuser BEGIN
+        INSERT INTO accounts_user_search (user_id, username, email) VALUES (new.id, new.username, new.email);
+    END""",
+    # Emails are unique, so the old row is found through the email trigrams
+    """CREATE TRIGGER accounts_user_search_delete AFTER DELETE ON accounts_customuser BEGIN
+        DELETE FROM accounts_user_search WHERE rowid IN (
+            SELECT rowid FROM accounts_user_search
+            WHERE email MATCH '"' || replace(old.email, '"', '""') || '"'
+        ) AND user_id = old.id;
+    END""",
+    """CREATE TRIGGER accounts_user_search_update AFTER UPDATE OF username, email ON accounts_customuser BEGIN
+        DELETE FROM accounts_user_search WHERE rowid IN (
+            SELECT rowid FROM accounts_user_search
+            WHERE email MATCH '"' || replace(old.email, '"', '""') || '"'
+        ) AND user_id = old.id;
+        INSERT INTO accounts_user_search (user_id, username, email) VALUES (new.id, new.username, new.email);
+    END""",
+    """INSERT INTO accounts_user_search (user_id, username, email)
+        SELECT id, username, email FROM accounts_customuser""",
+]
+
+
+def create_search_index(apps, schema_editor):
+    """Create the trigram search index on SQLite builds with FTS5 trigram support."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x, tokenize='trigram')")
+        except Exception:
+            return  # Substring search falls back to icontains
+        cursor.execute('DROP TABLE temp.fts5_probe')
+    for sql in FTS_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for trigger in ('insert', 'delete', 'update'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS accounts_user_search_{trigger}')
+    schema_editor.execute('DROP TABLE IF EXISTS accounts_user_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_active_user_sketch'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['date_joined', 'id'], name='customuser_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(django.db.models.functions.text.Lower('username'), name='customuser_username_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='customuser_email_lower_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
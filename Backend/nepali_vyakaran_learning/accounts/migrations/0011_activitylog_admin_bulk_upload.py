@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_user_search'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activitylog',
+            name='activity_type',
+            field=models.CharField(choices=[('login', 'Login'), ('logout', 'Logout'), ('lesson_start', 'Lesson Started'), ('lesson_complete', 'Lesson Completed'), ('quiz_start', 'Quiz Started'), ('quiz_complete', 'Quiz Completed'), ('achievement_earned', 'Achievement Earned'), ('badge_earned', 'Badge Earned'), ('level_up', 'Level Up'), ('streak_milestone', 'Streak Milestone'), ('points_earned', 'Points Earned'), ('coins_earned', 'Coins Earned'), ('coins_spent', 'Coins Spent'), ('zone_unlocked', 'Zone Unlocked'), ('profile_updated', 'Profile Updated'), ('settings_changed', 'Settings Changed'), ('game_played', 'Game Played'), ('writing_submitted', 'Writing Submitted'), ('quest_started', 'Quest Started'), ('quest_completed', 'Quest Completed'), ('admin_bulk_upload', 'Admin Bulk Upload')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:31
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_totals(apps, schema_editor):
+    """
+    Count every existing user on their join day, so the signups cells add
+    up to the number of users, and put today's game state totals in
+    today's cells.
+    """
+    PlatformDailyStat = apps.get_model('accounts', 'PlatformDailyStat')
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    GameState = apps.get_model('accounts', 'GameState')
+
+    cells = {}
+    signups = CustomUser.objects.annotate(day=TruncDate('date_joined')).values('day').annotate(
+        n=Count('id')
+    ).order_by()
+    for row in signups:
+        cells[('signups', row['day'])] = row['n']
+
+    today = timezone.localdate()
+    held = GameState.objects.aggregate(game_states=Count('id'), points_total=Sum('points'), level_total=Sum('level'))
+    for metric, value in held.items():
+        cells[(metric, today)] = value or 0
+
+    PlatformDailyStat.objects.filter(metric__in=['signups', *held]).delete()
+    PlatformDailyStat.objects.bulk_create([
+        PlatformDailyStat(metric=metric, day=day, key='', value=value)
+        for (metric, day), value in cells.items()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='platformdailystat',
+            name='metric',
+            field=models.CharField(choices=[('signups', 'Signups'), ('active_users', 'Active Users'), ('activities', 'Activities'), ('lesson_completions', 'Lesson Completions'), ('lessons_completed', 'Lessons Completed (first time)'), ('quiz_attempts', 'Quiz Attempts'), ('quiz_passes', 'Quiz Passes'), ('points_awarded', 'Points Awarded'), ('game_states', 'Game States'), ('points_total', 'Points Held'), ('level_total', 'Levels Held')], max_length=30),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:15
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_platform_totals'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='gamestate',
+            name='gamestate_points_rank_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='gamestate',
+            name='gamestate_level_rank_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='gamestate',
+            name='gamestate_streak_rank_idx',
+        ),
+    ]
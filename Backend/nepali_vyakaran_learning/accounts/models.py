@@ -6,6 +6,7 @@ Handles user management, authentication, game state, and user settings.
 import uuid
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 from django.conf import settings
 
@@ -30,6 +31,12 @@ class CustomUser(AbstractUser):
         verbose_name = 'User'
         verbose_name_plural = 'Users'
         ordering = ['-date_joined']
+        indexes = [
+            # Admin user list cursors and prefix search (see accounts/user_search.py)
+            models.Index(fields=['date_joined', 'id'], name='customuser_joined_idx'),
+            models.Index(Lower('username'), name='customuser_username_lower_idx'),
+            models.Index(Lower('email'), name='customuser_email_lower_idx'),
+        ]
     
     def __str__(self):
         return self.email
@@ -61,7 +68,8 @@ class GameState(models.Model):
     # Streak tracking
     current_streak = models.PositiveIntegerField(default=0)
     longest_streak = models.PositiveIntegerField(default=0)
-    last_activity_date = models.DateField(null=True, blank=True)
+    last_activity_date = models.DateField(null=True, blank=True)  # user's local day
+    streak_milestone = models.PositiveIntegerField(default=0)  # highest milestone rewarded this streak
     
     # Progress tracking
     total_correct_answers = models.PositiveIntegerField(default=0)
@@ -82,6 +90,9 @@ class GameState(models.Model):
         verbose_name = 'Game State'
         verbose_name_plural = 'Game States'
     
+    # Fields add_points() changes, refreshed from the database after each update
+    LEVEL_FIELDS = ['points', 'level', 'experience', 'experience_to_next_level']
+    
     def __str__(self):
         return f"{self.user.username}'s Game State - Level {self.level}"
     
@@ -92,20 +103,48 @@ class GameState(models.Model):
             return 0
         return round((self.total_correct_answers / self.total_questions_attempted) * 100, 2)
     
-    def add_points(self, points, reason=''):
-        """Add points and check for level up."""
-        self.points += points
-        self.experience += points
+    def add_points(self, points, reason='', experience=None):
+        """
+        Add points (and experience, by default the same amount) and check for
+        level up.
+
+        Points and experience are added with an F() update and level-ups are
+        a compare-and-swap on (level, experience), so concurrent rewards are
+        never lost. Only the point and level fields of this instance are
+        refreshed; save other fields with save(update_fields=...).
+        """
+        experience = points if experience is None else experience
+        GameState.objects.filter(pk=self.pk).update(
+            points=models.F('points') + points,
+            experience=models.F('experience') + experience,
+            updated_at=timezone.now()
+        )
         
-        # Check for level up
         level_up = False
-        while self.experience >= self.experience_to_next_level:
-            self.experience -= self.experience_to_next_level
-            self.level += 1
-            self.experience_to_next_level = self.calculate_next_level_exp()
-            level_up = True
+        while True:
+            self.refresh_from_db(fields=self.LEVEL_FIELDS)
+            if self.experience < self.experience_to_next_level:
+                break
+            current_level, current_experience = self.level, self.experience
+            while self.experience >= self.experience_to_next_level:
+                self.experience -= self.experience_to_next_level
+                self.level += 1
+                self.experience_to_next_level = self.calculate_next_level_exp()
+            if GameState.objects.filter(
+                pk=self.pk, level=current_level, experience=current_experience
+            ).update(
+                level=self.level,
+                experience=self.experience,
+                experience_to_next_level=self.experience_to_next_level,
+                updated_at=timezone.now()
+            ):
+                level_up = True
+        
+        from learning_vyakaran import leaderboards
+        leaderboards.record_points(self.user_id, points, self.points)
+        if level_up:
+            leaderboards.record(self.user_id, 'level', self.level, mode='set')
         
-        self.save()
         return level_up, self.level
     
     def calculate_next_level_exp(self):
@@ -113,28 +152,12 @@ class GameState(models.Model):
         return int(100 * (1.5 ** (self.level - 1)))
     
     def update_streak(self):
-        """Update the user's learning streak."""
-        today = timezone.now().date()
-        
-        if self.last_activity_date is None:
-            self.current_streak = 1
-        elif self.last_activity_date == today:
-            # Already active today, no change
-            return self.current_streak
-        elif (today - self.last_activity_date).days == 1:
-            # Consecutive day
-            self.current_streak += 1
-        else:
-            # Streak broken
-            self.current_streak = 1
-        
-        self.last_activity_date = today
-        
-        if self.current_streak > self.longest_streak:
-            self.longest_streak = self.current_streak
-        
-        self.save()
-        return self.current_streak
+        """
+        Count today (the user's local day) towards the streak.
+        See accounts/streaks.py; a no-op once today is already counted.
+        """
+        from . import streaks
+        return streaks.record_activity(self.user_id, instance=self)
 
 
 class UserSettings(models.Model):
@@ -172,6 +195,7 @@ class UserSettings(models.Model):
     # Learning preferences
     difficulty = models.CharField(max_length=10, choices=DIFFICULTY_CHOICES, default='adaptive')
     daily_goal_minutes = models.PositiveIntegerField(default=15)
+    timezone = models.CharField(max_length=64, blank=True)  # IANA name; blank = server time zone
     
     # Audio/Visual settings
     sound_enabled = models.BooleanField(default=True)
@@ -258,6 +282,33 @@ class OTPVerification(models.Model):
         return otp
 
 
+class UserAgent(models.Model):
+    """
+    A distinct User-Agent string with its parsed device, browser and OS.
+    Activity logs reference these rows instead of repeating the string.
+    """
+    DEVICE_CHOICES = [
+        ('desktop', 'Desktop'),
+        ('mobile', 'Mobile'),
+        ('tablet', 'Tablet'),
+        ('bot', 'Bot'),
+    ]
+    
+    ua_hash = models.CharField(max_length=40, unique=True)  # SHA-1 of user_agent
+    user_agent = models.TextField()
+    device = models.CharField(max_length=10, choices=DEVICE_CHOICES, default='desktop')
+    browser = models.CharField(max_length=30, default='Other')
+    os = models.CharField(max_length=30, default='Other')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'User Agent'
+        verbose_name_plural = 'User Agents'
+    
+    def __str__(self):
+        return f"{self.browser} on {self.os} ({self.device})"
+
+
 class ActivityLog(models.Model):
     """
     Logs user activities for analytics and tracking.
@@ -283,6 +334,7 @@ class ActivityLog(models.Model):
         ('writing_submitted', 'Writing Submitted'),
         ('quest_started', 'Quest Started'),
         ('quest_completed', 'Quest Completed'),
+        ('admin_bulk_upload', 'Admin Bulk Upload'),
     ]
     
     user = models.ForeignKey(
@@ -294,8 +346,15 @@ class ActivityLog(models.Model):
     description = models.TextField(blank=True)
     metadata = models.JSONField(default=dict, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    user_agent = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    user_agent = models.ForeignKey(
+        UserAgent,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='activity_logs'
+    )
+    # Set when the event happens, not when the background writer flushes it
+    created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         verbose_name = 'Activity Log'
@@ -304,6 +363,8 @@ class ActivityLog(models.Model):
         indexes = [
             models.Index(fields=['user', 'activity_type']),
             models.Index(fields=['created_at']),
+            # History and per-user period filters
+            models.Index(fields=['user', '-created_at'], name='activitylog_user_created_idx'),
         ]
     
     def __str__(self):
@@ -311,24 +372,153 @@ class ActivityLog(models.Model):
     
     @classmethod
     def log_activity(cls, user, activity_type, description='', metadata=None, request=None):
-        """Create a new activity log entry."""
-        ip_address = None
-        user_agent = ''
-        
-        if request:
-            x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-            if x_forwarded_for:
-                ip_address = x_forwarded_for.split(',')[0]
-            else:
-                ip_address = request.META.get('REMOTE_ADDR')
-            user_agent = request.META.get('HTTP_USER_AGENT', '')
-        
-        return cls.objects.create(
-            user=user,
-            activity_type=activity_type,
-            description=description,
-            metadata=metadata or {},
-            ip_address=ip_address,
-            user_agent=user_agent
-        )
+        """
+        Record an activity entry (written in the background, see
+        accounts/activity.py). Returns None: in async mode the row does not
+        exist yet, so no caller may rely on getting it back.
+        """
+        from . import activity
+        activity.log(user, activity_type, description, metadata, request)
 
+
+class DailyActivity(models.Model):
+    """
+    Per user and local day activity counts, kept up to date as activity is
+    logged and kept after old ActivityLog rows are archived.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='daily_activity'
+    )
+    day = models.DateField()  # user's local day
+    
+    total = models.PositiveIntegerField(default=0)
+    counts = models.JSONField(default=dict, blank=True)  # activity_type -> count
+    
+    class Meta:
+        verbose_name = 'Daily Activity'
+        verbose_name_plural = 'Daily Activity'
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_daily_activity'),
+        ]
+        indexes = [
+            # Platform-wide active user counts over a range of days
+            models.Index(fields=['day', 'user'], name='dailyactivity_day_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} on {self.day}: {self.total} activities"
+
+
+class PlatformDailyStat(models.Model):
+    """
+    One cell of the platform analytics cube: a metric's value for one day,
+    optionally broken down by key (a lesson or quiz id).
+    """
+    METRIC_CHOICES = [
+        ('signups', 'Signups'),
+        ('active_users', 'Active Users'),
+        ('activities', 'Activities'),
+        ('lesson_completions', 'Lesson Completions'),
+        ('lessons_completed', 'Lessons Completed (first time)'),
+        ('quiz_attempts', 'Quiz Attempts'),
+        ('quiz_passes', 'Quiz Passes'),
+        ('points_awarded', 'Points Awarded'),
+        # Net daily changes; summed over all days they give the current totals
+        ('game_states', 'Game States'),
+        ('points_total', 'Points Held'),
+        ('level_total', 'Levels Held'),
+    ]
+    
+    day = models.DateField()
+    metric = models.CharField(max_length=30, choices=METRIC_CHOICES)
+    key = models.CharField(max_length=255, blank=True, default='')  # '' = whole platform
+    value = models.BigIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Platform Daily Stat'
+        verbose_name_plural = 'Platform Daily Stats'
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['metric', 'day', 'key'], name='unique_platform_daily_stat'),
+        ]
+    
+    def __str__(self):
+        key = f' [{self.key}]' if self.key else ''
+        return f"{self.metric}{key} on {self.day}: {self.value}"
+
+
+class ActiveUserSketch(models.Model):
+    """
+    HyperLogLog sketch of the users active on one day (see accounts/hll.py),
+    merged across days for approximate active user counts.
+    """
+    day = models.DateField(unique=True)
+    registers = models.BinaryField()
+    version = models.PositiveIntegerField(default=0)  # bumped on every merge
+    
+    class Meta:
+        verbose_name = 'Active User Sketch'
+        verbose_name_plural = 'Active User Sketches'
+        ordering = ['-day']
+    
+    def __str__(self):
+        return f"Active users on {self.day}"
+
+
+class Job(models.Model):
+    """
+    A background job run by `manage.py run_jobs` (see accounts/jobs.py).
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    task = models.CharField(max_length=100)
+    args = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    
+    # Scheduling and retries
+    run_at = models.DateTimeField(default=timezone.now)  # not run before this time
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    
+    # Progress reporting
+    progress = models.FloatField(default=0)  # 0-100
+    progress_message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    
+    # Worker bookkeeping
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            # Workers claim the oldest due queued job and look for stale running ones
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.task} ({self.status})"
@@ -3,12 +3,14 @@ Serializers for the accounts app.
 Handles user registration, authentication, and profile management.
 """
 
+import zoneinfo
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model, authenticate
 from django.contrib.auth.password_validation import validate_password
 from dj_rest_auth.registration.serializers import RegisterSerializer
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from .models import GameState, UserSettings, OTPVerification, ActivityLog
+from .models import GameState, UserSettings, OTPVerification, ActivityLog, Job
 
 User = get_user_model()
 
@@ -153,6 +155,8 @@ class GameStateSerializer(serializers.ModelSerializer):
 class GameStateUpdateSerializer(serializers.ModelSerializer):
     """
     Serializer for updating game state.
+    Balances, level and streak are read-only: they only change through
+    rewards, the economy service and streak tracking.
     """
     class Meta:
         model = GameState
@@ -161,6 +165,14 @@ class GameStateUpdateSerializer(serializers.ModelSerializer):
             'current_streak', 'unlocked_zones', 'completed_lessons',
             'achievements', 'badges'
         ]
+        read_only_fields = ['level', 'points', 'coins', 'experience', 'current_streak']
+    
+    def update(self, instance, validated_data):
+        # Save only the submitted fields so concurrent credits and debits are kept
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
 
 
 class AddPointsSerializer(serializers.Serializer):
@@ -218,7 +230,7 @@ class UserSettingsSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserSettings
         fields = [
-            'language', 'theme', 'difficulty', 'daily_goal_minutes',
+            'language', 'theme', 'difficulty', 'daily_goal_minutes', 'timezone',
             'sound_enabled', 'music_enabled', 'animations_enabled',
             'email_notifications', 'push_notifications',
             'reminder_notifications', 'achievement_notifications',
@@ -227,6 +239,11 @@ class UserSettingsSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at']
 
+    def validate_timezone(self, value):
+        if value and value not in zoneinfo.available_timezones():
+            raise serializers.ValidationError('Unknown time zone.')
+        return value
+
 
 class NotificationSettingsSerializer(serializers.ModelSerializer):
     """
@@ -344,6 +361,22 @@ class ActivityLogSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for background job status (args are left out; they can be large).
+    """
+    created_by = serializers.CharField(source='created_by.username', read_only=True, default=None)
+    
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'task', 'status', 'progress', 'progress_message', 'result', 'error',
+            'attempts', 'max_attempts', 'run_at', 'created_by',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
 class UserStatsSerializer(serializers.Serializer):
     """
     Serializer for user statistics overview.
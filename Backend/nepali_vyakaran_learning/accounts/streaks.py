@@ -0,0 +1,175 @@
+"""
+Learning streaks.
+
+A day counts towards the streak on the user's first activity of that day,
+in the user's own time zone (UserSettings.timezone, falling back to the
+server time zone). Counting a day is one conditional UPDATE on GameState
+that only matches while `last_activity_date` is not yet today, so it is a
+no-op for any later activity that day. The counted day is also kept in the
+cache, so repeated activity normally costs no database queries at all.
+
+Milestone rewards are not paid inline. `manage.py award_streak_milestones`
+(or award_milestones() for a single user) pays every milestone the user's
+current streak has reached, claiming it first through
+GameState.streak_milestone so each milestone is paid once per streak.
+"""
+
+import datetime
+import zoneinfo
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import GameState, UserSettings, ActivityLog
+
+
+# Streak length -> coins awarded
+MILESTONES = {7: 50, 30: 200, 100: 500}
+
+STREAK_FIELDS = ['current_streak', 'longest_streak', 'last_activity_date', 'streak_milestone']
+
+CACHE_TIMEOUT = 60 * 60 * 24 * 2  # 2 days, covers any time zone's "today"
+
+
+def _day_key(user_id):
+    return f'streak_day:{user_id}'
+
+
+def _tz_key(user_id):
+    return f'user_tz:{user_id}'
+
+
+# =============================================================================
+# LOCAL DAYS
+# =============================================================================
+
+def get_timezone(name):
+    """Return the ZoneInfo for an IANA name, or the server time zone."""
+    if name:
+        try:
+            return zoneinfo.ZoneInfo(name)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            pass
+    return timezone.get_default_timezone()
+
+
+def user_timezone(user_id):
+    """The user's configured time zone, cached until their settings change."""
+    name = cache.get(_tz_key(user_id))
+    if name is None:
+        name = UserSettings.objects.filter(user_id=user_id).values_list('timezone', flat=True).first() or ''
+        cache.set(_tz_key(user_id), name, CACHE_TIMEOUT)
+    return get_timezone(name)
+
+
+def local_today(user_id, now=None):
+    """The user's current local date."""
+    return timezone.localdate(now or timezone.now(), user_timezone(user_id))
+
+
+def invalidate_timezone(sender, instance, **kwargs):
+    """Signal handler: drop the cached time zone when UserSettings change."""
+    cache.delete(_tz_key(instance.user_id))
+
+
+# =============================================================================
+# STREAK UPDATES
+# =============================================================================
+
+def _current_streak(user_id, instance):
+    if instance is not None:
+        return instance.current_streak
+    return GameState.objects.filter(user_id=user_id).values_list('current_streak', flat=True).first() or 0
+
+
+def record_activity(user_id, instance=None, now=None):
+    """
+    Count the user's current local day towards their streak and return the
+    current streak length.
+
+    Consecutive days extend the streak, a gap restarts it at 1 (and clears
+    the milestone marker). If `instance` is given, its streak fields are
+    refreshed after a change so a later save() does not overwrite them.
+    """
+    today = local_today(user_id, now)
+    if cache.get(_day_key(user_id)) == today.isoformat():
+        # Already counted today: nothing to write
+        return _current_streak(user_id, instance)
+
+    yesterday = today - datetime.timedelta(days=1)
+    continues = When(last_activity_date=yesterday, then=F('current_streak') + 1)
+
+    updated = GameState.objects.filter(user_id=user_id).exclude(last_activity_date=today).update(
+        current_streak=Case(continues, default=Value(1)),
+        longest_streak=Greatest(F('longest_streak'), Case(continues, default=Value(1))),
+        streak_milestone=Case(
+            When(last_activity_date=yesterday, then=F('streak_milestone')), default=Value(0)
+        ),
+        last_activity_date=today,
+        updated_at=timezone.now()
+    )
+    cache.set(_day_key(user_id), today.isoformat(), CACHE_TIMEOUT)
+
+    if updated and instance is not None:
+        instance.refresh_from_db(fields=STREAK_FIELDS)
+    current = _current_streak(user_id, instance)
+
+    if updated:
+        from learning_vyakaran import leaderboards
+        leaderboards.record(user_id, 'streak', current, mode='set')
+    return current
+
+
+def reset(user_id):
+    """Reset the user's current streak to zero."""
+    GameState.objects.filter(user_id=user_id).update(
+        current_streak=0, streak_milestone=0, updated_at=timezone.now()
+    )
+    from learning_vyakaran import leaderboards
+    leaderboards.record(user_id, 'streak', 0, mode='set')
+
+
+# =============================================================================
+# MILESTONES
+# =============================================================================
+
+def award_milestones(game_states=None, request=None):
+    """
+    Pay every streak milestone reached but not yet rewarded in the current
+    streak. Returns a list of (user, milestone, coins) that were paid.
+
+    Each milestone is claimed with a conditional UPDATE on streak_milestone
+    before coins are granted, so concurrent runs never pay twice.
+    """
+    from learning_vyakaran import economy
+
+    if game_states is None:
+        game_states = GameState.objects.all()
+
+    paid = []
+    for milestone, coins in sorted(MILESTONES.items()):
+        due = game_states.filter(
+            current_streak__gte=milestone, streak_milestone__lt=milestone
+        ).select_related('user').only('id', 'user')
+
+        for game_state in due.iterator(chunk_size=500):
+            user = game_state.user
+            with transaction.atomic():
+                claimed = GameState.objects.filter(
+                    id=game_state.id, current_streak__gte=milestone, streak_milestone__lt=milestone
+                ).update(streak_milestone=milestone)
+                if not claimed:
+                    continue
+                economy.grant(user, {'coins': coins}, reason='streak_milestone',
+                              metadata={'streak': milestone})
+                ActivityLog.log_activity(
+                    user, 'streak_milestone',
+                    f'Reached {milestone}-day streak!',
+                    metadata={'streak': milestone, 'coins_awarded': coins},
+                    request=request
+                )
+            paid.append((user, milestone, coins))
+    return paid
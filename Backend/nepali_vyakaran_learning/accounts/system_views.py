@@ -8,7 +8,7 @@ from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 
 from accounts.utils import success_response
 
@@ -89,51 +89,45 @@ class MetricsView(APIView):
     
     @extend_schema(
         summary="System Metrics",
-        description="Get system performance metrics (admin only)",
-        tags=["Monitoring"]
+        description="Get system performance metrics (admin only). The active user count is a "
+                    "HyperLogLog estimate unless exact=true.",
+        tags=["Monitoring"],
+        parameters=[
+            OpenApiParameter(name='exact', description='Count active users exactly (slower, for audits)', type=bool),
+        ]
     )
     def get(self, request):
-        from django.contrib.auth import get_user_model
-        from accounts.models import GameState, ActivityLog
-        from learning_vyakaran.models import Lesson, Quiz, LessonProgress, QuizResult
+        from django.db.models import Count, Q
+        from accounts import analytics
+        from learning_vyakaran.models import Lesson, Quiz
         from datetime import timedelta
         
-        User = get_user_model()
         now = timezone.now()
-        week_ago = now - timedelta(days=7)
+        week_start = timezone.localdate(now) - timedelta(days=6)
+        exact = request.query_params.get('exact', '').lower() in ('true', '1')
+        # Platform totals are kept in the analytics cube rather than aggregated per request
+        totals = analytics.totals('signups', 'game_states', 'points_total', 'level_total')
+        lessons = Lesson.objects.aggregate(total=Count('id'), published=Count('id', filter=Q(is_published=True)))
         
         metrics = {
             'timestamp': now.isoformat(),
             'users': {
-                'total': User.objects.count(),
-                'active_last_7_days': ActivityLog.objects.filter(
-                    created_at__gte=week_ago
-                ).values('user').distinct().count()
+                'total': totals['signups'],
+                'active_last_7_days': analytics.active_users(7, exact=exact)
             },
             'content': {
-                'lessons': Lesson.objects.count(),
+                'lessons': lessons['total'],
                 'quizzes': Quiz.objects.count(),
-                'published_lessons': Lesson.objects.filter(is_published=True).count()
+                'published_lessons': lessons['published']
             },
             'engagement': {
-                'lessons_completed_last_7_days': LessonProgress.objects.filter(
-                    completed=True,
-                    completed_at__gte=week_ago
-                ).count(),
-                'quizzes_taken_last_7_days': QuizResult.objects.filter(
-                    created_at__gte=week_ago
-                ).count(),
-                'total_activities_last_7_days': ActivityLog.objects.filter(
-                    created_at__gte=week_ago
-                ).count()
+                'lessons_completed_last_7_days': analytics.total('lesson_completions', since=week_start),
+                'quizzes_taken_last_7_days': analytics.total('quiz_attempts', since=week_start),
+                'total_activities_last_7_days': analytics.total('activities', since=week_start)
             },
             'gamification': {
-                'total_points_awarded': GameState.objects.aggregate(
-                    total=sum('points' for _ in [0])
-                ),
-                'average_user_level': GameState.objects.aggregate(
-                    avg_level=sum('level' for _ in [0]) / max(GameState.objects.count(), 1)
-                )
+                'total_points_awarded': totals['points_total'],
+                'average_user_level': round(totals['level_total'] / totals['game_states'], 2) if totals['game_states'] else 0
             }
         }
         
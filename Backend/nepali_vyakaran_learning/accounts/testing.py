@@ -0,0 +1,80 @@
+"""
+Shared fixtures for the accounts and learning_vyakaran test suites.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+
+PASSWORD = 'test-pass-123'
+
+
+def make_user(name='learner'):
+    return get_user_model().objects.create_user(username=name, email=f'{name}@example.com', password=PASSWORD)
+
+
+def make_admin(name='admin'):
+    return get_user_model().objects.create_superuser(username=name, email=f'{name}@example.com', password=PASSWORD)
+
+
+def make_villager(name='learner', coins=100, **village):
+    """A user with a game state holding `coins` and a village; returns (user, village)."""
+    from learning_vyakaran.models import Village
+    from .models import GameState
+
+    user = make_user(name)
+    GameState.objects.create(user=user, coins=coins)
+    return user, Village.objects.create(user=user, **village)
+
+
+def make_game(name='Word Match', **fields):
+    from learning_vyakaran.models import Game
+
+    fields = {'description': name, 'game_type': 'word_match', 'instructions': 'Play', **fields}
+    return Game.objects.create(name=name, **fields)
+
+
+def api_client(user):
+    """An API client authenticated as `user`."""
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+class FreshCacheMixin:
+    """Clears the cache before each test and again after it."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Migrates back to `migrate_from`, runs setUpBeforeMigration, then migrates to `migrate_to`."""
+
+    app = 'learning_vyakaran'
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        # Other apps stay fully migrated
+        others = [node for node in executor.loader.graph.leaf_nodes() if node[0] != self.app]
+        executor.migrate([(self.app, self.migrate_from)])
+        self.setUpBeforeMigration(executor.loader.project_state([(self.app, self.migrate_from), *others]).apps)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate([(self.app, self.migrate_to)])
+        self.apps = executor.loader.project_state([(self.app, self.migrate_to), *others]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def setUpBeforeMigration(self, apps):
+        pass
@@ -1,3 +1,885 @@
-from django.test import TestCase
+"""
+Tests for the accounts app.
+"""
 
-# Create your tests here.
+import datetime
+import io
+import json
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from learning_vyakaran.models import Lesson, Question, Quiz, ResourceTransaction
+
+from . import (
+    activity, activity_archive, activity_rollups, analytics, bulk_import, exports, jobs, streaks, user_agents,
+    user_cards, user_search,
+)
+from .hll import HyperLogLog, REGISTERS
+from .models import ActivityLog, DailyActivity, GameState, Job, PlatformDailyStat, UserAgent, UserSettings
+from .testing import FreshCacheMixin, MigrationTestCase, api_client, make_admin, make_user
+
+
+User = get_user_model()
+
+
+def utc(*args):
+    return datetime.datetime(*args, tzinfo=datetime.timezone.utc)
+
+
+# =============================================================================
+# STREAKS
+# =============================================================================
+
+class StreakTests(FreshCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        GameState.objects.create(user=self.user)
+
+    def game_state(self):
+        return GameState.objects.get(user=self.user)
+
+    def test_each_day_is_counted_once(self):
+        self.assertEqual(streaks.record_activity(self.user.id, now=utc(2026, 3, 1, 8)), 1)
+        self.assertEqual(streaks.record_activity(self.user.id, now=utc(2026, 3, 1, 18)), 1)
+        self.assertEqual(streaks.record_activity(self.user.id, now=utc(2026, 3, 2, 8)), 2)
+
+        game_state = self.game_state()
+        self.assertEqual(game_state.current_streak, 2)
+        self.assertEqual(game_state.longest_streak, 2)
+
+    def test_gap_restarts_the_streak(self):
+        for day in (1, 2, 3):
+            streaks.record_activity(self.user.id, now=utc(2026, 3, day, 8))
+        self.assertEqual(streaks.record_activity(self.user.id, now=utc(2026, 3, 6, 8)), 1)
+        self.assertEqual(self.game_state().longest_streak, 3)
+
+    def test_days_follow_the_user_time_zone(self):
+        UserSettings.objects.create(user=self.user, timezone='Asia/Kathmandu')
+
+        # 20:00 UTC on the 1st is already the 2nd in Kathmandu (UTC+5:45)
+        streaks.record_activity(self.user.id, now=utc(2026, 3, 1, 20))
+        self.assertEqual(self.game_state().last_activity_date, datetime.date(2026, 3, 2))
+
+    def test_milestones_are_paid_once(self):
+        GameState.objects.filter(user=self.user).update(current_streak=30, coins=0)
+
+        paid = streaks.award_milestones()
+        self.assertEqual([(milestone, coins) for _, milestone, coins in paid], [(7, 50), (30, 200)])
+        self.assertEqual(streaks.award_milestones(), [])
+
+        game_state = self.game_state()
+        self.assertEqual(game_state.coins, 250)
+        self.assertEqual(game_state.streak_milestone, 30)
+        self.assertEqual(ResourceTransaction.objects.filter(reason='streak_milestone').count(), 2)
+
+    def test_reset_clears_current_streak_only(self):
+        for day in (1, 2):
+            streaks.record_activity(self.user.id, now=utc(2026, 3, day, 8))
+        streaks.reset(self.user.id)
+
+        game_state = self.game_state()
+        self.assertEqual(game_state.current_streak, 0)
+        self.assertEqual(game_state.longest_streak, 2)
+        self.assertEqual(game_state.last_activity_date, datetime.date(2026, 3, 2))
+
+
+# =============================================================================
+# ACTIVITY PIPELINE
+# =============================================================================
+
+IPHONE = 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) Version/17.0 Mobile/15E148 Safari/604.1'
+
+
+def make_event(user, activity_type='lesson_completed', created_at=None):
+    return {
+        'user_id': user.pk,
+        'activity_type': activity_type,
+        'description': '',
+        'metadata': {},
+        'meta': {},
+        'created_at': created_at or timezone.now(),
+    }
+
+
+class ActivityLogTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+
+    def test_log_activity_writes_request_details(self):
+        request = RequestFactory().get(
+            '/', HTTP_USER_AGENT=IPHONE, HTTP_X_FORWARDED_FOR='203.0.113.7, 10.0.0.1', REMOTE_ADDR='10.0.0.1'
+        )
+        for _ in range(2):
+            # Same contract as in async mode, where the row is not written yet
+            self.assertIsNone(ActivityLog.log_activity(self.user, 'login', 'Logged in', request=request))
+
+        logs = ActivityLog.objects.filter(user=self.user)
+        self.assertEqual(logs.count(), 2)
+        self.assertEqual({log.ip_address for log in logs}, {'203.0.113.7'})
+
+        # The user agent string is stored once and shared by both rows
+        agent = UserAgent.objects.get()
+        self.assertEqual((agent.device, agent.os), ('mobile', 'iOS'))
+        self.assertEqual({log.user_agent_id for log in logs}, {agent.id})
+
+
+class ActivityWriterTests(TransactionTestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.writer = activity.ActivityWriter(batch_size=2, flush_interval=60)
+        # Flush from the test thread only
+        patcher = mock.patch.object(self.writer, '_ensure_thread')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_flush_writes_queued_events_in_batches(self):
+        for _ in range(3):
+            self.writer.enqueue(make_event(self.user))
+
+        with mock.patch.object(activity, 'write', wraps=activity.write) as write:
+            self.writer.flush()
+
+        self.assertEqual([len(call.args[0]) for call in write.call_args_list], [2, 1])
+        self.assertEqual(ActivityLog.objects.count(), 3)
+
+    def test_failed_batch_is_retried_then_dropped(self):
+        self.writer.enqueue(make_event(self.user))
+
+        failing = mock.patch.object(activity, 'write', side_effect=RuntimeError('database is locked'))
+        with failing, self.assertLogs(activity.logger, 'ERROR'):
+            for _ in range(activity.MAX_FLUSH_ATTEMPTS - 1):
+                with self.assertRaises(RuntimeError):
+                    self.writer.flush()
+                self.assertEqual(len(self.writer._queue), 1)
+
+            with self.assertRaises(RuntimeError):
+                self.writer.flush()
+            self.assertEqual(len(self.writer._queue), 0)
+
+
+class ActivityRollupTests(FreshCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        UserSettings.objects.create(user=self.user, timezone='Asia/Kathmandu')
+
+    def rollups(self):
+        return list(DailyActivity.objects.order_by('day').values_list('day', 'total', 'counts'))
+
+    def test_batches_merge_into_local_days(self):
+        rows = activity.write([
+            make_event(self.user, 'login', utc(2026, 3, 1, 8)),
+            # 20:00 UTC is already the next day in Kathmandu
+            make_event(self.user, 'login', utc(2026, 3, 1, 20)),
+        ])
+        self.assertEqual(len(rows), 2)
+        activity.write([make_event(self.user, 'lesson_completed', utc(2026, 3, 1, 21))])
+
+        self.assertEqual(self.rollups(), [
+            (datetime.date(2026, 3, 1), 1, {'login': 1}),
+            (datetime.date(2026, 3, 2), 2, {'login': 1, 'lesson_completed': 1}),
+        ])
+
+    def test_record_reports_only_newly_active_days(self):
+        rows = activity.write([make_event(self.user, 'login', utc(2026, 3, 1, 8))])
+        self.assertEqual(activity_rollups.record(rows), [])
+
+        rows = activity.write([make_event(self.user, 'login', utc(2026, 3, 4, 8))])
+        DailyActivity.objects.filter(day=datetime.date(2026, 3, 4)).delete()
+        self.assertEqual(activity_rollups.record(rows), [(self.user.id, datetime.date(2026, 3, 4))])
+
+    def test_rebuild_matches_incremental_rollups(self):
+        activity.write([
+            make_event(self.user, 'login', utc(2026, 3, 1, 8)),
+            make_event(self.user, 'login', utc(2026, 3, 1, 20)),
+            make_event(self.user, 'quiz_attempted', utc(2026, 3, 2, 6)),
+        ])
+        incremental = self.rollups()
+        DailyActivity.objects.all().delete()
+
+        self.assertEqual(activity_rollups.rebuild(datetime.date(2026, 3, 1)), 2)
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_weekly_and_monthly_totals(self):
+        days = [(datetime.date(2026, 3, 1), 2), (datetime.date(2026, 3, 2), 3), (datetime.date(2026, 4, 1), 1)]
+
+        self.assertEqual(activity_rollups.weekly(days), [
+            (datetime.date(2026, 2, 23), 2), (datetime.date(2026, 3, 2), 3), (datetime.date(2026, 3, 30), 1)
+        ])
+        self.assertEqual(activity_rollups.monthly(days), [
+            (datetime.date(2026, 3, 1), 5), (datetime.date(2026, 4, 1), 1)
+        ])
+
+
+class UserAgentTests(TestCase):
+    def setUp(self):
+        user_agents._ids.clear()
+        self.user = make_user()
+        self.admin = make_admin()
+        self.rows = activity.write([
+            dict(make_event(self.user, 'login'), meta={'user_agent': agent})
+            for agent in (IPHONE, IPHONE, 'curl/8.0', '')
+        ])
+
+    def tearDown(self):
+        user_agents._ids.clear()
+
+    def test_same_string_shares_one_row(self):
+        self.assertEqual(UserAgent.objects.count(), 2)
+        self.assertEqual(self.rows[0].user_agent_id, self.rows[1].user_agent_id)
+        self.assertIsNone(self.rows[3].user_agent_id)
+        self.assertEqual(UserAgent.objects.get(user_agent='curl/8.0').device, 'bot')
+        self.assertEqual(user_agents.intern(IPHONE), self.rows[0].user_agent_id)
+
+    def test_export_shows_the_string(self):
+        client = api_client(self.admin)
+
+        response = client.get('/api/v1/admin/export/activity/?output=ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual([row['user_agent_string'] for row in rows], [IPHONE, IPHONE, 'curl/8.0', None])
+
+    def test_admin_shows_the_string(self):
+        self.client.force_login(self.admin)
+
+        response = self.client.get(f'/admin/accounts/activitylog/{self.rows[0].id}/change/')
+        self.assertContains(response, IPHONE)
+
+
+class InternUserAgentsMigrationTests(MigrationTestCase):
+    app = 'accounts'
+    migrate_from = '0005_activitylog_user_created_idx'
+    migrate_to = '0006_intern_user_agents'
+
+    def setUpBeforeMigration(self, apps):
+        CustomUser = apps.get_model('accounts', 'CustomUser')
+        ActivityLog = apps.get_model('accounts', 'ActivityLog')
+        user = CustomUser.objects.create(username='learner', email='learner@example.com')
+        ActivityLog.objects.bulk_create([
+            ActivityLog(user=user, activity_type='login', user_agent=agent)
+            for agent in (IPHONE, IPHONE, 'curl/8.0', '')
+        ])
+
+    def test_logs_share_interned_agents(self):
+        UserAgent = self.apps.get_model('accounts', 'UserAgent')
+        ActivityLog = self.apps.get_model('accounts', 'ActivityLog')
+
+        self.assertEqual(
+            sorted(UserAgent.objects.values_list('user_agent', 'device', 'os')),
+            sorted([(IPHONE, 'mobile', 'iOS'), ('curl/8.0', 'bot', 'Other')])
+        )
+        self.assertEqual(
+            sorted(ActivityLog.objects.values_list('user_agent__user_agent', flat=True), key=str),
+            sorted([IPHONE, IPHONE, 'curl/8.0', None], key=str)
+        )
+        self.assertEqual(ActivityLog.objects.filter(user_agent__user_agent=IPHONE).values('user_agent').distinct().count(), 1)
+
+    def test_reverse_restores_the_strings(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([(self.app, self.migrate_from)])
+        apps = executor.loader.project_state([(self.app, self.migrate_from)]).apps
+
+        self.assertEqual(
+            sorted(apps.get_model('accounts', 'ActivityLog').objects.values_list('user_agent', flat=True)),
+            sorted([IPHONE, IPHONE, 'curl/8.0', ''])
+        )
+
+
+# =============================================================================
+# ACTIVE USER SKETCHES
+# =============================================================================
+
+class HyperLogLogTests(TestCase):
+    def test_count_is_close_and_ignores_repeats(self):
+        sketch = HyperLogLog().update(range(20000))
+        sketch.update(range(5000))
+        self.assertAlmostEqual(sketch.count(), 20000, delta=20000 * 0.05)
+
+    def test_small_counts_are_exact(self):
+        self.assertEqual(HyperLogLog().count(), 0)
+        self.assertEqual(HyperLogLog().update(['a', 'b', 'c', 'a']).count(), 3)
+
+    def test_merge_counts_the_union(self):
+        first = HyperLogLog().update(range(0, 6000))
+        second = HyperLogLog().update(range(4000, 10000))
+        self.assertAlmostEqual(first.merge(second).count(), 10000, delta=10000 * 0.05)
+
+    def test_round_trips_through_bytes(self):
+        sketch = HyperLogLog().update(range(100))
+        self.assertEqual(HyperLogLog(bytes(sketch)).count(), sketch.count())
+        with self.assertRaises(ValueError):
+            HyperLogLog(b'\x00' * (REGISTERS - 1))
+
+
+class ActiveUserTests(FreshCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.users = [make_user(f'active{i}') for i in range(3)]
+        activity.write([
+            make_event(self.users[0], 'login', utc(2026, 3, 1, 8)),
+            make_event(self.users[1], 'login', utc(2026, 3, 1, 9)),
+            make_event(self.users[1], 'login', utc(2026, 3, 5, 9)),
+            make_event(self.users[2], 'login', utc(2026, 3, 5, 10)),
+        ])
+
+    def test_estimates_match_exact_counts(self):
+        today = datetime.date(2026, 3, 5)
+        for days, expected in ((1, 2), (7, 3), (30, 3)):
+            self.assertEqual(analytics.active_users(days, today=today), expected)
+            self.assertEqual(analytics.active_users(days, today=today, exact=True), expected)
+
+    def test_rebuilt_sketches_give_the_same_counts(self):
+        analytics.rebuild_sketches(datetime.date(2026, 3, 1))
+        self.assertEqual(analytics.active_users(7, today=datetime.date(2026, 3, 5)), 3)
+
+
+# =============================================================================
+# PLATFORM ANALYTICS
+# =============================================================================
+
+def cube(*metrics):
+    cells = PlatformDailyStat.objects.filter(metric__in=metrics).exclude(value=0)
+    return sorted(cells.values_list('metric', 'day', 'key', 'value'))
+
+
+class AnalyticsTests(FreshCacheMixin, TestCase):
+    METRICS = ['active_users', 'activities', 'lesson_completions', 'lessons_completed', 'quiz_attempts', 'quiz_passes']
+
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        self.lesson_id, self.quiz_id = '11111111-1111-1111-1111-111111111111', '22222222-2222-2222-2222-222222222222'
+
+    def event(self, activity_type, created_at, **metadata):
+        return dict(make_event(self.user, activity_type, created_at), metadata=metadata)
+
+    def write_events(self):
+        activity.write([
+            self.event('lesson_complete', utc(2026, 3, 1, 8), lesson_id=self.lesson_id, first_completion=True),
+            self.event('lesson_complete', utc(2026, 3, 1, 9), lesson_id=self.lesson_id),
+            self.event('quiz_complete', utc(2026, 3, 2, 8), quiz_id=self.quiz_id, passed=True),
+            self.event('quiz_complete', utc(2026, 3, 2, 9), quiz_id=self.quiz_id, passed=False),
+        ])
+
+    def test_record_activity_counts_written_batches(self):
+        self.write_events()
+        march_1, march_2 = datetime.date(2026, 3, 1), datetime.date(2026, 3, 2)
+
+        self.assertEqual(cube(*self.METRICS), sorted([
+            ('active_users', march_1, '', 1), ('active_users', march_2, '', 1),
+            ('activities', march_1, '', 2), ('activities', march_2, '', 2),
+            ('lesson_completions', march_1, self.lesson_id, 2),
+            ('lessons_completed', march_1, self.lesson_id, 1),
+            ('quiz_attempts', march_2, self.quiz_id, 2),
+            ('quiz_passes', march_2, self.quiz_id, 1),
+        ]))
+        self.assertEqual(analytics.active_users(7, today=march_2), 1)
+
+    def test_refresh_rebuilds_the_incremental_cells(self):
+        self.write_events()
+        incremental = cube(*self.METRICS)
+        PlatformDailyStat.objects.filter(metric__in=self.METRICS).delete()
+
+        analytics.refresh(datetime.date(2026, 3, 1))
+        self.assertEqual(cube(*self.METRICS), incremental)
+
+    def test_totals_follow_users_and_game_states(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = make_user('other')
+        state = GameState.objects.create(user=self.user, points=10)
+        GameState.objects.create(user=other, points=5, level=3)
+        state.add_points(150)  # Levels up once
+
+        # The user created outside the on_commit capture was never counted
+        self.assertEqual(analytics.total('signups'), 1)
+        # Rewards stay off the cube; points and levels wait for a refresh
+        self.assertEqual(
+            analytics.totals('game_states', 'points_total', 'level_total'),
+            {'game_states': 2, 'points_total': 0, 'level_total': 0}
+        )
+        analytics.refresh(timezone.localdate())
+        self.assertEqual(
+            analytics.totals('game_states', 'points_total', 'level_total'),
+            {'game_states': 2, 'points_total': 165, 'level_total': 5}
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertEqual(analytics.total('game_states'), 1)
+
+    def test_refresh_reconciles_totals_with_game_states(self):
+        GameState.objects.create(user=self.user, points=10)
+        # Changes that bypass add_points() are not tracked incrementally
+        GameState.objects.filter(user=self.user).update(points=40, level=4)
+
+        analytics.refresh(timezone.localdate())
+        self.assertEqual(
+            analytics.totals('signups', 'game_states', 'points_total', 'level_total'),
+            {'signups': 1, 'game_states': 1, 'points_total': 40, 'level_total': 4}
+        )
+
+
+class AnalyticsViewTests(FreshCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin = make_admin()
+            self.users = [make_user(f'player{i}') for i in range(2)]
+        GameState.objects.create(user=self.users[0], points=30, level=2)
+        GameState.objects.create(user=self.users[1], points=10, level=1)
+        self.client = api_client(self.admin)
+
+    def test_metrics_read_totals_from_the_cube(self):
+        analytics.refresh(timezone.localdate())
+        # Not seen by the cube until the next refresh
+        GameState.objects.update(points=0)
+
+        data = self.client.get('/api/metrics/').json()['data']
+        self.assertEqual(data['users']['total'], 3)
+        self.assertEqual(data['gamification'], {'total_points_awarded': 40, 'average_user_level': 1.5})
+
+    def test_admin_analytics_counts_users_from_the_cube(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.users[1].delete()
+
+        with mock.patch.object(User.objects, 'count', side_effect=AssertionError('counted users')):
+            data = self.client.get('/api/v1/admin/analytics/').json()['data']
+        self.assertEqual(data['totalUsers'], 2)
+
+
+# =============================================================================
+# ACTIVITY ARCHIVE
+# =============================================================================
+
+class ActivityArchiveTests(FreshCacheMixin, TestCase):
+    MONTH = datetime.date(2026, 2, 1)
+
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        archive_settings = override_settings(ACTIVITY_LOG_ARCHIVE_DIR=directory)
+        archive_settings.enable()
+        self.addCleanup(archive_settings.disable)
+
+    def log(self, *days):
+        events = [
+            dict(make_event(self.user, 'login', utc(2026, month, day, 8)), meta={'user_agent': IPHONE})
+            for month, day in days
+        ]
+        return activity.write(events)
+
+    def snapshot(self, rows):
+        return [(row.id, row.activity_type, row.created_at.isoformat()) for row in rows]
+
+    def read_back(self):
+        return [
+            (row['id'], row['activity_type'], datetime.datetime.fromisoformat(row['created_at']).isoformat())
+            for row in activity_archive.read_archive(self.MONTH)
+        ]
+
+    def test_month_round_trips_through_the_archive(self):
+        archived = self.log((2, 1), (2, 10), (2, 20), (2, 28), (2, 28))
+        kept = self.log((3, 1))
+
+        path, deleted = activity_archive.archive_month(self.MONTH, batch_size=2)
+        self.assertEqual(deleted, 5)
+        self.assertEqual(path.name, 'activity_log-2026-02.ndjson.gz')
+        self.assertEqual(list(ActivityLog.objects.values_list('id', flat=True)), [kept[0].id])
+
+        self.assertEqual(self.read_back(), self.snapshot(archived))
+        first = next(activity_archive.read_archive(self.MONTH))
+        self.assertEqual((first['user_id'], first['user_agent_string']), (str(self.user.id), IPHONE))
+
+    def test_interrupted_run_finishes_without_rewriting(self):
+        archived = self.log((2, 1), (2, 2), (2, 3))
+        with mock.patch.object(activity_archive, 'delete_in_batches', side_effect=RuntimeError('database is locked')):
+            with self.assertRaises(RuntimeError):
+                activity_archive.archive_month(self.MONTH, batch_size=2)
+        self.assertEqual(ActivityLog.objects.count(), 3)
+        # Added after the archive was written, so not covered by it
+        late = self.log((2, 4))
+
+        path, deleted = activity_archive.archive_month(self.MONTH, batch_size=2)
+        self.assertEqual((path.name, deleted), ('activity_log-2026-02.1.ndjson.gz', 4))
+        self.assertEqual(len(activity_archive.archive_files(self.MONTH)), 2)
+        self.assertEqual(self.read_back(), self.snapshot(archived + late))
+        self.assertEqual(activity_archive.archived_through(self.MONTH), late[0].id)
+
+        self.assertEqual(activity_archive.archive_month(self.MONTH), (None, 0))
+
+
+# =============================================================================
+# EXPORTS
+# =============================================================================
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.users = [make_user(f'export{i}') for i in range(5)]
+
+    def test_keyset_pages_cover_every_row_once(self):
+        rows = exports.dataset('users')
+        with self.assertNumQueries(3):
+            exported = list(exports.keyset_pages(rows, page_size=2))
+
+        self.assertEqual(len(exported), 5)
+        self.assertEqual([row['id'] for row in exported], sorted(user.id for user in self.users))
+
+    def test_encode_csv_and_ndjson(self):
+        rows = [{'id': 1, 'name': 'राम, श्याम', 'metadata': {'a': 1}}, {'id': 2, 'name': 'x', 'metadata': []}]
+        columns = ['id', 'name', 'metadata']
+
+        csv_text = ''.join(exports.encode(rows, 'csv', columns))
+        self.assertEqual(csv_text.splitlines(), ['id,name,metadata', '1,"राम, श्याम","{""a"": 1}"', '2,x,[]'])
+
+        ndjson_text = ''.join(exports.encode(rows, 'ndjson', columns))
+        self.assertEqual(ndjson_text.splitlines()[0], '{"id": 1, "name": "राम, श्याम", "metadata": {"a": 1}}')
+
+    def test_admin_export_streams_dataset(self):
+        admin = make_admin()
+        client = api_client(admin)
+
+        response = client.get('/api/v1/admin/export/users/?output=csv')
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines[0].split(',')[:2], ['id', 'username'])
+        self.assertEqual(len(lines), 7)
+
+        self.assertEqual(client.get('/api/v1/admin/export/users/?output=xml').status_code, 400)
+
+
+# =============================================================================
+# USER SEARCH
+# =============================================================================
+
+class UserSearchTests(FreshCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        names = ['shriram', 'Ramesh', 'sita', 'gita', 'hari']
+        self.users = [make_user(name) for name in names]
+        for days, user in enumerate(self.users):
+            User.objects.filter(pk=user.pk).update(date_joined=utc(2026, 1, 1) + datetime.timedelta(days=days))
+
+    def usernames(self, queryset):
+        return sorted(queryset.values_list('username', flat=True))
+
+    def test_contains_matches_inside_usernames(self):
+        self.assertEqual(self.usernames(user_search.search(User.objects.all(), 'RAM')), ['Ramesh', 'shriram'])
+        # Shorter than a trigram
+        self.assertEqual(self.usernames(user_search.search(User.objects.all(), 'ta')), ['gita', 'sita'])
+
+    def test_contains_index_follows_username_changes(self):
+        user = self.users[4]
+        user.username = 'harimaya'
+        user.save()
+        self.assertEqual(self.usernames(user_search.search(User.objects.all(), 'maya')), ['harimaya'])
+
+    def test_prefix_matches_username_or_email(self):
+        self.assertEqual(self.usernames(user_search.search(User.objects.all(), 'ram', match='prefix')), ['Ramesh'])
+        self.assertEqual(self.usernames(user_search.search(User.objects.all(), 'SITA@', match='prefix')), ['sita'])
+
+    def test_cursor_pages_walk_newest_first(self):
+        seen, cursor = [], None
+        while True:
+            users, cursor = user_search.page(User.objects.all(), cursor, limit=2)
+            seen.extend(user.username for user in users)
+            if cursor is None:
+                break
+        self.assertEqual(seen, ['hari', 'gita', 'sita', 'Ramesh', 'shriram'])
+
+        with self.assertRaises(user_search.InvalidCursor):
+            user_search.page(User.objects.all(), 'not-a-cursor')
+
+    def test_count_modes(self):
+        users = User.objects.all()
+        self.assertEqual(user_search.count(users, 'exact'), (5, True))
+        self.assertEqual(user_search.count(users, 'none'), (None, False))
+        self.assertEqual(user_search.count(users, 'estimate'), (5, False))
+
+        with mock.patch.object(user_search, 'COUNT_CAP', 3):
+            self.assertEqual(user_search.count(users, 'estimate', filtered=True), (3, False))
+            self.assertEqual(user_search.count(users.filter(username__endswith='ita'), 'estimate', filtered=True), (2, True))
+
+    def test_admin_user_list_rejects_bad_cursor(self):
+        admin = make_admin()
+        client = api_client(admin)
+
+        response = client.get('/api/v1/admin/users/?search=ram&limit=1&count=exact')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        self.assertEqual((data['total'], data['totalIsExact'], len(data['users'])), (2, True, 1))
+
+        response = client.get('/api/v1/admin/users/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+
+
+# =============================================================================
+# BULK IMPORT
+# =============================================================================
+
+def lesson_item(slug, **fields):
+    return {'title': slug.title(), 'title_nepali': slug, 'slug': slug, 'description': 'Lesson', **fields}
+
+
+class BulkImportTests(TestCase):
+    def test_lessons_are_created_with_prerequisites(self):
+        result = bulk_import.run('lessons', [
+            lesson_item('nouns'),
+            lesson_item('pronouns', prerequisites=['nouns']),
+        ])
+
+        self.assertEqual(result, {'lessons': 2, 'prerequisites': 1})
+        self.assertEqual(
+            list(Lesson.objects.get(slug='pronouns').prerequisites.values_list('slug', flat=True)), ['nouns']
+        )
+
+    def test_invalid_upload_writes_nothing(self):
+        bulk_import.run('lessons', [lesson_item('nouns')])
+
+        with self.assertRaises(bulk_import.ImportFailed) as failed:
+            bulk_import.run('lessons', [
+                lesson_item('verbs'),
+                lesson_item('nouns'),
+                lesson_item('adverbs', prerequisites=['adjectives']),
+                {'slug': 'no title'},
+            ])
+
+        errors = {error['index']: error['errors'] for error in failed.exception.errors}
+        self.assertEqual(sorted(errors), [3])
+        self.assertEqual(Lesson.objects.count(), 1)
+
+        with self.assertRaises(bulk_import.ImportFailed) as failed:
+            bulk_import.run('lessons', [
+                lesson_item('verbs'),
+                lesson_item('nouns'),
+                lesson_item('adverbs', prerequisites=['adjectives']),
+            ])
+
+        errors = {error['index']: error['errors'] for error in failed.exception.errors}
+        self.assertEqual(errors, {
+            1: {'slug': ['A lesson with this slug already exists']},
+            2: {'prerequisites': ['Unknown lesson "adjectives"']},
+        })
+        self.assertEqual(Lesson.objects.count(), 1)
+
+    def test_progress_is_reported_per_chunk(self):
+        progress = mock.Mock()
+        with mock.patch.object(bulk_import, 'CHUNK_SIZE', 2):
+            bulk_import.run('lessons', [
+                lesson_item('nouns'),
+                lesson_item('pronouns', prerequisites=['nouns']),
+                lesson_item('verbs'),
+            ], progress)
+
+        self.assertEqual([call.args[:2] for call in progress.call_args_list[1:]], [(2, 4), (3, 4), (4, 4)])
+
+    def test_quizzes_with_nested_and_separate_questions(self):
+        quiz_id = '8c1f7a3e-1d2b-4c5d-9e6f-0a1b2c3d4e5f'
+        question = {'question_type': 'multiple_choice', 'question_text': 'क?', 'correct_answer': 'क'}
+
+        self.assertEqual(
+            bulk_import.run('quizzes', [{'id': quiz_id, 'title': 'Quiz', 'questions': [question]}]),
+            {'quizzes': 1, 'questions': 1}
+        )
+        self.assertEqual(bulk_import.run('questions', [{**question, 'quiz': quiz_id}]), {'questions': 1})
+        self.assertEqual(Quiz.objects.get().questions.count(), 2)
+
+        with self.assertRaises(bulk_import.ImportFailed):
+            bulk_import.run('questions', [question])
+        self.assertEqual(Question.objects.count(), 2)
+
+    def test_admin_upload_reads_ndjson(self):
+        admin = make_admin()
+        client = api_client(admin)
+        body = '\n'.join(json.dumps(lesson_item(slug)) for slug in ('nouns', 'verbs'))
+
+        response = client.post(
+            '/api/v1/admin/content/bulk-upload/?type=lessons', body, content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Lesson.objects.count(), 2)
+
+    def test_background_upload_is_logged_when_imported(self):
+        admin = make_admin()
+        client = api_client(admin)
+
+        response = client.post(
+            '/api/v1/admin/content/bulk-upload/?background=true',
+            {'type': 'lessons', 'data': [lesson_item('nouns'), lesson_item('verbs')]}, format='json'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(ActivityLog.objects.filter(activity_type='admin_bulk_upload').exists())
+
+        self.assertEqual(jobs.run(jobs.claim('test-worker')), 'succeeded')
+        log = ActivityLog.objects.get(activity_type='admin_bulk_upload')
+        self.assertEqual(log.user, admin)
+        self.assertEqual(log.metadata, {
+            'type': 'lessons', 'uploaded': 2, 'created': {'lessons': 2, 'prerequisites': 0},
+            'job_id': response.json()['data']['id'],
+        })
+
+
+# =============================================================================
+# BACKGROUND JOBS
+# =============================================================================
+
+def add_task(progress, a, b=0):
+    progress(1, 1)
+    return {'sum': a + b}
+
+
+def broken_task(progress):
+    raise RuntimeError('boom')
+
+
+def invalid_task(progress):
+    raise jobs.JobFailed('Bad input', result={'errors': 1})
+
+
+class JobTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(jobs.TASKS, {'add': add_task, 'broken': broken_task, 'invalid': invalid_task})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_next(self):
+        job = jobs.claim('test-worker')
+        self.assertIsNotNone(job)
+        return jobs.run(job)
+
+    def test_enqueue_validates_task_and_arguments(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue('missing')
+        with self.assertRaises(ValueError):
+            jobs.enqueue('add', {'b': 1})
+        with self.assertRaises(ValueError):
+            jobs.enqueue('add', {'a': 1, 'c': 2})
+        self.assertFalse(Job.objects.exists())
+
+    def test_claimed_job_runs_once(self):
+        job = jobs.enqueue('add', {'a': 2, 'b': 3})
+
+        self.assertEqual(self.run_next(), 'succeeded')
+        self.assertIsNone(jobs.claim('test-worker'))
+
+        job.refresh_from_db()
+        self.assertEqual((job.result, job.progress, job.attempts), ({'sum': 5}, 100, 1))
+
+    def test_failures_are_retried_with_backoff_then_failed(self):
+        job = jobs.enqueue('broken', max_attempts=2)
+
+        with self.assertLogs(jobs.logger, 'ERROR'):
+            self.assertEqual(self.run_next(), 'queued')
+        job.refresh_from_db()
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIsNone(jobs.claim('test-worker'))
+
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        with self.assertLogs(jobs.logger, 'ERROR'):
+            self.assertEqual(self.run_next(), 'failed')
+        job.refresh_from_db()
+        self.assertIn('RuntimeError: boom', job.error)
+
+    def test_job_failed_is_not_retried(self):
+        job = jobs.enqueue('invalid')
+
+        self.assertEqual(self.run_next(), 'failed')
+        job.refresh_from_db()
+        self.assertEqual((job.attempts, job.error, job.result), (1, 'Bad input', {'errors': 1}))
+
+    def test_only_queued_jobs_can_be_cancelled(self):
+        queued = jobs.enqueue('add', {'a': 1})
+        self.assertTrue(jobs.cancel(queued.id))
+        self.assertIsNone(jobs.claim('test-worker'))
+
+        finished = jobs.enqueue('add', {'a': 1})
+        self.run_next()
+        self.assertFalse(jobs.cancel(finished.id))
+
+    def test_stale_running_jobs_are_requeued(self):
+        job = jobs.enqueue('add', {'a': 1})
+        jobs.claim('dead-worker')
+        Job.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - datetime.timedelta(hours=1))
+
+        self.assertEqual(jobs.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('queued', 'Worker stopped responding'))
+
+    def test_background_bulk_upload(self):
+        admin = make_admin()
+        client = api_client(admin)
+
+        response = client.post(
+            '/api/v1/admin/content/bulk-upload/?background=true',
+            {'type': 'lessons', 'data': [lesson_item('nouns')]}, format='json'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Lesson.objects.exists())
+
+        self.assertEqual(self.run_next(), 'succeeded')
+        self.assertTrue(Lesson.objects.filter(slug='nouns').exists())
+
+    def test_command_jobs_report_progress(self):
+        jobs.enqueue('rebuild_activity_rollups', {'days': 7})
+
+        with mock.patch.object(jobs.Progress, '__call__', autospec=True) as progress:
+            self.assertEqual(self.run_next(), 'succeeded')
+
+        self.assertIn('Rebuilding rollups', progress.call_args.kwargs['message'])
+
+
+# =============================================================================
+# USER CARDS
+# =============================================================================
+
+def png_upload(name='avatar.png'):
+    from PIL import Image
+
+    data = io.BytesIO()
+    Image.new('RGB', (2, 2)).save(data, 'PNG')
+    return SimpleUploadedFile(name, data.getvalue(), content_type='image/png')
+
+
+class UserCardTests(FreshCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.user = make_user()
+        self.client = api_client(self.user)
+
+    def card(self):
+        return user_cards.get_cards([self.user.id])[str(self.user.id)]
+
+    def test_profile_update_drops_the_card(self):
+        self.assertEqual(self.card()['username'], 'learner')
+
+        response = self.client.put('/api/v1/users/me/', {'username': 'renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.card()['username'], 'renamed')
+
+    def test_avatar_update_drops_the_card(self):
+        self.assertIsNone(self.card()['avatar'])
+
+        with override_settings(MEDIA_ROOT=self.media_root):
+            response = self.client.put('/api/v1/users/me/', {'avatar': png_upload()}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.card()['avatar'].endswith('.png'))
+
+    def test_per_process_cache_keeps_cards_briefly(self):
+        with mock.patch.object(user_cards.cache, 'set_many') as set_many:
+            self.card()
+        self.assertEqual(set_many.call_args.args[1], user_cards.LOCAL_CACHE_TIMEOUT)
+
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(user_cards.cache_timeout(), user_cards.CACHE_TIMEOUT)
@@ -0,0 +1,132 @@
+"""
+Dictionary-encoded user agents for ActivityLog.
+
+Every distinct User-Agent string is stored once in the UserAgent table,
+keyed by its SHA-1, together with the device type, browser and OS parsed
+from it. Activity rows only keep the UserAgent id. An in-process LRU maps
+strings to ids, so logging needs no lookup query once a worker has seen a
+client's user agent.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from django.db import IntegrityError, connection, transaction
+
+
+CACHE_SIZE = 4096
+MAX_LENGTH = 1024  # Longer strings are truncated before interning
+
+
+# (name, pattern) pairs, checked in order; the first match wins
+BROWSERS = [
+    ('Edge', re.compile(r'Edg(?:e|A|iOS)?/')),
+    ('Opera', re.compile(r'OPR/|Opera')),
+    ('Samsung Internet', re.compile(r'SamsungBrowser/')),
+    ('Chrome', re.compile(r'Chrome/|CriOS/')),
+    ('Firefox', re.compile(r'Firefox/|FxiOS/')),
+    ('Safari', re.compile(r'Safari/')),
+    ('Internet Explorer', re.compile(r'MSIE |Trident/')),
+]
+
+OPERATING_SYSTEMS = [
+    ('Android', re.compile(r'Android')),
+    ('iOS', re.compile(r'iPhone|iPad|iPod')),
+    ('Windows', re.compile(r'Windows')),
+    ('macOS', re.compile(r'Macintosh|Mac OS X')),
+    ('Linux', re.compile(r'Linux|X11')),
+]
+
+BOT = re.compile(r'bot|crawl|spider|slurp|curl|wget|python-requests|httpclient', re.IGNORECASE)
+TABLET = re.compile(r'iPad|Tablet|Android(?!.*Mobile)')
+MOBILE = re.compile(r'Mobi|iPhone|iPod|Android')
+
+
+def _first_match(patterns, user_agent):
+    for name, pattern in patterns:
+        if pattern.search(user_agent):
+            return name
+    return 'Other'
+
+
+def parse(user_agent):
+    """Return {'device', 'browser', 'os'} for a User-Agent string."""
+    if BOT.search(user_agent):
+        device = 'bot'
+    elif TABLET.search(user_agent):
+        device = 'tablet'
+    elif MOBILE.search(user_agent):
+        device = 'mobile'
+    else:
+        device = 'desktop'
+    return {
+        'device': device,
+        'browser': _first_match(BROWSERS, user_agent),
+        'os': _first_match(OPERATING_SYSTEMS, user_agent),
+    }
+
+
+def ua_hash(user_agent):
+    return hashlib.sha1(user_agent.encode('utf-8')).hexdigest()
+
+
+class _LRU:
+    """Small thread-safe LRU of user agent string -> id."""
+
+    def __init__(self, size):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            if len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_ids = _LRU(CACHE_SIZE)
+
+
+def intern(user_agent):
+    """Return the UserAgent id for a string (None for an empty one), creating the row if new."""
+    from .models import UserAgent
+
+    user_agent = (user_agent or '')[:MAX_LENGTH]
+    if not user_agent:
+        return None
+
+    agent_id = _ids.get(user_agent)
+    if agent_id is not None:
+        return agent_id
+
+    digest = ua_hash(user_agent)
+    agent_id = UserAgent.objects.filter(ua_hash=digest).values_list('id', flat=True).first()
+    if agent_id is None:
+        try:
+            with transaction.atomic():
+                agent_id = UserAgent.objects.create(
+                    ua_hash=digest, user_agent=user_agent, **parse(user_agent)
+                ).id
+        except IntegrityError:
+            # Created concurrently
+            agent_id = UserAgent.objects.get(ua_hash=digest).id
+
+    # A row created inside an open transaction may still be rolled back
+    if not connection.in_atomic_block:
+        _ids.set(user_agent, agent_id)
+    return agent_id
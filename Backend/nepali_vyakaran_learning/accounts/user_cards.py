@@ -0,0 +1,63 @@
+"""
+Cached user cards for ranked listings.
+
+A user card is the small public identity shown next to a score: id,
+username and avatar URL. Leaderboards fetch the cards for a whole page with
+one cache get_many and at most one bulk query for the misses. Cards are
+dropped whenever the user row is saved or deleted (see apps.py), which
+covers profile and avatar updates.
+
+Dropping a card only reaches other workers through a shared cache (Redis).
+With the per-process LocMemCache each worker keeps its own copy, so cards
+are then kept for LOCAL_CACHE_TIMEOUT only and a profile change shows
+everywhere within that time.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from .utils import cache_is_local
+
+
+CACHE_TIMEOUT = 60 * 60 * 24  # 1 day, with a shared cache
+LOCAL_CACHE_TIMEOUT = 60  # with a per-process cache
+
+
+def cache_timeout():
+    return LOCAL_CACHE_TIMEOUT if cache_is_local() else CACHE_TIMEOUT
+
+
+def _key(user_id):
+    return f'user_card:{user_id}'
+
+
+def _card(user):
+    return {
+        'user_id': str(user.id),
+        'username': user.username,
+        'avatar': user.avatar.url if user.avatar else None,
+    }
+
+
+def get_cards(user_ids):
+    """Return {user_id (str): card} for the given ids; unknown ids are omitted."""
+    user_ids = [str(user_id) for user_id in user_ids]
+    cached = cache.get_many([_key(user_id) for user_id in user_ids])
+    cards = {card['user_id']: card for card in cached.values()}
+
+    missing = [user_id for user_id in user_ids if user_id not in cards]
+    if missing:
+        users = get_user_model().objects.filter(id__in=missing).only('id', 'username', 'avatar')
+        fetched = {str(user.id): _card(user) for user in users}
+        cache.set_many({_key(user_id): card for user_id, card in fetched.items()}, cache_timeout())
+        cards.update(fetched)
+
+    return cards
+
+
+def invalidate(sender, instance, **kwargs):
+    """Signal handler: drop the saved or deleted user's card."""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) == {'last_login'}:
+        return  # Logins don't change the card
+    cache.delete(_key(instance.pk))
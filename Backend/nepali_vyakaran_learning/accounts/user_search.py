@@ -0,0 +1,148 @@
+"""
+Admin user search and paging.
+
+Two ways to match the search text against username and email:
+
+- prefix: a range scan over the Lower('username') and Lower('email')
+  indexes. Works on every database.
+- contains: substring match. On SQLite builds with the FTS5 trigram
+  tokenizer it is answered from the accounts_user_search index, which
+  migration 0010 creates and triggers keep in sync. Elsewhere, and for
+  text shorter than a trigram, it falls back to a scanning icontains.
+
+Pages are keyset cursors over (date_joined, id), newest first, so every
+page costs the same however deep the admin browses. Counts can be exact,
+estimated (bounded) or skipped.
+"""
+
+import base64
+import datetime
+import json
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower
+
+from .models import CustomUser
+
+
+FTS_TABLE = 'accounts_user_search'
+MATCH_MODES = ['contains', 'prefix']
+COUNT_MODES = ['estimate', 'exact', 'none']
+
+# Filtered counts stop at this many rows in estimate mode
+COUNT_CAP = 1000
+# Seconds an unfiltered estimated total is cached for
+TOTAL_CACHE_TTL = 300
+TOTAL_CACHE_KEY = 'admin_user_search:total'
+
+_fts_available = None
+
+
+def fts_available():
+    """
+    Whether the trigram search index exists and is kept in sync (checked
+    once per process). SQLite drops triggers when a migration rebuilds the
+    user table, so the sync trigger is checked rather than the table.
+    """
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = False
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = %s", [f'{FTS_TABLE}_insert']
+                )
+                _fts_available = cursor.fetchone() is not None
+    return _fts_available
+
+
+def _lower(text):
+    """Lower-case text the way the database's LOWER() does (SQLite only folds ASCII)."""
+    if connection.vendor == 'sqlite':
+        return ''.join(char.lower() if char.isascii() else char for char in text)
+    return text.lower()
+
+
+def search(queryset, text, match='contains'):
+    """Filter users whose username or email matches the text."""
+    text = text.strip()
+    if not text:
+        return queryset
+
+    if match == 'prefix':
+        low = _lower(text)
+        high = low + chr(0x10FFFF)
+        return queryset.annotate(
+            username_lower=Lower('username'), email_lower=Lower('email')
+        ).filter(
+            Q(username_lower__gte=low, username_lower__lt=high) | Q(email_lower__gte=low, email_lower__lt=high)
+        )
+
+    if len(text) >= 3 and fts_available():
+        phrase = '"' + text.replace('"', '""') + '"'
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT user_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [phrase])
+        )
+    return queryset.filter(Q(username__icontains=text) | Q(email__icontains=text))
+
+
+# =============================================================================
+# CURSORS
+# =============================================================================
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(user):
+    raw = json.dumps([user.date_joined.isoformat(), str(user.pk)])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Return (date_joined, id) from a cursor, raising InvalidCursor if malformed."""
+    try:
+        joined, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.datetime.fromisoformat(joined), CustomUser._meta.pk.to_python(user_id)
+    except Exception as exc:
+        raise InvalidCursor('Invalid cursor') from exc
+
+
+def page(queryset, cursor=None, limit=20):
+    """
+    One page of users, newest first, after `cursor`. Returns
+    (users, cursor of the next page or None).
+    """
+    queryset = queryset.order_by('-date_joined', '-id')
+    if cursor:
+        joined, user_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(date_joined__lt=joined) | Q(date_joined=joined, id__lt=user_id))
+
+    users = list(queryset[:limit + 1])
+    if len(users) > limit:
+        return users[:limit], encode_cursor(users[limit - 1])
+    return users, None
+
+
+# =============================================================================
+# COUNTS
+# =============================================================================
+
+def count(queryset, mode='estimate', filtered=False):
+    """
+    Return (count, is_exact) for the queryset, or (None, False) with mode
+    'none'. Estimates are a cached total for the unfiltered table and a
+    count capped at COUNT_CAP for searches.
+    """
+    if mode == 'none':
+        return None, False
+    if mode == 'exact':
+        return queryset.count(), True
+    if not filtered:
+        return cache.get_or_set(TOTAL_CACHE_KEY, queryset.count, TOTAL_CACHE_TTL), False
+
+    capped = queryset.order_by()[:COUNT_CAP + 1].count()
+    return min(capped, COUNT_CAP), capped <= COUNT_CAP
@@ -464,6 +464,14 @@ def send_welcome_email(user):
         return False
 
 
+def cache_is_local():
+    """
+    Whether the default cache is per-process (LocMemCache), in which case a
+    delete or version bump only reaches the worker that made it.
+    """
+    return settings.CACHES['default']['BACKEND'].endswith('.LocMemCache')
+
+
 def success_response(data=None, message=None, status_code=status.HTTP_200_OK):
     """
     Create a standardized success response.
@@ -4,6 +4,7 @@ Handles authentication, user management, and game state operations.
 """
 
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import status, generics, permissions
 from rest_framework.views import APIView
@@ -14,6 +15,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 
 from .models import GameState, UserSettings, OTPVerification, ActivityLog
+from . import activity_rollups, streaks
 from .serializers import (
     UserSerializer, UserProfileUpdateSerializer,
     GameStateSerializer, GameStateUpdateSerializer,
@@ -29,6 +31,7 @@ from .utils import (
     success_response, error_response,
     generate_otp, send_otp_email
 )
+from learning_vyakaran import economy, leaderboards
 
 User = get_user_model()
 
@@ -462,9 +465,8 @@ class AddCoinsView(APIView):
         coins = serializer.validated_data['coins']
         source = serializer.validated_data['source']
         
-        game_state, _ = GameState.objects.get_or_create(user=request.user)
-        game_state.coins += coins
-        game_state.save()
+        economy.grant(request.user, {'coins': coins}, reason='add_coins', metadata={'source': source})
+        game_state = GameState.objects.get(user=request.user)
         
         ActivityLog.log_activity(
             request.user, 'coins_earned',
@@ -501,13 +503,16 @@ class SpendCoinsView(APIView):
         item_id = serializer.validated_data['item_id']
         item_type = serializer.validated_data['item_type']
         
-        game_state, _ = GameState.objects.get_or_create(user=request.user)
-        
-        if game_state.coins < amount:
+        try:
+            economy.spend(
+                request.user, {'coins': amount},
+                reason='spend_coins',
+                metadata={'item_id': item_id, 'item_type': item_type}
+            )
+        except economy.InsufficientResources:
             return error_response('Insufficient coins.', code='INSUFFICIENT_COINS')
         
-        game_state.coins -= amount
-        game_state.save()
+        game_state = GameState.objects.get(user=request.user)
         
         ActivityLog.log_activity(
             request.user, 'coins_spent',
@@ -548,7 +553,7 @@ class UnlockZoneView(APIView):
             return error_response('Zone already unlocked.', code='ALREADY_UNLOCKED')
         
         game_state.unlocked_zones.append(zone_id)
-        game_state.save()
+        game_state.save(update_fields=['unlocked_zones', 'updated_at'])
         
         ActivityLog.log_activity(
             request.user, 'zone_unlocked',
@@ -592,19 +597,22 @@ class CompleteLessonView(APIView):
         coins_awarded = int(5 * (score / 100))
         
         # Update game state
-        if lesson_id not in game_state.completed_lessons:
+        first_completion = lesson_id not in game_state.completed_lessons
+        if first_completion:
             game_state.completed_lessons.append(lesson_id)
         
         game_state.total_time_spent += time_spent
         game_state.add_points(points_awarded, f'Completed lesson {lesson_id}')
-        game_state.coins += coins_awarded
+        economy.grant(request.user, {'coins': coins_awarded}, reason='lesson_complete',
+                      metadata={'lesson_id': lesson_id})
         game_state.update_streak()
-        game_state.save()
+        game_state.save(update_fields=['completed_lessons', 'total_time_spent', 'updated_at'])
         
         ActivityLog.log_activity(
             request.user, 'lesson_complete',
             f'Completed lesson with score {score}%',
-            metadata={'lesson_id': lesson_id, 'score': score, 'time_spent': time_spent},
+            metadata={'lesson_id': lesson_id, 'score': score, 'time_spent': time_spent,
+                      'first_completion': first_completion},
             request=request
         )
         
@@ -641,27 +649,19 @@ class UpdateStreakView(APIView):
         if action == 'increment':
             current_streak = game_state.update_streak()
         else:  # reset
-            game_state.current_streak = 0
-            game_state.save()
+            streaks.reset(request.user.id)
             current_streak = 0
         
-        # Check for streak milestones (7, 30, 100 days)
+        # Milestones reached by this increment are paid right away; the
+        # award_streak_milestones job catches up streaks extended elsewhere
         streak_reward = None
-        milestones = {7: 50, 30: 200, 100: 500}
-        if current_streak in milestones:
+        paid = streaks.award_milestones(GameState.objects.filter(id=game_state.id), request=request)
+        if paid:
+            _, milestone, coins = paid[-1]
             streak_reward = {
-                'milestone': current_streak,
-                'coinsAwarded': milestones[current_streak]
+                'milestone': milestone,
+                'coinsAwarded': sum(coins for _, _, coins in paid)
             }
-            game_state.coins += milestones[current_streak]
-            game_state.save()
-            
-            ActivityLog.log_activity(
-                request.user, 'streak_milestone',
-                f'Reached {current_streak}-day streak!',
-                metadata={'streak': current_streak, 'coins_awarded': milestones[current_streak]},
-                request=request
-            )
         
         return success_response(data={
             'currentStreak': current_streak,
@@ -795,8 +795,10 @@ class ResetProgressView(APIView):
             return error_response('Invalid data', details=serializer.errors)
         
         # Reset game state
-        GameState.objects.filter(user=request.user).delete()
-        GameState.objects.create(user=request.user)
+        with transaction.atomic():
+            GameState.objects.filter(user=request.user).delete()
+            GameState.objects.create(user=request.user)
+            leaderboards.record_game_state(request.user.id)
         
         ActivityLog.log_activity(request.user, 'profile_updated', 'Progress reset', request=request)
         
@@ -855,19 +857,9 @@ class ActivityHistoryView(APIView):
         activities = ActivityLog.objects.filter(user=request.user)[:50]
         serializer = ActivityLogSerializer(activities, many=True)
         
-        # Calculate stats
-        total_active_days = activities.dates('created_at', 'day').count()
-        # Compute total_active_days on full queryset before slicing
-        activities_qs = ActivityLog.objects.filter(user=request.user)
-        total_active_days = activities_qs.dates('created_at', 'day').count()
-    
-        # Get last 50 activities for serialization
-        activities = activities_qs[:50]
-        serializer = ActivityLogSerializer(activities, many=True)
-        
         return success_response(data={
             'activities': serializer.data,
-            'totalActiveDays': total_active_days,
+            'totalActiveDays': activity_rollups.active_days(request.user),
         })
 
 
@@ -884,41 +876,45 @@ class LeaderboardView(APIView):
         tags=["Analytics"],
         parameters=[
             OpenApiParameter(name='type', description='Leaderboard type', required=True, enum=['points', 'level', 'streak']),
-            OpenApiParameter(name='limit', description='Number of entries', required=False, type=int),
+            OpenApiParameter(name='period', description='Time period (points only)', required=False, enum=['daily', 'weekly', 'monthly', 'all-time']),
+            OpenApiParameter(name='limit', description='Number of entries (max 100)', required=False, type=int),
+            OpenApiParameter(name='mode', description='Top entries, or the entries around the user', required=False, enum=['top', 'around']),
+            OpenApiParameter(name='size', description='Neighbours on each side in around mode (max 50)', required=False, type=int),
         ]
     )
     def get(self, request):
         leaderboard_type = request.query_params.get('type', 'points')
-        limit = int(request.query_params.get('limit', 10))
-        
-        field_map = {
-            'points': '-points',
-            'level': '-level',
-            'streak': '-current_streak'
-        }
-        
-        order_by = field_map.get(leaderboard_type, '-points')
-        
-        game_states = GameState.objects.select_related('user').order_by(order_by)[:limit]
-        
-        leaderboard = []
-        for rank, gs in enumerate(game_states, 1):
-            value = getattr(gs, leaderboard_type if leaderboard_type != 'streak' else 'current_streak')
-            leaderboard.append({
-                'rank': rank,
-                'user_id': str(gs.user.id),
-                'username': gs.user.username,
-                'avatar': gs.user.avatar.url if gs.user.avatar else None,
-                'value': value
-            })
+        if leaderboard_type not in ('points', 'level', 'streak'):
+            leaderboard_type = 'points'
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+            size = min(max(int(request.query_params.get('size', 10)), 1), 50)
+        except ValueError:
+            return error_response('Invalid limit or size', code='VALIDATION_ERROR')
+        
+        # Level and streak boards are only kept all-time
+        period = 'all_time'
+        if leaderboard_type == 'points':
+            period = leaderboards.normalize_period(request.query_params.get('period'))
+        
+        if request.query_params.get('mode') == 'around':
+            entries = leaderboards.around(request.user.id, leaderboard_type, period, size=size)
+        else:
+            entries = leaderboards.top(leaderboard_type, period, limit=limit)
+        
+        leaderboard = [
+            {
+                'rank': entry['rank'],
+                'user_id': entry['user_id'],
+                'username': entry['username'],
+                'avatar': entry['avatar'],
+                'value': entry['score']
+            }
+            for entry in entries
+        ]
         
         # Find user's rank
-        user_game_state = GameState.objects.filter(user=request.user).first()
-        user_rank = 0
-        if user_game_state:
-            field_name = 'points' if leaderboard_type == 'points' else ('level' if leaderboard_type == 'level' else 'current_streak')
-            user_value = getattr(user_game_state, field_name)
-            user_rank = GameState.objects.filter(**{f'{field_name}__gt': user_value}).count() + 1
+        user_rank, _ = leaderboards.rank_of(request.user.id, leaderboard_type, period)
         
         return success_response(data={
             'leaderboard': leaderboard,
@@ -942,8 +938,6 @@ class StatsProgressView(APIView):
         ]
     )
     def get(self, request):
-        from django.db.models import Count, Sum
-        from django.db.models.functions import TruncDate
         from datetime import timedelta
         from learning_vyakaran.models import LessonProgress, QuizResult
         
@@ -952,27 +946,29 @@ class StatsProgressView(APIView):
         
         # Calculate date range
         if period == 'week':
-            start_date = now - timedelta(days=7)
+            days = 7
         elif period == 'month':
-            start_date = now - timedelta(days=30)
+            days = 30
         else:  # year
-            start_date = now - timedelta(days=365)
+            days = 365
+        start_date = now - timedelta(days=days)
         
-        # Get activity data
-        activities = (
-            ActivityLog.objects.filter(
-                user=request.user,
-                created_at__gte=start_date
-            )
-            .annotate(day=TruncDate('created_at'))
-            .values('day')
-            .annotate(count=Count('id'))
-            .order_by('day')
+        # Get activity data (one rollup row per active day)
+        activity_days = activity_rollups.daily(
+            request.user, streaks.local_today(request.user.id, now) - timedelta(days=days)
         )
         
         daily_progress = [
-            {'date': item['day'], 'activities': item['count']}
-            for item in activities
+            {'date': day, 'activities': total}
+            for day, total in activity_days
+        ]
+        weekly_progress = [
+            {'weekStart': week, 'activities': total}
+            for week, total in activity_rollups.weekly(activity_days)
+        ]
+        monthly_progress = [
+            {'month': month.strftime('%Y-%m'), 'activities': total}
+            for month, total in activity_rollups.monthly(activity_days)
         ]
         
         # Get lessons completed
@@ -1002,8 +998,8 @@ class StatsProgressView(APIView):
         
         return success_response(data={
             'dailyProgress': daily_progress,
-            'weeklyProgress': [],  # Aggregate daily into weekly
-            'monthlyProgress': [],  # Aggregate daily into monthly
+            'weeklyProgress': weekly_progress,
+            'monthlyProgress': monthly_progress,
             'lessonsCompleted': lessons_completed,
             'quizzesTaken': quizzes_taken,
             'categories': categories
@@ -4,14 +4,17 @@ Comprehensive admin panel for content management.
 """
 
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
+
+from . import game_catalog
 from .models import (
     Category, Lesson, LessonProgress, Quiz, Question, QuizResult,
-    Village, BuildingType, VillageBuilding,
+    Village, BuildingType, VillageBuilding, ResourceTransaction,
     Quest, QuestProgress,
     Achievement, UserAchievement, Badge, UserBadge,
     WritingPrompt, WritingSubmission,
-    Game, GameSession, Leaderboard
+    Game, GameSession, GameStart, GameDailyRollup, Leaderboard
 )
 
 
@@ -189,7 +192,7 @@ class QuizResultAdmin(admin.ModelAdmin):
 @admin.register(Village)
 class VillageAdmin(admin.ModelAdmin):
     """Admin for Village model."""
-    list_display = ['user', 'name', 'level', 'coins', 'knowledge_points', 'books', 'energy', 'building_count']
+    list_display = ['user', 'name', 'level', 'knowledge_points', 'books', 'energy', 'building_count']
     list_filter = ['level']
     search_fields = ['user__username', 'user__email', 'name']
     inlines = [VillageBuildingInline]
@@ -219,6 +222,16 @@ class VillageBuildingAdmin(admin.ModelAdmin):
     ordering = ['-created_at']
 
 
+@admin.register(ResourceTransaction)
+class ResourceTransactionAdmin(admin.ModelAdmin):
+    """Admin for ResourceTransaction ledger."""
+    list_display = ['user', 'resource', 'amount', 'reason', 'created_at']
+    list_filter = ['resource', 'reason']
+    search_fields = ['user__username', 'user__email', 'reason']
+    readonly_fields = ['user', 'resource', 'amount', 'reason', 'metadata', 'created_at']
+    ordering = ['-created_at']
+
+
 # =============================================================================
 # QUEST ADMIN
 # =============================================================================
@@ -413,25 +426,51 @@ class GameAdmin(admin.ModelAdmin):
     
     @admin.action(description='Feature selected games')
     def feature_games(self, request, queryset):
-        count = queryset.update(is_featured=True)
+        count = queryset.update(is_featured=True, updated_at=timezone.now())
+        game_catalog.invalidate()
         self.message_user(request, f'{count} game(s) featured.')
     
     @admin.action(description='Unfeature selected games')
     def unfeature_games(self, request, queryset):
-        count = queryset.update(is_featured=False)
+        count = queryset.update(is_featured=False, updated_at=timezone.now())
+        game_catalog.invalidate()
         self.message_user(request, f'{count} game(s) unfeatured.')
 
 
 @admin.register(GameSession)
 class GameSessionAdmin(admin.ModelAdmin):
     """Admin for GameSession model."""
-    list_display = ['user', 'game', 'score', 'high_score', 'points_earned', 'coins_earned', 'ended_at']
-    list_filter = ['game', 'high_score', 'ended_at']
+    list_display = ['user', 'game', 'score', 'high_score', 'flagged', 'points_earned', 'coins_earned', 'ended_at']
+    list_filter = ['game', 'high_score', 'flagged', 'ended_at']
     search_fields = ['user__username', 'user__email', 'game__name']
     readonly_fields = ['started_at', 'ended_at']
     ordering = ['-ended_at']
 
 
+@admin.register(GameStart)
+class GameStartAdmin(admin.ModelAdmin):
+    """Admin for GameStart model."""
+    list_display = ['user', 'game', 'started_at', 'ended_at']
+    list_filter = ['game', 'started_at']
+    search_fields = ['user__username', 'user__email', 'game__name']
+    readonly_fields = ['id', 'user', 'game', 'started_at', 'ended_at']
+    ordering = ['-started_at']
+
+
+@admin.register(GameDailyRollup)
+class GameDailyRollupAdmin(admin.ModelAdmin):
+    """Admin for GameDailyRollup model."""
+    list_display = ['user', 'game', 'day', 'plays', 'max_score', 'total_score', 'total_time']
+    list_filter = ['game', 'day']
+    search_fields = ['user__username', 'user__email', 'game__name']
+    readonly_fields = [
+        'user', 'game', 'day', 'plays', 'total_score', 'max_score',
+        'total_time', 'points_earned', 'coins_earned'
+    ]
+    ordering = ['-day']
+    date_hierarchy = 'day'
+
+
 @admin.register(Leaderboard)
 class LeaderboardAdmin(admin.ModelAdmin):
     """Admin for Leaderboard model."""
@@ -1,5 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class LearningVyakaranConfig(AppConfig):
     name = 'learning_vyakaran'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+
+        from . import building_types, game_catalog, leaderboards
+        from .models import BuildingType, Game
+
+        post_delete.connect(leaderboards.evict_user, sender=get_user_model())
+        post_save.connect(building_types.invalidate, sender=BuildingType)
+        post_delete.connect(building_types.invalidate, sender=BuildingType)
+        post_save.connect(game_catalog.invalidate, sender=Game)
+        post_delete.connect(game_catalog.invalidate, sender=Game)
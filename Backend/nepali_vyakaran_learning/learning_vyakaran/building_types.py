@@ -0,0 +1,61 @@
+"""
+Cached registry of building types.
+
+BuildingType is a tiny table that only changes through the admin or the
+setup scripts, but it is read on every village request. The whole table is
+cached as a single entry and looked up in memory, without a query.
+
+The entry is keyed on a version held in the cache, which BuildingType's
+post_save and post_delete signals replace (see apps.py). A reader that
+loaded the table just before a change can only store it under the old
+version, which nobody reads any more. Bulk updates send no signals and
+must call invalidate().
+
+A new version only reaches other workers through a shared cache (Redis).
+With the per-process LocMemCache the table is kept for LOCAL_CACHE_TIMEOUT
+only, so changes show everywhere within that time.
+"""
+
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+from accounts.utils import cache_is_local
+
+from .models import BuildingType
+
+
+CACHE_KEY = 'building_types:all'
+VERSION_KEY = 'building_types:version'
+CACHE_TIMEOUT = 60 * 60  # 1 hour, with a shared cache
+LOCAL_CACHE_TIMEOUT = 60  # with a per-process cache
+
+
+def invalidate(*args, **kwargs):
+    """Signal handler: start a new version once the change commits."""
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, uuid.uuid4().hex, None))
+
+
+def all_types():
+    """Return every building type, in the model's default ordering."""
+    key = f'{CACHE_KEY}:{cache.get_or_set(VERSION_KEY, uuid.uuid4().hex, None)}'
+    types = cache.get(key)
+    if types is None:
+        types = list(BuildingType.objects.all())
+        cache.set(key, types, LOCAL_CACHE_TIMEOUT if cache_is_local() else CACHE_TIMEOUT)
+    return types
+
+
+def active_types():
+    return [bt for bt in all_types() if bt.is_active]
+
+
+def get(building_type_id):
+    """Return the building type with this id, or None."""
+    return next((bt for bt in all_types() if bt.id == building_type_id), None)
+
+
+def get_by_slug(slug):
+    """Return the building type with this slug, or None."""
+    return next((bt for bt in all_types() if bt.slug == slug), None)
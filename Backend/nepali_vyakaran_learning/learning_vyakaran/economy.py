@@ -0,0 +1,225 @@
+"""
+Resource economy for the learning_vyakaran app.
+Atomic credits and conditional debits for coins, knowledge, books and energy.
+
+Coins live on the user's GameState; knowledge, books and energy live on the
+Village. Every change is a single conditional UPDATE per resource, so a
+purchase can never overdraw a balance even under concurrent requests, and
+every change is recorded in the ResourceTransaction ledger.
+
+Energy regenerates over time without any background job: the stored value
+is anchored at `Village.energy_updated_at` and regen is applied whenever it
+is read or changed (see Village.regenerated_energy).
+"""
+
+import random
+import time
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import GameState
+
+from .models import Village, ResourceTransaction
+
+
+# Resource name -> (owner model, balance field)
+RESOURCE_FIELDS = {
+    'coins': (GameState, 'coins'),
+    'knowledge': (Village, 'knowledge_points'),
+    'books': (Village, 'books'),
+    'energy': (Village, 'energy'),
+}
+
+
+# Compare-and-swap attempts for energy before giving up, and the base
+# backoff between them in seconds (doubled per attempt, with jitter)
+ENERGY_CAS_RETRIES = 5
+ENERGY_CAS_BACKOFF = 0.01
+
+
+class InsufficientResources(Exception):
+    """Raised when a debit would take a balance below zero."""
+
+    def __init__(self, resource, amount):
+        self.resource = resource
+        self.amount = amount
+        super().__init__(f'Insufficient {resource}: {amount} required.')
+
+
+class ResourceContention(Exception):
+    """Raised when a balance kept changing under a change; safe to retry."""
+
+    def __init__(self, resource):
+        self.resource = resource
+        super().__init__(f'{resource.capitalize()} changed concurrently; try again.')
+
+
+def _clean(amounts):
+    """Validate resource names and drop zero amounts."""
+    cleaned = {}
+    for resource, amount in amounts.items():
+        if resource not in RESOURCE_FIELDS:
+            raise ValueError(f'Unknown resource: {resource}')
+        if amount < 0:
+            raise ValueError('Amounts must be positive; use spend() for debits.')
+        if amount:
+            cleaned[resource] = amount
+    return cleaned
+
+
+def _record(user, changes, reason, metadata):
+    """Write ledger rows for a set of signed resource changes."""
+    ResourceTransaction.objects.bulk_create([
+        ResourceTransaction(
+            user=user,
+            resource=resource,
+            amount=amount,
+            reason=reason,
+            metadata=metadata or {}
+        )
+        for resource, amount in changes.items()
+    ])
+
+
+def _change_energy(user, delta, now):
+    """
+    Apply a signed energy change on top of lazily regenerated energy.
+
+    The new value depends on elapsed time, so it is computed in Python and
+    written with a compare-and-swap on (energy, energy_updated_at). If a
+    concurrent change makes the UPDATE match nothing, ResourceContention is
+    raised and the caller's transaction is restarted (see _retrying).
+    """
+    village = Village.objects.filter(user=user).only(
+        'id', 'energy', 'max_energy', 'energy_updated_at'
+    ).first()
+    if village is None:
+        if delta < 0:
+            raise InsufficientResources('energy', -delta)
+        village, _ = Village.objects.get_or_create(user=user)
+
+    energy, anchor = village.regenerated_energy(now)
+    if energy + delta < 0:
+        raise InsufficientResources('energy', -delta)
+
+    new_energy = min(energy + delta, village.max_energy)
+    if new_energy >= village.max_energy:
+        anchor = now
+
+    updated = Village.objects.filter(
+        id=village.id,
+        energy=village.energy,
+        energy_updated_at=village.energy_updated_at
+    ).update(energy=new_energy, energy_updated_at=anchor, updated_at=now)
+    if not updated:
+        raise ResourceContention('energy')
+
+
+def _retrying(apply):
+    """
+    Run `apply(now)` in a transaction, restarting the whole transaction when
+    an energy compare-and-swap loses, up to ENERGY_CAS_RETRIES attempts.
+
+    The backoff sleeps after the failed attempt has rolled back, so no row
+    locks are held while waiting. Inside a caller's transaction the locks
+    outlive our savepoint, so attempts are retried without sleeping.
+    """
+    nested = transaction.get_connection().in_atomic_block
+    for attempt in range(ENERGY_CAS_RETRIES):
+        if attempt and not nested:
+            time.sleep(ENERGY_CAS_BACKOFF * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+        try:
+            with transaction.atomic():
+                return apply(timezone.now())
+        except ResourceContention:
+            continue
+
+    raise ResourceContention('energy')
+
+
+def spend(user, costs, reason='', metadata=None):
+    """
+    Debit several resources in one transaction, all or nothing.
+
+    Each resource is debited with `UPDATE ... WHERE field >= amount` (energy
+    uses a compare-and-swap after regen); if any debit fails the whole
+    transaction is rolled back and InsufficientResources is raised, or
+    ResourceContention if energy kept changing concurrently.
+    """
+    costs = _clean(costs)
+    if not costs:
+        return
+
+    def apply(now):
+        for resource, amount in costs.items():
+            if resource == 'energy':
+                _change_energy(user, -amount, now)
+                continue
+
+            model, field = RESOURCE_FIELDS[resource]
+            updated = model.objects.filter(
+                user=user, **{f'{field}__gte': amount}
+            ).update(**{field: F(field) - amount, 'updated_at': now})
+            if not updated:
+                raise InsufficientResources(resource, amount)
+
+        _record(user, {r: -a for r, a in costs.items()}, reason, metadata)
+
+    _retrying(apply)
+
+
+def grant(user, amounts, reason='', metadata=None):
+    """
+    Credit several resources in one transaction.
+
+    Energy is capped at the village's max_energy.
+    """
+    amounts = _clean(amounts)
+    if not amounts:
+        return
+
+    def apply(now):
+        for resource, amount in amounts.items():
+            if resource == 'energy':
+                _change_energy(user, amount, now)
+                continue
+
+            model, field = RESOURCE_FIELDS[resource]
+            value = F(field) + amount
+
+            if not model.objects.filter(user=user).update(**{field: value, 'updated_at': now}):
+                model.objects.get_or_create(user=user)
+                model.objects.filter(user=user).update(**{field: value, 'updated_at': now})
+
+        _record(user, amounts, reason, metadata)
+
+    _retrying(apply)
+
+
+def balances(user):
+    """
+    Return the user's current resource balances in a single query.
+    """
+    row = Village.objects.filter(user=user).values(
+        'knowledge_points', 'books', 'energy', 'max_energy', 'energy_updated_at',
+        'user__game_state__coins'
+    ).first()
+
+    if row is None:
+        coins = GameState.objects.filter(user=user).values_list('coins', flat=True).first()
+        return {'coins': coins or 0, 'knowledge': 0, 'books': 0, 'energy': 0}
+
+    energy, _ = Village(
+        energy=row['energy'],
+        max_energy=row['max_energy'],
+        energy_updated_at=row['energy_updated_at']
+    ).regenerated_energy()
+
+    return {
+        'coins': row['user__game_state__coins'] or 0,
+        'knowledge': row['knowledge_points'],
+        'books': row['books'],
+        'energy': energy,
+    }
@@ -0,0 +1,57 @@
+"""
+Cached catalog of active games.
+
+The game list is the same for every user except for each user's high
+score. The serialized list of active games (with featured flags) is cached
+as one snapshot; GameListView overlays the caller's best scores, fetched in
+one query, on a copy of it.
+
+The snapshot is keyed on a version held in the cache, which Game's
+post_save and post_delete signals replace (see apps.py), so a cached read
+makes no query. Bulk updates, such as the admin's feature actions, send no
+signals and call invalidate() themselves. With the per-process
+LocMemCache a new version does not reach other workers, so the snapshot
+is then kept for LOCAL_CACHE_TIMEOUT only.
+"""
+
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+from accounts.utils import cache_is_local
+
+from .models import Game
+
+
+CACHE_KEY = 'game_catalog:active'
+VERSION_KEY = 'game_catalog:version'
+CACHE_TIMEOUT = 60 * 10  # 10 minutes, with a shared cache
+LOCAL_CACHE_TIMEOUT = 60  # with a per-process cache
+
+
+def invalidate(*args, **kwargs):
+    """Signal handler: start a new version once the change commits."""
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, uuid.uuid4().hex, None))
+
+
+def snapshot():
+    """Return the serialized active games, without user_high_score."""
+    key = f'{CACHE_KEY}:{cache.get_or_set(VERSION_KEY, uuid.uuid4().hex, None)}'
+    games = cache.get(key)
+    if games is None:
+        from .serializers import GameListSerializer
+
+        games = GameListSerializer(Game.objects.filter(is_active=True), many=True, context={'high_scores': {}}).data
+        games = [{k: v for k, v in game.items() if k != 'user_high_score'} for game in games]
+        cache.set(key, games, LOCAL_CACHE_TIMEOUT if cache_is_local() else CACHE_TIMEOUT)
+    return games
+
+
+def for_user(high_scores):
+    """Return the catalog with each game's `user_high_score` from {game_id: score}."""
+    high_scores = {str(game_id): score for game_id, score in high_scores.items()}
+    return [
+        {**game, 'user_high_score': high_scores.get(game['id'], 0)}
+        for game in snapshot()
+    ]
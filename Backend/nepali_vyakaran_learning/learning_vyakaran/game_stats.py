@@ -0,0 +1,101 @@
+"""
+Daily rollups of game sessions.
+
+Every unflagged game end adds the session to its (user, game, day)
+GameDailyRollup row with a single UPDATE. Raw GameSession rows are only
+kept for a retention window; `manage.py compact_game_sessions` re-derives
+the rollups of expired days from their sessions and then deletes those
+sessions. The rollups are read by that compaction and by
+`manage.py rollover_leaderboards --rebuild`, which takes best game scores
+from them; the stats views still read raw sessions.
+
+Days are local days (settings.TIME_ZONE). Period filters on raw sessions use
+day_start() bounds on `ended_at` rather than `ended_at__date`, so they can
+use the (game, ended_at) and (ended_at) indexes.
+"""
+
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from .models import GameSession, GameDailyRollup
+
+
+def day_start(day):
+    """Aware datetime at the start of a local day, for index-friendly filters."""
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def record_session(session):
+    """Add one finished session to its daily rollup row."""
+    day = timezone.localdate(session.ended_at)
+    rows = GameDailyRollup.objects.filter(user_id=session.user_id, game_id=session.game_id, day=day)
+    changes = {
+        'plays': F('plays') + 1,
+        'total_score': F('total_score') + session.score,
+        'max_score': Greatest(F('max_score'), session.score),
+        'total_time': F('total_time') + session.time_spent,
+        'points_earned': F('points_earned') + session.points_earned,
+        'coins_earned': F('coins_earned') + session.coins_earned,
+    }
+
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            GameDailyRollup.objects.create(
+                user_id=session.user_id,
+                game_id=session.game_id,
+                day=day,
+                plays=1,
+                total_score=session.score,
+                max_score=session.score,
+                total_time=session.time_spent,
+                points_earned=session.points_earned,
+                coins_earned=session.coins_earned
+            )
+    except IntegrityError:
+        # Created concurrently
+        rows.update(**changes)
+
+
+def aggregate_sessions(sessions):
+    """
+    Aggregate a session queryset into rollup field dicts per (user, game, day).
+    Flagged sessions are left out, as they are at game end.
+    """
+    return sessions.filter(flagged=False).annotate(day=TruncDate('ended_at')).values(
+        'user_id', 'game_id', 'day'
+    ).annotate(
+        plays=Count('id'),
+        total_score=Sum('score'),
+        max_score=Max('score'),
+        total_time=Sum('time_spent'),
+        points_earned=Sum('points_earned'),
+        coins_earned=Sum('coins_earned'),
+    ).order_by()
+
+
+@transaction.atomic
+def compact_day(day):
+    """
+    Replace the rollups of one closed day with totals derived from its raw
+    sessions, then delete those sessions. Returns the number deleted.
+    """
+    sessions = GameSession.objects.filter(
+        ended_at__gte=day_start(day),
+        ended_at__lt=day_start(day + datetime.timedelta(days=1))
+    )
+    if not sessions.exists():
+        return 0  # Nothing left to compact; keep the day's rollups
+
+    # Flagged sessions are left out, so rows may be empty; they are deleted all the same
+    rows = list(aggregate_sessions(sessions))
+    GameDailyRollup.objects.filter(day=day).delete()
+    GameDailyRollup.objects.bulk_create([GameDailyRollup(**row) for row in rows])
+
+    deleted, _ = sessions.delete()
+    return deleted
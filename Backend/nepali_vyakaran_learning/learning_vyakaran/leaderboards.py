@@ -0,0 +1,316 @@
+"""
+Materialized leaderboards.
+
+Leaderboard rows are maintained incrementally from score events instead of
+being aggregated from GameState/GameSession on every read. A board is the
+set of rows sharing (leaderboard_type, period, game, period_start):
+
+- points: points earned during the period (all_time mirrors GameState.points)
+- level, streak: all_time only, the user's current value
+- game: the user's best score in one game during the period; these rows are
+  also the per-user best-score table (see best_scores)
+
+Periods roll over by date: a new daily/weekly/monthly board starts with the
+first event that lands in it. Closed boards keep their rows until
+`manage.py rollover_leaderboards` writes their final ranks and prunes old
+ones. Reads walk leaderboard_board_score_idx, so top-N costs O(limit), the
+around-me window costs O(size) at any rank, and ranks come from the rank
+index (see rank_index.py) in O(log n).
+"""
+
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts import user_cards
+from accounts.models import GameState
+
+from .models import Leaderboard
+from .rank_index import LOAD_OVERLAP, get_rank_index
+
+
+PERIODS = ['daily', 'weekly', 'monthly', 'all_time']
+
+# Periods each leaderboard type is kept for
+TYPE_PERIODS = {
+    'points': PERIODS,
+    'level': ['all_time'],
+    'streak': ['all_time'],
+    'game': PERIODS,
+}
+
+# GameState column mirrored by each all-time user board
+GAME_STATE_FIELDS = {
+    'points': 'points',
+    'level': 'level',
+    'streak': 'current_streak',
+}
+
+# Fixed bounds so every all_time row belongs to the same board
+ALL_TIME_START = datetime.date(2000, 1, 1)
+ALL_TIME_END = datetime.date(9999, 12, 31)
+
+
+def normalize_period(period):
+    """Map query-string periods ('all-time', unknown values) onto PERIODS."""
+    period = (period or 'all_time').replace('-', '_')
+    return period if period in PERIODS else 'all_time'
+
+
+def period_bounds(period, day=None):
+    """Return (period_start, period_end) of the period containing `day`."""
+    day = day or timezone.localdate()
+    if period == 'daily':
+        return day, day
+    if period == 'weekly':
+        start = day - datetime.timedelta(days=day.weekday())
+        return start, start + datetime.timedelta(days=6)
+    if period == 'monthly':
+        start = day.replace(day=1)
+        next_month = (start + datetime.timedelta(days=32)).replace(day=1)
+        return start, next_month - datetime.timedelta(days=1)
+    return ALL_TIME_START, ALL_TIME_END
+
+
+def board(leaderboard_type, period='all_time', game=None, day=None):
+    """Queryset of the rows on one board."""
+    start, _ = period_bounds(period, day)
+    return Leaderboard.objects.filter(
+        leaderboard_type=leaderboard_type, period=period, game=game, period_start=start
+    )
+
+
+def board_key(leaderboard_type, period='all_time', game=None, day=None):
+    """Stable identifier of one board, used by the rank index."""
+    start, _ = period_bounds(period, day)
+    game_id = getattr(game, 'pk', game) or '-'
+    return f'{leaderboard_type}:{period}:{game_id}:{start.isoformat()}'
+
+
+# =============================================================================
+# WRITES
+# =============================================================================
+
+def _upsert(user_id, leaderboard_type, period, game, value, mode, day):
+    """
+    Apply one event to the user's row on one board; returns True if written.
+
+    mode 'add' adds to the score, 'max' only raises it, 'set' overwrites it.
+    The common case is a single UPDATE; the row is created on first use.
+    """
+    rows = board(leaderboard_type, period, game, day).filter(user_id=user_id)
+    now = timezone.now()
+
+    if mode == 'add':
+        changes, condition = {'score': F('score') + value}, {}
+    elif mode == 'max':
+        changes, condition = {'score': value}, {'score__lt': value}
+    else:
+        changes, condition = {'score': value}, {}
+
+    key = board_key(leaderboard_type, period, game, day)
+
+    def update_index():
+        get_rank_index().apply(key, user_id, value, mode)
+
+    if rows.filter(**condition).update(updated_at=now, **changes):
+        transaction.on_commit(update_index)
+        return True
+    if rows.exists():
+        return False
+
+    start, end = period_bounds(period, day)
+    try:
+        with transaction.atomic():
+            Leaderboard.objects.create(
+                user_id=user_id,
+                leaderboard_type=leaderboard_type,
+                period=period,
+                game=game,
+                period_start=start,
+                period_end=end,
+                score=value
+            )
+    except IntegrityError:
+        # Created concurrently; apply the event to that row instead
+        if not rows.filter(**condition).update(updated_at=now, **changes):
+            return False
+    transaction.on_commit(update_index)
+    return True
+
+
+def record(user_id, leaderboard_type, value, game=None, mode='max', day=None):
+    """
+    Apply a score event to the user's current board for every period of the
+    type. Returns {period: written}.
+    """
+    day = day or timezone.localdate()
+    return {
+        period: _upsert(user_id, leaderboard_type, period, game, value, mode, day)
+        for period in TYPE_PERIODS[leaderboard_type]
+    }
+
+
+def record_points(user_id, earned, total, day=None):
+    """Add earned points to the periodic boards and mirror the all-time total."""
+    day = day or timezone.localdate()
+    for period in TYPE_PERIODS['points']:
+        if period == 'all_time':
+            _upsert(user_id, 'points', period, None, total, 'set', day)
+        elif earned:
+            _upsert(user_id, 'points', period, None, earned, 'add', day)
+
+
+def record_game_state(user_id, day=None):
+    """
+    Mirror the user's GameState onto the all-time points, level and streak
+    boards. Call after changing those columns directly (progress resets,
+    admin edits) instead of through a score event.
+    """
+    day = day or timezone.localdate()
+    values = GameState.objects.filter(user_id=user_id).values(*GAME_STATE_FIELDS.values()).first() or {}
+    for leaderboard_type, field in GAME_STATE_FIELDS.items():
+        _upsert(user_id, leaderboard_type, 'all_time', None, values.get(field, 0), 'set', day)
+
+
+def evict_user(sender, instance, **kwargs):
+    """Signal handler: drop a deleted user from the rank index."""
+    user_id = instance.pk  # cleared on the instance once the delete finishes
+    transaction.on_commit(lambda: get_rank_index().remove_member(user_id))
+
+
+# =============================================================================
+# READS
+# =============================================================================
+
+def top(leaderboard_type, period='all_time', game=None, limit=10, day=None):
+    """
+    Return the top `limit` entries of a board, each a user card plus `rank`
+    and `score`. Equal scores share a rank.
+    """
+    rows = list(
+        board(leaderboard_type, period, game, day).order_by('-score', 'user_id').values_list('user_id', 'score')[:limit]
+    )
+    cards = user_cards.get_cards(user_id for user_id, _ in rows)
+
+    entries = []
+    for position, (user_id, score) in enumerate(rows, 1):
+        card = cards.get(str(user_id))
+        if card is None:
+            continue
+        rank = entries[-1]['rank'] if entries and entries[-1]['score'] == score else position
+        entries.append({**card, 'rank': rank, 'score': score})
+    return entries
+
+
+def _neighbours(rows, user_id, score, size, above):
+    """
+    Up to `size` rows next to (score, user_id) in board order (score desc,
+    user_id asc), nearest first. Ties are read first, then the strictly
+    higher or lower scores; each is a keyset range on the board index.
+    """
+    if above:
+        ties = rows.filter(score=score, user_id__lt=user_id).order_by('-user_id')
+        beyond = rows.filter(score__gt=score).order_by('score', '-user_id')
+    else:
+        ties = rows.filter(score=score, user_id__gt=user_id).order_by('user_id')
+        beyond = rows.filter(score__lt=score).order_by('-score', 'user_id')
+
+    found = list(ties.values_list('user_id', 'score')[:size])
+    if len(found) < size:
+        found += list(beyond.values_list('user_id', 'score')[:size - len(found)])
+    return found
+
+
+def around(user_id, leaderboard_type, period='all_time', game=None, size=10, day=None):
+    """
+    Return the user's entry with up to `size` neighbours on each side, in
+    board order, each a user card plus `rank` and `score`. Returns [] if the
+    user is not on the board.
+
+    Neighbours are found by keyset from the user's own score rather than by
+    offset, so the cost does not depend on the user's rank.
+    """
+    rows = board(leaderboard_type, period, game, day)
+    score = rows.filter(user_id=user_id).values_list('score', flat=True).first()
+    if score is None:
+        return []
+
+    above = _neighbours(rows, user_id, score, size, above=True)
+    below = _neighbours(rows, user_id, score, size, above=False)
+    window = above[::-1] + [(user_id, score)] + below
+
+    index = _loaded_index(leaderboard_type, period, game, day)
+    key = board_key(leaderboard_type, period, game, day)
+    ranks = {value: index.rank_of_score(key, value) for value in {score for _, score in window}}
+    cards = user_cards.get_cards(entry_user_id for entry_user_id, _ in window)
+
+    entries = []
+    for entry_user_id, entry_score in window:
+        card = cards.get(str(entry_user_id))
+        if card is not None:
+            entries.append({**card, 'rank': ranks[entry_score], 'score': entry_score})
+    return entries
+
+
+def best_scores(user_id, games=None, period='all_time', day=None):
+    """Return {game_id: best score} for the user from the game boards, in one query."""
+    start, _ = period_bounds(period, day)
+    rows = Leaderboard.objects.filter(
+        user_id=user_id, leaderboard_type='game', period=period, period_start=start
+    )
+    if games is not None:
+        rows = rows.filter(game__in=games)
+    return dict(rows.values_list('game_id', 'score'))
+
+
+def rank_of(user_id, leaderboard_type, period='all_time', game=None, day=None):
+    """
+    Return (rank, score) of the user on a board, or (0, 0) if absent.
+    The board is loaded into the rank index on first use.
+    """
+    index = _loaded_index(leaderboard_type, period, game, day)
+    return index.rank(board_key(leaderboard_type, period, game, day), user_id)
+
+
+def warm(day=None):
+    """
+    Load the current user boards (points for every period, level, streak)
+    into the rank index ahead of the first read, so no request pays for the
+    full board scan. Game boards still load on first read. Returns the
+    number of boards loaded.
+    """
+    index, loaded = get_rank_index(), 0
+    for leaderboard_type in GAME_STATE_FIELDS:
+        for period in TYPE_PERIODS[leaderboard_type]:
+            if not index.is_loaded(board_key(leaderboard_type, period, None, day)):
+                _loaded_index(leaderboard_type, period, None, day)
+                loaded += 1
+    return loaded
+
+
+def _loaded_index(leaderboard_type, period, game, day):
+    """
+    The rank index, with the board loaded into it. A loaded local board is
+    brought up to date with only the rows changed since its last sync.
+
+    A cold board is read whole, within the request that first needs it
+    (see the cost notes next to rank_index.LOCAL_INDEX_TTL); warm() loads
+    the user boards ahead of time.
+    """
+    index = get_rank_index()
+    key = board_key(leaderboard_type, period, game, day)
+    rows = board(leaderboard_type, period, game, day)
+    if not index.is_loaded(key):
+        _, end = period_bounds(period, day)
+        started = timezone.now()
+        index.load(key, rows.values_list('user_id', 'score'), period_end=end)
+        # Updates committed while loading were dropped as the board was not loaded yet
+        index.sync(key, rows.filter(updated_at__gte=started - LOAD_OVERLAP).values_list('user_id', 'score'))
+    else:
+        since = index.sync_since(key)
+        if since is not None:
+            index.sync(key, rows.filter(updated_at__gte=since).values_list('user_id', 'score'))
+    return index
@@ -0,0 +1,179 @@
+"""
+Management command to benchmark leaderboard reads as the user count grows.
+
+Seeds synthetic users and all-time points leaderboard rows in steps
+(default 10k, 100k, 1M users) and times, at each step:
+
+- board top-N: the materialized board query LeaderboardView runs
+- count rank: counting the rows that beat the middle user's score, the
+  O(rank) scan of the board that the rank index avoids
+- around me: the keyset window of a user in the middle of the board
+- cold load: the first around-me read with an empty rank index, which
+  loads the whole board into it
+- TTL sync: the first around-me read after LOCAL_INDEX_TTL expires, with a
+  few hundred rows changed behind the index's back (a local index applies
+  only those; a Redis index has nothing to sync)
+
+The top-N and around-me columns are medians of warm runs; the cold load
+and TTL sync columns are single requests.
+
+Everything runs inside one transaction that is rolled back at the end, so
+the database is left unchanged, and against a private local rank index, so
+a shared Redis index is never touched. The transaction holds the database
+write lock for the whole run, so the command refuses to run against a
+database that already has users unless --force is given. Board top-N
+should stay flat as the user count grows while count rank grows with it;
+--explain prints both query plans at the last step.
+"""
+
+import datetime
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from learning_vyakaran import leaderboards, rank_index
+from learning_vyakaran.models import Leaderboard
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded rows."""
+
+
+class Command(BaseCommand):
+    help = 'Benchmark top-N and around-me leaderboard queries at growing user counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[10000, 100000, 1000000],
+            help='User counts to benchmark at (default: 10000 100000 1000000)',
+        )
+        parser.add_argument('--limit', type=int, default=10, help='Top-N size (default: 10)')
+        parser.add_argument('--runs', type=int, default=20, help='Timed runs per query (default: 20)')
+        parser.add_argument('--explain', action='store_true', help='Print query plans at the last step')
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Run even if the database has users (it is locked for writes until the run ends)',
+        )
+
+    def handle(self, *args, **options):
+        if User.objects.exists() and not options['force']:
+            raise CommandError(
+                'The database has users; run the benchmark against an empty database or pass --force'
+            )
+
+        # A private index, so neither the process-wide nor a shared Redis index sees the seeded rows
+        shared_index = rank_index.get_rank_index()
+        self.index = rank_index._index = rank_index.LocalRankIndex()
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            rank_index._index = shared_index
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark rows rolled back'))
+
+    def run(self, options):
+        limit, runs = options['limit'], options['runs']
+        start, end = leaderboards.ALL_TIME_START, leaderboards.ALL_TIME_END
+        seeded, middle, changed = 0, None, []
+
+        self.stdout.write(
+            f'{"users":>10} {"board top-N":>14} {"count rank":>14} {"around me":>14} '
+            f'{"cold load":>14} {"TTL sync":>14}'
+        )
+        for size in sorted(options['sizes']):
+            while seeded < size:
+                batch = min(10000, size - seeded)
+                user_ids = self.seed(batch, seeded, start, end)
+                seeded += batch
+                middle = middle or user_ids[len(user_ids) // 2]
+                changed = changed or user_ids[:500]
+
+            # Seeded rows should look written long before the index is loaded
+            leaderboards.board('points').update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+            around = lambda: leaderboards.around(middle, 'points', size=limit)  # noqa: E731
+            count_rank = lambda: [self.count_rank_query(middle).count()]  # noqa: E731
+            self.index.clear()
+            cold = self.time_once(around)
+
+            timings = [
+                self.time(runs, lambda: leaderboards.board('points').order_by('-score', 'user_id')
+                          .values_list('user_id', 'score')[:limit]),
+                self.time(runs, count_rank),
+                self.time(runs, around),
+                cold,
+                self.time_after_ttl(around, changed),
+            ]
+            self.stdout.write(f'{size:>10} ' + ' '.join(f'{t * 1000:>11.3f} ms' for t in timings))
+
+        if options['explain']:
+            board_query = leaderboards.board('points').order_by('-score', 'user_id').values_list('user_id', 'score')
+            self.stdout.write('\nboard top-N plan:\n' + board_query[:limit].explain())
+            self.stdout.write('\ncount rank plan:\n' + self.count_rank_query(middle).explain())
+
+    @staticmethod
+    def count_rank_query(user_id):
+        """Rows of the all-time points board that beat the user's score."""
+        rows = leaderboards.board('points')
+        score = rows.filter(user_id=user_id).values_list('score', flat=True)
+        return rows.filter(score__gt=score)
+
+    def seed(self, count, offset, start, end):
+        """Create `count` users with random points and their all-time points rows."""
+        users = [
+            User(id=uuid.uuid4(), username=f'bench_{offset + i}', email=f'bench_{offset + i}@example.invalid')
+            for i in range(count)
+        ]
+        User.objects.bulk_create(users, batch_size=2000)
+
+        scores = [random.randint(0, 100000) for _ in users]
+        Leaderboard.objects.bulk_create([
+            Leaderboard(user=user, leaderboard_type='points', period='all_time',
+                        period_start=start, period_end=end, score=score)
+            for user, score in zip(users, scores)
+        ], batch_size=2000)
+        return [user.id for user in users]
+
+    def time_after_ttl(self, query, changed):
+        """Wall time of the first query after the local index TTL expires, with `changed` rows rescored."""
+        leaderboards.board('points').filter(user_id__in=changed).update(
+            score=F('score') + 1, updated_at=timezone.now()
+        )
+        ttl = rank_index.LOCAL_INDEX_TTL
+        rank_index.LOCAL_INDEX_TTL = 0
+        try:
+            return self.time_once(query)
+        finally:
+            rank_index.LOCAL_INDEX_TTL = ttl
+
+    @staticmethod
+    def time_once(query):
+        started = time.perf_counter()
+        list(query())
+        return time.perf_counter() - started
+
+    @staticmethod
+    def time(runs, query):
+        """Median wall time of evaluating the query, after one warm-up run."""
+        list(query())
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            list(query())
+            samples.append(time.perf_counter() - started)
+        return statistics.median(samples)
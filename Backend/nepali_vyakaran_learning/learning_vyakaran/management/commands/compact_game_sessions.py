@@ -0,0 +1,44 @@
+"""
+Management command to compact old game sessions into daily rollups.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from learning_vyakaran import game_stats, score_validation
+from learning_vyakaran.models import GameSession
+
+
+class Command(BaseCommand):
+    help = 'Roll raw game sessions older than the retention window into daily rollups and delete them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.GAME_SESSION_RETENTION_DAYS,
+            help='Days of raw sessions to keep (default: GAME_SESSION_RETENTION_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        pruned = score_validation.prune_starts()
+        if pruned:
+            self.stdout.write(f'  Pruned {pruned} stale game starts')
+
+        cutoff = timezone.localdate() - timezone.timedelta(days=options['days'])
+
+        oldest = GameSession.objects.order_by('ended_at').values_list('ended_at', flat=True).first()
+        if oldest is None:
+            self.stdout.write(self.style.SUCCESS('✓ No sessions to compact'))
+            return
+
+        day, total = timezone.localdate(oldest), 0
+        while day < cutoff:
+            deleted = game_stats.compact_day(day)
+            if deleted:
+                self.stdout.write(f'  {day}: {deleted} sessions')
+            total += deleted
+            day += timezone.timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Compacted {total} sessions older than {cutoff}'))
@@ -6,6 +6,7 @@ import json
 import os
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
+from accounts.jobs import no_progress
 from learning_vyakaran.models import (
     Category, Lesson, Quest, WritingPrompt, Game, Question, Quiz
 )
@@ -15,6 +16,7 @@ User = get_user_model()
 
 class Command(BaseCommand):
     help = 'Populate database with lessons, quests, and other content from JSON files'
+    stealth_options = ('progress',)  # A job's Progress (see accounts/jobs.py)
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -28,6 +30,7 @@ class Command(BaseCommand):
         from django.conf import settings
         project_root = settings.BASE_DIR
         data_dir = os.path.join(project_root, 'data')
+        progress = options.get('progress') or no_progress
         
         if options['clear']:
             self.stdout.write(self.style.WARNING('Clearing existing data...'))
@@ -55,6 +58,7 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS('✓ Created default category'))
 
         # Load and create lessons
+        progress(0, message='Loading lessons')
         self.stdout.write(self.style.MIGRATE_HEADING('\n📚 Loading Lessons...'))
         lessons_file = os.path.join(data_dir, 'lessons_data.json')
         if os.path.exists(lessons_file):
@@ -124,6 +128,7 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'❌ File not found: {lessons_file}'))
 
         # Load and create quests
+        progress(25, message='Loading quests')
         self.stdout.write(self.style.MIGRATE_HEADING('\n🎯 Loading Quests...'))
         quests_file = os.path.join(data_dir, 'quests_data.json')
         if os.path.exists(quests_file):
@@ -173,6 +178,7 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'❌ File not found: {quests_file}'))
 
         # Load and create writing prompts
+        progress(50, message='Loading writing prompts')
         self.stdout.write(self.style.MIGRATE_HEADING('\n✍️ Loading Writing Prompts...'))
         prompts_file = os.path.join(data_dir, 'writing_prompts_data.json')
         if os.path.exists(prompts_file):
@@ -208,6 +214,7 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'❌ File not found: {prompts_file}'))
 
         # Load and create game questions
+        progress(75, message='Loading game questions')
         self.stdout.write(self.style.MIGRATE_HEADING('\n🎮 Loading Game Questions...'))
         questions_file = os.path.join(data_dir, 'game_questions_data.json')
         if os.path.exists(questions_file):
@@ -4,11 +4,13 @@ Management command to populate lesson questions from game_questions_data.json
 import json
 import uuid
 from django.core.management.base import BaseCommand
+from accounts.jobs import no_progress
 from learning_vyakaran.models import Lesson, Question
 
 
 class Command(BaseCommand):
     help = 'Populate lesson questions from game questions data'
+    stealth_options = ('progress',)  # A job's Progress (see accounts/jobs.py)
 
     def handle(self, *args, **kwargs):
         # Load game questions
@@ -30,7 +32,9 @@ class Command(BaseCommand):
         questions_per_lesson = 3
         created_count = 0
 
+        progress = kwargs.get('progress') or no_progress
         for idx, lesson in enumerate(lessons):
+            progress(idx, len(lessons), f'Adding questions to {lesson.title}')
             # Get questions for this lesson (round-robin distribution)
             start_idx = (idx * questions_per_lesson) % len(game_questions)
             lesson_questions = []
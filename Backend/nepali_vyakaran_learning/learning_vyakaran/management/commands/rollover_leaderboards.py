@@ -0,0 +1,127 @@
+"""
+Management command to roll materialized leaderboards over.
+
+Writes the final rank of every row on closed daily/weekly/monthly boards and
+prunes old daily boards. With --rebuild, first rebuilds the all-time points,
+level and streak boards from GameState and the current game boards from
+the daily game rollups, to repair boards that drifted from their sources.
+Migration 0008 backfills the boards when they are first created.
+
+Finally loads the current user boards into the rank index, so with a
+shared (Redis) index no request pays for loading a new period's board.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Max, Window
+from django.db.models.functions import Rank
+from django.utils import timezone
+
+from accounts.jobs import no_progress
+from accounts.models import GameState
+from learning_vyakaran import leaderboards
+from learning_vyakaran.models import GameDailyRollup, Leaderboard
+from learning_vyakaran.rank_index import get_rank_index
+
+
+class Command(BaseCommand):
+    help = 'Finalize ranks on closed leaderboards and prune old daily boards'
+    stealth_options = ('progress',)  # A job's Progress (see accounts/jobs.py)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            default=30,
+            help='Days of closed daily boards to keep (default: 30)',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Backfill current boards from GameState and game rollups first',
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        progress = options.get('progress') or no_progress
+
+        if options['rebuild']:
+            progress(0, message='Rebuilding leaderboards')
+            self.rebuild(today)
+
+        progress(50 if options['rebuild'] else 0, message='Ranking closed boards')
+        ranked = self.finalize(today)
+        self.stdout.write(self.style.SUCCESS(f'✓ Ranked {ranked} entries on closed boards'))
+
+        progress(90, message='Pruning old daily boards')
+        cutoff = today - timezone.timedelta(days=options['keep_days'])
+        pruned, _ = Leaderboard.objects.filter(period='daily', period_end__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'✓ Pruned {pruned} old daily entries'))
+
+        warmed = leaderboards.warm(today)
+        self.stdout.write(self.style.SUCCESS(f'✓ Loaded {warmed} boards into the rank index'))
+
+    def finalize(self, today):
+        """Write competition ranks for boards whose period has ended."""
+        rows = Leaderboard.objects.filter(period_end__lt=today, rank=0).annotate(
+            position=Window(
+                expression=Rank(),
+                partition_by=[F('leaderboard_type'), F('period'), F('game'), F('period_start')],
+                order_by=F('score').desc()
+            )
+        ).only('id')
+
+        batch, total = [], 0
+        for row in rows.iterator(chunk_size=2000):
+            row.rank = row.position
+            batch.append(row)
+            if len(batch) >= 2000:
+                Leaderboard.objects.bulk_update(batch, ['rank'])
+                total += len(batch)
+                batch = []
+        if batch:
+            Leaderboard.objects.bulk_update(batch, ['rank'])
+            total += len(batch)
+        return total
+
+    @transaction.atomic
+    def rebuild(self, today):
+        """Replace the all-time user boards and current game boards from source tables."""
+        start, end = leaderboards.ALL_TIME_START, leaderboards.ALL_TIME_END
+
+        Leaderboard.objects.filter(
+            leaderboard_type__in=['points', 'level', 'streak'], period='all_time'
+        ).delete()
+        entries = []
+        fields = leaderboards.GAME_STATE_FIELDS
+        for row in GameState.objects.values('user_id', *fields.values()).iterator():
+            for leaderboard_type, field in fields.items():
+                entries.append(Leaderboard(
+                    user_id=row['user_id'], leaderboard_type=leaderboard_type, period='all_time',
+                    period_start=start, period_end=end, score=row[field]
+                ))
+        Leaderboard.objects.bulk_create(entries, batch_size=2000)
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt {len(entries)} user leaderboard entries'))
+
+        entries = []
+        for period in leaderboards.TYPE_PERIODS['game']:
+            period_start, period_end = leaderboards.period_bounds(period, today)
+            Leaderboard.objects.filter(
+                leaderboard_type='game', period=period, period_start=period_start
+            ).delete()
+
+            rollups = GameDailyRollup.objects.all()
+            if period != 'all_time':
+                rollups = rollups.filter(day__gte=period_start)
+            best_scores = rollups.values('user_id', 'game_id').annotate(best=Max('max_score')).order_by()
+
+            for row in best_scores.iterator():
+                entries.append(Leaderboard(
+                    user_id=row['user_id'], leaderboard_type='game', period=period, game_id=row['game_id'],
+                    period_start=period_start, period_end=period_end, score=row['best']
+                ))
+        Leaderboard.objects.bulk_create(entries, batch_size=2000)
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt {len(entries)} game leaderboard entries'))
+
+        # Boards are reloaded from the rebuilt table on next read
+        transaction.on_commit(get_rank_index().clear)
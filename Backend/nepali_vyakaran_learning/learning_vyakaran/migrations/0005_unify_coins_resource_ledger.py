@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fold_village_coins_into_game_state(apps, schema_editor):
+    """
+    Move each village's coin balance onto the owner's GameState so coins
+    have a single source of truth.
+    """
+    Village = apps.get_model('learning_vyakaran', 'Village')
+    GameState = apps.get_model('accounts', 'GameState')
+    
+    for user_id, coins in Village.objects.filter(coins__gt=0).values_list('user_id', 'coins').iterator():
+        updated = GameState.objects.filter(user_id=user_id).update(coins=F('coins') + coins)
+        if not updated:
+            GameState.objects.create(user_id=user_id, coins=coins)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning_vyakaran', '0004_migrate_exercises_to_questions'),
+        ('accounts', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(fold_village_coins_into_game_state, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='village',
+            name='coins',
+        ),
+        migrations.CreateModel(
+            name='ResourceTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(choices=[('coins', 'Coins'), ('knowledge', 'Knowledge'), ('books', 'Books'), ('energy', 'Energy')], max_length=20)),
+                ('amount', models.IntegerField()),
+                ('reason', models.CharField(blank=True, max_length=100)),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resource_transactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Resource Transaction',
+                'verbose_name_plural': 'Resource Transactions',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'created_at'], name='learning_vy_user_id_74283a_idx')],
+            },
+        ),
+    ]
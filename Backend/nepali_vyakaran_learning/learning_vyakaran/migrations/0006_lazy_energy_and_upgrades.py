@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:01
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning_vyakaran', '0005_unify_coins_resource_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='buildingtype',
+            name='upgrade_time',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='village',
+            name='energy_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='villagebuilding',
+            name='upgrade_level',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning_vyakaran', '0006_lazy_energy_and_upgrades'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='village',
+            name='layout_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,125 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:08
+
+import datetime
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+
+# Copied from leaderboards.py so the migration does not change with it
+ALL_TIME_START = datetime.date(2000, 1, 1)
+ALL_TIME_END = datetime.date(9999, 12, 31)
+GAME_STATE_FIELDS = {'points': 'points', 'level': 'level', 'streak': 'current_streak'}
+PERIODS = ['daily', 'weekly', 'monthly']
+GAME_PERIODS = ['daily', 'weekly', 'monthly', 'all_time']
+BATCH_SIZE = 2000
+
+
+def period_bounds(period, day):
+    if period == 'daily':
+        return day, day
+    if period == 'weekly':
+        start = day - datetime.timedelta(days=day.weekday())
+        return start, start + datetime.timedelta(days=6)
+    if period == 'monthly':
+        start = day.replace(day=1)
+        next_month = (start + datetime.timedelta(days=32)).replace(day=1)
+        return start, next_month - datetime.timedelta(days=1)
+    return ALL_TIME_START, ALL_TIME_END
+
+
+def start_of(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def backfill_user_boards(apps, schema_editor):
+    """
+    Build the all-time points, level and streak boards from GameState, and
+    the current daily, weekly and monthly points boards from the points
+    earned in quiz results and game sessions of each period (the only point
+    awards recorded with a time).
+    """
+    GameState = apps.get_model('accounts', 'GameState')
+    Leaderboard = apps.get_model('learning_vyakaran', 'Leaderboard')
+    QuizResult = apps.get_model('learning_vyakaran', 'QuizResult')
+    GameSession = apps.get_model('learning_vyakaran', 'GameSession')
+
+    entries = []
+    for row in GameState.objects.values('user_id', *GAME_STATE_FIELDS.values()).iterator():
+        for leaderboard_type, field in GAME_STATE_FIELDS.items():
+            entries.append(Leaderboard(
+                user_id=row['user_id'], leaderboard_type=leaderboard_type, period='all_time',
+                period_start=ALL_TIME_START, period_end=ALL_TIME_END, score=row[field]
+            ))
+
+    today = timezone.localdate()
+    for period in PERIODS:
+        start, end = period_bounds(period, today)
+        earned = Counter()
+        for model, field in ((QuizResult, 'completed_at'), (GameSession, 'ended_at')):
+            rows = model.objects.filter(**{f'{field}__gte': start_of(start), 'points_earned__gt': 0})
+            for user_id, points in rows.values('user_id').annotate(total=Sum('points_earned')).values_list(
+                'user_id', 'total'
+            ).order_by():
+                earned[user_id] += points
+        entries.extend(
+            Leaderboard(user_id=user_id, leaderboard_type='points', period=period,
+                        period_start=start, period_end=end, score=points)
+            for user_id, points in earned.items()
+        )
+
+    Leaderboard.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+
+
+def backfill_game_boards(apps, schema_editor):
+    """
+    Build each user's best score per game, for all time and the current
+    daily, weekly and monthly periods, from their game sessions. These rows
+    are the best-score table, so existing high scores carry over.
+    """
+    Leaderboard = apps.get_model('learning_vyakaran', 'Leaderboard')
+    GameSession = apps.get_model('learning_vyakaran', 'GameSession')
+
+    today = timezone.localdate()
+    entries = []
+    for period in GAME_PERIODS:
+        start, end = period_bounds(period, today)
+        sessions = GameSession.objects.all()
+        if period != 'all_time':
+            sessions = sessions.filter(ended_at__gte=start_of(start))
+        best = sessions.values('user_id', 'game_id').annotate(best=Max('score')).order_by()
+        entries.extend(
+            Leaderboard(user_id=row['user_id'], leaderboard_type='game', period=period, game_id=row['game_id'],
+                        period_start=start, period_end=end, score=row['best'])
+            for row in best.iterator()
+        )
+    Leaderboard.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning_vyakaran', '0007_village_layout_version'),
+        ('accounts', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['leaderboard_type', 'period', 'game', 'period_start', '-score'], name='leaderboard_board_score_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboard',
+            constraint=models.UniqueConstraint(condition=models.Q(('game__isnull', True)), fields=('leaderboard_type', 'period', 'period_start', 'user'), name='unique_leaderboard_entry'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboard',
+            constraint=models.UniqueConstraint(condition=models.Q(('game__isnull', False)), fields=('leaderboard_type', 'period', 'period_start', 'game', 'user'), name='unique_game_leaderboard_entry'),
+        ),
+        migrations.RunPython(backfill_user_boards, migrations.RunPython.noop),
+        migrations.RunPython(backfill_game_boards, migrations.RunPython.noop),
+    ]
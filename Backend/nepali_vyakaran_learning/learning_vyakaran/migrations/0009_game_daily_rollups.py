@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    """Aggregate existing game sessions into daily rollups."""
+    GameSession = apps.get_model('learning_vyakaran', 'GameSession')
+    GameDailyRollup = apps.get_model('learning_vyakaran', 'GameDailyRollup')
+    
+    rows = GameSession.objects.annotate(day=TruncDate('ended_at')).values(
+        'user_id', 'game_id', 'day'
+    ).annotate(
+        plays=Count('id'),
+        total_score=Sum('score'),
+        max_score=Max('score'),
+        total_time=Sum('time_spent'),
+        points_earned=Sum('points_earned'),
+        coins_earned=Sum('coins_earned'),
+    ).order_by()
+    
+    GameDailyRollup.objects.bulk_create(
+        (GameDailyRollup(**row) for row in rows.iterator()),
+        batch_size=2000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning_vyakaran', '0008_leaderboard_materialization'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('plays', models.PositiveIntegerField(default=0)),
+                ('total_score', models.PositiveBigIntegerField(default=0)),
+                ('max_score', models.PositiveIntegerField(default=0)),
+                ('total_time', models.PositiveIntegerField(default=0)),
+                ('points_earned', models.PositiveIntegerField(default=0)),
+                ('coins_earned', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Game Daily Rollup',
+                'verbose_name_plural': 'Game Daily Rollups',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(fields=['game', 'ended_at'], name='learning_vy_game_id_127faf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(fields=['ended_at'], name='learning_vy_ended_a_c455d3_idx'),
+        ),
+        migrations.AddField(
+            model_name='gamedailyrollup',
+            name='game',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='learning_vyakaran.game'),
+        ),
+        migrations.AddField(
+            model_name='gamedailyrollup',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='game_rollups', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='gamedailyrollup',
+            index=models.Index(fields=['user', 'day'], name='learning_vy_user_id_fddacc_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='gamedailyrollup',
+            constraint=models.UniqueConstraint(fields=('game', 'day', 'user'), name='unique_game_daily_rollup'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning_vyakaran', '0009_game_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='flag_reasons',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='gamesession',
+            name='flagged',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning_vyakaran', '0010_game_session_flags'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='leaderboard',
+            name='leaderboard_board_score_idx',
+        ),
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['leaderboard_type', 'period', 'game', 'period_start', '-score', 'user'], name='leaderboard_board_score_idx'),
+        ),
+    ]
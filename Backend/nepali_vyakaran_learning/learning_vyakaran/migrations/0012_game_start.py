@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:02
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning_vyakaran', '0011_leaderboard_board_user_tiebreak'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameStart',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='starts', to='learning_vyakaran.game')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='game_starts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Game Start',
+                'verbose_name_plural': 'Game Starts',
+                'indexes': [models.Index(fields=['started_at'], name='learning_vy_started_5a16e2_idx')],
+            },
+        ),
+    ]
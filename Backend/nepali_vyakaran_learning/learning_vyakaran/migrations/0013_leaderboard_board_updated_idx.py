@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning_vyakaran', '0012_game_start'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['leaderboard_type', 'period', 'game', 'period_start', 'updated_at'], name='leaderboard_board_updated_idx'),
+        ),
+    ]
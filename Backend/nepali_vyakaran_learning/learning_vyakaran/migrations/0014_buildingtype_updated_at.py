@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning_vyakaran', '0013_leaderboard_board_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='buildingtype',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -356,12 +356,15 @@ class Village(models.Model):
     grid_width = models.PositiveIntegerField(default=10)
     grid_height = models.PositiveIntegerField(default=10)
     
-    # Resources
-    coins = models.PositiveIntegerField(default=100)
+    # Resources (coins live on the user's GameState, see economy.py)
     knowledge_points = models.PositiveIntegerField(default=0)
     books = models.PositiveIntegerField(default=0)
     energy = models.PositiveIntegerField(default=100)
     max_energy = models.PositiveIntegerField(default=100)
+    energy_updated_at = models.DateTimeField(default=timezone.now)  # Regen anchor for `energy`
+    
+    # Bumped on every building placement change; keys the occupancy grid cache
+    layout_version = models.PositiveIntegerField(default=0)
     
     # Village data
     building_data = models.JSONField(default=list)  # List of placed buildings
@@ -376,6 +379,27 @@ class Village(models.Model):
     
     def __str__(self):
         return f"{self.user.username}'s Village - Level {self.level}"
+    
+    def regenerated_energy(self, now=None):
+        """
+        Return (energy, anchor) with time-based regeneration applied.
+        
+        Energy is stored as the value at `energy_updated_at`; one point is
+        regained every VILLAGE_ENERGY_REGEN_SECONDS up to max_energy. The
+        returned anchor keeps any partial progress towards the next point.
+        """
+        now = now or timezone.now()
+        rate = settings.VILLAGE_ENERGY_REGEN_SECONDS
+        
+        if self.energy >= self.max_energy or rate <= 0:
+            return self.energy, now
+        
+        elapsed = max(0, int((now - self.energy_updated_at).total_seconds()))
+        gained = elapsed // rate
+        energy = self.energy + gained
+        if energy >= self.max_energy:
+            return self.max_energy, now
+        return energy, self.energy_updated_at + timezone.timedelta(seconds=gained * rate)
 
 
 class BuildingType(models.Model):
@@ -395,6 +419,7 @@ class BuildingType(models.Model):
     # Cost to build
     coin_cost = models.PositiveIntegerField(default=0)
     knowledge_cost = models.PositiveIntegerField(default=0)
+    upgrade_time = models.PositiveIntegerField(default=0)  # seconds per level, 0 = instant
     
     # Benefits
     benefits = models.JSONField(default=dict)
@@ -405,6 +430,7 @@ class BuildingType(models.Model):
     
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Versions the cached registry (building_types.py)
     
     class Meta:
         verbose_name = 'Building Type'
@@ -436,6 +462,7 @@ class VillageBuilding(models.Model):
     
     level = models.PositiveIntegerField(default=1)
     is_upgrading = models.BooleanField(default=False)
+    upgrade_level = models.PositiveIntegerField(null=True, blank=True)  # Target while upgrading
     upgrade_complete_at = models.DateTimeField(null=True, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
@@ -447,6 +474,60 @@ class VillageBuilding(models.Model):
     
     def __str__(self):
         return f"{self.building_type.name} in {self.village.user.username}'s village"
+    
+    def settle(self, now=None):
+        """
+        Complete a finished upgrade in memory.
+        
+        Upgrades are never finished by a background job; whoever observes
+        the building after `upgrade_complete_at` sees the new level, and the
+        next write to the row persists it. Returns True if anything changed.
+        """
+        now = now or timezone.now()
+        if not self.is_upgrading or self.upgrade_complete_at is None or self.upgrade_complete_at > now:
+            return False
+        
+        self.level = self.upgrade_level or self.level
+        self.is_upgrading = False
+        self.upgrade_level = None
+        self.upgrade_complete_at = None
+        return True
+
+
+class ResourceTransaction(models.Model):
+    """
+    Ledger of resource credits and debits made through the economy service.
+    """
+    RESOURCE_CHOICES = [
+        ('coins', 'Coins'),
+        ('knowledge', 'Knowledge'),
+        ('books', 'Books'),
+        ('energy', 'Energy'),
+    ]
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='resource_transactions'
+    )
+    
+    resource = models.CharField(max_length=20, choices=RESOURCE_CHOICES)
+    amount = models.IntegerField()  # Negative for debits
+    reason = models.CharField(max_length=100, blank=True)
+    metadata = models.JSONField(default=dict, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Resource Transaction'
+        verbose_name_plural = 'Resource Transactions'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} {self.amount:+d} {self.resource} ({self.reason})"
 
 
 # =============================================================================
@@ -844,6 +925,7 @@ class Game(models.Model):
     is_featured = models.BooleanField(default=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Versions the cached catalog (game_catalog.py)
     
     class Meta:
         verbose_name = 'Game'
@@ -873,6 +955,10 @@ class GameSession(models.Model):
     score = models.PositiveIntegerField(default=0)
     high_score = models.BooleanField(default=False)
     
+    # Set by score validation; flagged scores stay off leaderboards
+    flagged = models.BooleanField(default=False)
+    flag_reasons = models.JSONField(default=list, blank=True)
+    
     # Stats
     stats = models.JSONField(default=dict)
     time_spent = models.PositiveIntegerField(default=0)  # in seconds
@@ -888,11 +974,87 @@ class GameSession(models.Model):
         verbose_name = 'Game Session'
         verbose_name_plural = 'Game Sessions'
         ordering = ['-ended_at']
+        indexes = [
+            models.Index(fields=['game', 'ended_at']),
+            models.Index(fields=['ended_at']),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.game.name}: {self.score}"
 
 
+class GameStart(models.Model):
+    """
+    A started game, kept until its end is submitted so the end can be
+    checked against wall-clock time (see score_validation.py).
+    Stored in the database so any worker can accept the end.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)  # the session id
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='game_starts'
+    )
+    game = models.ForeignKey(
+        Game,
+        on_delete=models.CASCADE,
+        related_name='starts'
+    )
+    
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField(null=True, blank=True)  # set once the end is accepted
+    
+    class Meta:
+        verbose_name = 'Game Start'
+        verbose_name_plural = 'Game Starts'
+        indexes = [
+            models.Index(fields=['started_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.game.name} at {self.started_at}"
+
+
+class GameDailyRollup(models.Model):
+    """
+    Per user, game and day totals of game sessions.
+    Kept up to date at game end; raw sessions are compacted into it, and
+    the leaderboard rebuild reads best scores from it.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='game_rollups'
+    )
+    game = models.ForeignKey(
+        Game,
+        on_delete=models.CASCADE,
+        related_name='daily_rollups'
+    )
+    day = models.DateField()
+    
+    plays = models.PositiveIntegerField(default=0)
+    total_score = models.PositiveBigIntegerField(default=0)
+    max_score = models.PositiveIntegerField(default=0)
+    total_time = models.PositiveIntegerField(default=0)  # in seconds
+    points_earned = models.PositiveIntegerField(default=0)
+    coins_earned = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Game Daily Rollup'
+        verbose_name_plural = 'Game Daily Rollups'
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['game', 'day', 'user'], name='unique_game_daily_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'day']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.game.name} on {self.day}: {self.plays} plays"
+
+
 class Leaderboard(models.Model):
     """
     Leaderboard entries.
@@ -943,6 +1105,29 @@ class Leaderboard(models.Model):
         ordering = ['rank']
         indexes = [
             models.Index(fields=['leaderboard_type', 'period', 'rank']),
+            # One board is (type, period, game, period_start); top-N and the
+            # around-me window walk it by score, with user as the tie-breaker
+            models.Index(
+                fields=['leaderboard_type', 'period', 'game', 'period_start', '-score', 'user'],
+                name='leaderboard_board_score_idx'
+            ),
+            # Rows changed since a local rank index last synced the board
+            models.Index(
+                fields=['leaderboard_type', 'period', 'game', 'period_start', 'updated_at'],
+                name='leaderboard_board_updated_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['leaderboard_type', 'period', 'period_start', 'user'],
+                condition=models.Q(game__isnull=True),
+                name='unique_leaderboard_entry'
+            ),
+            models.UniqueConstraint(
+                fields=['leaderboard_type', 'period', 'period_start', 'game', 'user'],
+                condition=models.Q(game__isnull=False),
+                name='unique_game_leaderboard_entry'
+            ),
         ]
     
     def __str__(self):
@@ -0,0 +1,267 @@
+"""
+Rank index for materialized leaderboards.
+
+Counting the rows that beat a score walks the board's score index, which is
+O(rank). The rank index keeps each board as a sorted structure so a user's
+rank is found in O(log n):
+
+- RedisRankIndex: one sorted set per board (ZSCORE + ZCOUNT), shared by all
+  workers. Used when REDIS_URL is configured and redis is installed.
+- LocalRankIndex: a per-process stand-in holding a SortedList of scores per
+  board, so both rank reads and score changes are O(log n). Every
+  LOCAL_INDEX_TTL seconds a board is synced with the rows changed since its
+  last sync (by updated_at), so writes made by other workers show up within
+  that window without reloading the whole board.
+  At most MAX_LOCAL_BOARDS boards are kept (least recently used go first),
+  and boards of periods that have ended are dropped as new ones load.
+
+Boards are loaded lazily from the Leaderboard table on first read and then
+updated incrementally by leaderboards._upsert once its transaction commits.
+A board that is not loaded ignores updates; it is read from the table,
+including them, on next use. Rows changed from LOAD_OVERLAP before a load
+started are read again right after it, so a write that committed between
+the load's read and the board being stored is not lost.
+"""
+
+import datetime
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+from sortedcontainers import SortedList
+
+
+logger = logging.getLogger(__name__)
+
+# A cold board is read whole (one row per user) by the first request that
+# ranks on it. A local index does this once per worker process, and every
+# worker then holds its own copy of each board it has read, up to
+# MAX_LOCAL_BOARDS. With Redis the load happens once for all workers, and
+# `manage.py rollover_leaderboards` loads the current user boards ahead of
+# the first request (leaderboards.warm()).
+LOCAL_INDEX_TTL = 60  # seconds between syncs of a local board
+# Rows changed this long before a sync started are read again by the next
+# one, covering writes whose transaction committed after the sync read
+LOCAL_SYNC_OVERLAP = datetime.timedelta(seconds=30)
+# Rows changed this long before a load started are re-read after it
+LOAD_OVERLAP = datetime.timedelta(seconds=30)
+MAX_LOCAL_BOARDS = 64  # boards kept per process
+REDIS_INDEX_TTL = 24 * 60 * 60  # 1 day
+# Member stored in every Redis board so that empty boards exist as loaded;
+# its -inf score never counts towards a rank
+REDIS_LOADED_MEMBER = ''
+
+# Applies a change only if the board is loaded, in one step so the key
+# cannot expire between the check and the write
+REDIS_APPLY_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+if ARGV[3] == 'add' then
+    redis.call('ZINCRBY', KEYS[1], ARGV[2], ARGV[1])
+elseif ARGV[3] == 'max' then
+    redis.call('ZADD', KEYS[1], 'GT', ARGV[2], ARGV[1])
+else
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+end
+return 1
+"""
+
+
+class LocalRankIndex:
+    """
+    Per-process rank index: {member: score} plus sorted scores per board,
+    for at most `max_boards` boards.
+    """
+
+    def __init__(self, max_boards=MAX_LOCAL_BOARDS):
+        self.max_boards = max_boards
+        # key -> [synced_at (monotonic), synced_since (datetime), {member: score},
+        #         SortedList of scores, period_end (date)], least recently used first
+        self._boards = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._boards.clear()
+
+    def is_loaded(self, key):
+        with self._lock:
+            if key not in self._boards:
+                return False
+            self._boards.move_to_end(key)
+            return True
+
+    def load(self, key, entries, period_end=None):
+        since = timezone.now() - LOCAL_SYNC_OVERLAP
+        members = {str(member): score for member, score in entries}
+        with self._lock:
+            self._boards[key] = [time.monotonic(), since, members, SortedList(members.values()), period_end]
+            self._boards.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        """Drop boards of ended periods, then the least recently used over the cap."""
+        today = timezone.localdate()
+        for key in [key for key, board in self._boards.items() if board[4] is not None and board[4] < today]:
+            del self._boards[key]
+        while len(self._boards) > self.max_boards:
+            self._boards.popitem(last=False)
+
+    def sync_since(self, key):
+        """
+        If a loaded board is due for a sync, mark it synced and return the
+        time from which changed rows must be applied; otherwise None.
+        """
+        with self._lock:
+            board = self._boards.get(key)
+            if board is None or time.monotonic() - board[0] < LOCAL_INDEX_TTL:
+                return None
+            since = board[1]
+            board[0], board[1] = time.monotonic(), timezone.now() - LOCAL_SYNC_OVERLAP
+            return since
+
+    def sync(self, key, entries):
+        """Overwrite members' scores with rows read from the table."""
+        for member, score in entries:
+            self.apply(key, member, score, 'set')
+
+    def apply(self, key, member, value, mode):
+        """Apply an 'add', 'max' or 'set' change to a loaded board."""
+        member = str(member)
+        with self._lock:
+            board = self._boards.get(key)
+            if board is None:
+                return
+            members, scores = board[2], board[3]
+
+            old = members.get(member)
+            if mode == 'add':
+                new = (old or 0) + value
+            elif mode == 'max':
+                new = value if old is None else max(old, value)
+            else:
+                new = value
+            if new == old:
+                return
+
+            if old is not None:
+                scores.remove(old)
+            scores.add(new)
+            members[member] = new
+
+    def remove_member(self, member):
+        """Drop a member from every loaded board (syncs only see changed rows, not deleted ones)."""
+        member = str(member)
+        with self._lock:
+            for board in self._boards.values():
+                old = board[2].pop(member, None)
+                if old is not None:
+                    board[3].remove(old)
+
+    def rank(self, key, member):
+        """Return (rank, score) with equal scores sharing a rank, or (0, 0)."""
+        board = self._boards.get(key)
+        if board is None:
+            return 0, 0
+        members, scores = board[2], board[3]
+
+        score = members.get(str(member))
+        if score is None:
+            return 0, 0
+        return len(scores) - scores.bisect_right(score) + 1, score
+
+    def rank_of_score(self, key, score):
+        """Rank a score would hold on the board: 1 + entries scoring higher."""
+        board = self._boards.get(key)
+        if board is None:
+            return 0
+        scores = board[3]
+        return len(scores) - scores.bisect_right(score) + 1
+
+
+class RedisRankIndex:
+    """
+    Rank index backed by one Redis sorted set per board.
+    """
+
+    def __init__(self, url):
+        import redis  # get_rank_index() checks that the package is installed
+        self._redis = redis.Redis.from_url(url)
+        self._apply = self._redis.register_script(REDIS_APPLY_SCRIPT)
+
+    @staticmethod
+    def _key(key):
+        return f'rank_index:{key}'
+
+    def clear(self):
+        for redis_key in self._redis.scan_iter(self._key('*')):
+            self._redis.delete(redis_key)
+
+    def is_loaded(self, key):
+        return bool(self._redis.exists(self._key(key)))
+
+    def load(self, key, entries, period_end=None):
+        # Boards expire after REDIS_INDEX_TTL, so ended periods go by themselves
+        redis_key = self._key(key)
+        mapping = {str(member): score for member, score in entries}
+        mapping[REDIS_LOADED_MEMBER] = float('-inf')
+
+        pipe = self._redis.pipeline()
+        pipe.delete(redis_key)
+        pipe.zadd(redis_key, mapping)
+        pipe.expire(redis_key, REDIS_INDEX_TTL)
+        pipe.execute()
+
+    def sync_since(self, key):
+        # Every worker writes to the shared sorted set; nothing to sync
+        return None
+
+    def sync(self, key, entries):
+        """
+        Apply rows re-read after a load. Only raises scores: a re-read row
+        can be older than an increment applied since, and boards only fall
+        on admin edits, which are applied directly.
+        """
+        mapping = {str(member): score for member, score in entries}
+        if mapping:
+            self._redis.zadd(self._key(key), mapping, gt=True)
+
+    def apply(self, key, member, value, mode):
+        self._apply(keys=[self._key(key)], args=[str(member), value, mode])
+
+    def remove_member(self, member):
+        for redis_key in self._redis.scan_iter(self._key('*')):
+            self._redis.zrem(redis_key, str(member))
+
+    def rank(self, key, member):
+        redis_key = self._key(key)
+        score = self._redis.zscore(redis_key, str(member))
+        if score is None:
+            return 0, 0
+        above = self._redis.zcount(redis_key, f'({score}', '+inf')
+        return above + 1, int(score)
+
+    def rank_of_score(self, key, score):
+        return self._redis.zcount(self._key(key), f'({score}', '+inf') + 1
+
+
+_index = None
+
+
+def get_rank_index():
+    """Return the configured rank index, created once per process."""
+    global _index
+    if _index is None:
+        redis_url = getattr(settings, 'REDIS_URL', '')
+        if redis_url:
+            try:
+                import redis  # noqa: F401
+            except ImportError:
+                logger.warning('REDIS_URL is set but the redis package is not installed; using a local rank index')
+                redis_url = ''
+        _index = RedisRankIndex(redis_url) if redis_url else LocalRankIndex()
+    return _index
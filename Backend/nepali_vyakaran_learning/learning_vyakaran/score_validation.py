@@ -0,0 +1,241 @@
+"""
+Score validation for submitted game results.
+
+EndGameView runs every validator listed in settings.GAME_SCORE_VALIDATORS
+before it writes anything. A validator takes a ScoreAttempt and returns
+None when the attempt looks fine, or a (verdict, reason) pair where verdict
+is FLAG or REJECT:
+
+- REJECT: the submission is refused outright (impossible or abusive).
+- FLAG: the session is stored as flagged, earns only the game's base
+  rewards, and stays off leaderboards and the best-score table.
+
+Validators write nothing to the database: they read GameStart rows and
+the cache, never session history, so a rejected submission leaves its
+session open. The one exception is check_submission_rate, whose per-minute
+cache counter counts every submission, rejected ones included. Session
+starts live in the database so an end is accepted by any worker, not only
+the one that served the start. Once the verdict allows the result,
+EndGameView claims the session with claim_session() before writing it,
+and record_result() refreshes the per-user rolling statistics after.
+
+Starts older than START_TIMEOUT are pruned a batch at a time by
+claim_session(), and all at once by `manage.py compact_game_sessions`.
+
+Per-game limits are read from Game.settings:
+    max_score               highest score a single play can reach
+    max_score_per_second    highest sustainable scoring rate
+    min_time_spent          shortest plausible play, in seconds
+"""
+
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import GameStart
+
+
+FLAG = 'flag'
+REJECT = 'reject'
+
+# Fallbacks when a game does not configure its own limits
+MAX_TIME_SPENT = 4 * 60 * 60  # seconds
+MAX_SUBMISSIONS_PER_MINUTE = 10
+TIMING_TOLERANCE = 5  # seconds
+
+# Rolling score statistics (exponentially weighted mean and variance)
+STATS_ALPHA = 0.2
+STATS_MIN_SAMPLES = 5
+OUTLIER_Z_SCORE = 4.0
+STATS_TIMEOUT = 30 * 24 * 60 * 60  # 30 days
+
+START_TIMEOUT = 6 * 60 * 60  # Started sessions older than this can be pruned
+PRUNE_BATCH = 100  # Expired starts deleted per claimed session
+
+
+class ScoreAttempt:
+    """A submitted game result, as seen by the validators."""
+
+    def __init__(self, user, game, score, time_spent, stats=None, session_id=None, now=None):
+        self.user = user
+        self.game = game
+        self.score = score
+        self.time_spent = time_spent
+        self.stats = stats or {}
+        self.session_id = str(session_id) if session_id else None
+        self.now = now or timezone.now()
+
+    @property
+    def limits(self):
+        return self.game.settings if isinstance(self.game.settings, dict) else {}
+
+
+# =============================================================================
+# CACHE KEYS
+# =============================================================================
+
+def _stats_key(user_id, game_id):
+    return f'score_stats:{user_id}:{game_id}'
+
+
+def _rate_key(user_id, now):
+    return f'score_rate:{user_id}:{now.strftime("%Y%m%d%H%M")}'
+
+
+def remember_start(session_id, user, game, started_at):
+    """Called by StartGameView so the end can be checked against wall time."""
+    GameStart.objects.create(id=session_id, user=user, game=game, started_at=started_at)
+
+
+def prune_starts(now=None, limit=None):
+    """Delete session starts older than START_TIMEOUT, at most `limit` of them. Returns how many."""
+    cutoff = (now or timezone.now()) - timezone.timedelta(seconds=START_TIMEOUT)
+    expired = GameStart.objects.filter(started_at__lt=cutoff)
+    if limit is not None:
+        expired = GameStart.objects.filter(id__in=list(expired.values_list('id', flat=True)[:limit]))
+    deleted, _ = expired.delete()
+    return deleted
+
+
+# =============================================================================
+# VALIDATORS
+# =============================================================================
+
+def check_game_limits(attempt):
+    """Score and duration within the game's configured bounds."""
+    max_score = attempt.limits.get('max_score')
+    if max_score is not None and attempt.score > max_score:
+        return REJECT, f'Score exceeds the maximum of {max_score}.'
+
+    if attempt.time_spent > MAX_TIME_SPENT:
+        return FLAG, 'Unusually long session.'
+
+    min_time = attempt.limits.get('min_time_spent')
+    if min_time is not None and attempt.score > 0 and attempt.time_spent < min_time:
+        return REJECT, f'Session shorter than {min_time} seconds.'
+    return None
+
+
+def check_score_rate(attempt):
+    """Score reachable in the time spent."""
+    max_rate = attempt.limits.get('max_score_per_second')
+    if max_rate is None or attempt.score == 0:
+        return None
+    if attempt.score > max_rate * max(attempt.time_spent, 1):
+        return REJECT, 'Score is not reachable in the time spent.'
+    return None
+
+
+def check_session_timing(attempt):
+    """Claimed time fits the wall-clock time since the session was started."""
+    if not attempt.session_id:
+        return FLAG, 'Missing session.'
+
+    started = GameStart.objects.filter(id=attempt.session_id).values(
+        'user_id', 'game_id', 'started_at', 'ended_at'
+    ).first()
+    if started is None:
+        return REJECT, 'Unknown session.'
+    if started['user_id'] != attempt.user.id or started['game_id'] != attempt.game.id:
+        return REJECT, 'Session belongs to another user or game.'
+    if started['ended_at'] is not None:
+        return REJECT, 'Session already ended.'
+
+    elapsed = (attempt.now - started['started_at']).total_seconds()
+    if attempt.time_spent > elapsed + TIMING_TOLERANCE:
+        return FLAG, 'Claimed time exceeds elapsed time.'
+    return None
+
+
+def check_submission_rate(attempt):
+    """Not more game ends per minute than a person can play."""
+    key = _rate_key(attempt.user.id, attempt.now)
+    cache.add(key, 0, 120)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        count = 1
+    if count > MAX_SUBMISSIONS_PER_MINUTE:
+        return REJECT, 'Too many submissions.'
+    return None
+
+
+def check_recent_scores(attempt):
+    """Score not an extreme outlier against the user's own recent scores."""
+    stats = cache.get(_stats_key(attempt.user.id, attempt.game.id))
+    if not stats or stats['n'] < STATS_MIN_SAMPLES:
+        return None
+
+    # Floor the deviation so steady players can still improve
+    deviation = max(math.sqrt(stats['var']), stats['mean'] / 2, 1.0)
+    if (attempt.score - stats['mean']) / deviation > OUTLIER_Z_SCORE:
+        return FLAG, 'Score far above recent scores.'
+    return None
+
+
+# =============================================================================
+# PIPELINE
+# =============================================================================
+
+_validators = None
+
+
+def get_validators():
+    global _validators
+    if _validators is None:
+        _validators = [import_string(path) for path in settings.GAME_SCORE_VALIDATORS]
+    return _validators
+
+
+def validate(attempt):
+    """
+    Run every validator. Returns (verdict, reasons) where verdict is None,
+    FLAG or REJECT (the most severe result).
+    """
+    verdict, reasons = None, []
+    for validator in get_validators():
+        result = validator(attempt)
+        if result is None:
+            continue
+        result_verdict, reason = result
+        reasons.append(reason)
+        if result_verdict == REJECT or verdict is None:
+            verdict = result_verdict
+    return verdict, reasons
+
+
+def claim_session(attempt):
+    """
+    End the attempt's started session so it cannot be submitted again.
+    A conditional UPDATE on ended_at, so of several concurrent ends for one
+    session only one claims it. Returns False if it had already ended.
+    Attempts without a session (flagged by check_session_timing) pass.
+    Also prunes up to PRUNE_BATCH expired starts, so abandoned sessions do
+    not pile up between runs of compact_game_sessions.
+    """
+    if not attempt.session_id:
+        return True
+    claimed = GameStart.objects.filter(
+        id=attempt.session_id, ended_at__isnull=True
+    ).update(ended_at=attempt.now)
+    if claimed:
+        prune_starts(attempt.now, limit=PRUNE_BATCH)
+    return bool(claimed)
+
+
+def record_result(attempt, flagged=False):
+    """Fold an unflagged score into the user's rolling statistics once its session is written."""
+    if flagged:
+        return
+
+    key = _stats_key(attempt.user.id, attempt.game.id)
+    stats = cache.get(key) or {'n': 0, 'mean': float(attempt.score), 'var': 0.0}
+
+    diff = attempt.score - stats['mean']
+    stats['mean'] += STATS_ALPHA * diff
+    stats['var'] = (1 - STATS_ALPHA) * (stats['var'] + STATS_ALPHA * diff * diff)
+    stats['n'] += 1
+    cache.set(key, stats, STATS_TIMEOUT)
@@ -4,6 +4,7 @@ Handles lessons, quizzes, gamification, and content.
 """
 
 from rest_framework import serializers
+from . import leaderboards
 from .models import (
     Category, Lesson, LessonProgress, Quiz, Question, QuizResult,
     Village, BuildingType, VillageBuilding,
@@ -279,7 +280,7 @@ class BuildingTypeSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'name_nepali', 'slug', 'description',
             'icon', 'size_width', 'size_height',
-            'coin_cost', 'knowledge_cost', 'benefits',
+            'coin_cost', 'knowledge_cost', 'upgrade_time', 'benefits',
             'min_village_level', 'max_count', 'is_active'
         ]
 
@@ -292,14 +293,25 @@ class VillageBuildingSerializer(serializers.ModelSerializer):
         model = VillageBuilding
         fields = [
             'id', 'building_type', 'position_x', 'position_y',
-            'level', 'is_upgrading', 'upgrade_complete_at',
+            'level', 'is_upgrading', 'upgrade_level', 'upgrade_complete_at',
             'created_at', 'updated_at'
         ]
+    
+    def to_representation(self, instance):
+        # Finished upgrades are completed lazily when observed
+        instance.settle()
+        return super().to_representation(instance)
 
 
 class VillageSerializer(serializers.ModelSerializer):
-    """Serializer for Village model."""
+    """
+    Serializer for Village model.
+    Resources, level and grid size are read-only: they only change through
+    the economy service and the village endpoints that spend for them.
+    """
     buildings = VillageBuildingSerializer(many=True, read_only=True)
+    coins = serializers.SerializerMethodField()
+    energy = serializers.SerializerMethodField()
     
     class Meta:
         model = Village
@@ -310,6 +322,38 @@ class VillageSerializer(serializers.ModelSerializer):
             'buildings', 'building_data', 'decorations',
             'created_at', 'updated_at'
         ]
+        read_only_fields = [
+            'level', 'experience', 'grid_width', 'grid_height',
+            'knowledge_points', 'books', 'max_energy',
+        ]
+    
+    def update(self, instance, validated_data):
+        # Save only the submitted fields so concurrent spends, energy and the
+        # layout version (which keys the cached occupancy grid) are kept
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
+    
+    def get_coins(self, obj):
+        # Coins are held on the user's GameState
+        game_state = getattr(obj.user, 'game_state', None)
+        return game_state.coins if game_state else 0
+    
+    def get_energy(self, obj):
+        energy, _ = obj.regenerated_energy()
+        return energy
+
+
+def validate_grid_position(value):
+    """Validate a {x, y} grid position and coerce it to integers."""
+    try:
+        x, y = int(value.get('x', 0)), int(value.get('y', 0))
+    except (TypeError, ValueError):
+        raise serializers.ValidationError('Position must contain integer x and y.')
+    if x < 0 or y < 0:
+        raise serializers.ValidationError('Position must not be negative.')
+    return {'x': x, 'y': y}
 
 
 class AddBuildingSerializer(serializers.Serializer):
@@ -317,6 +361,44 @@ class AddBuildingSerializer(serializers.Serializer):
     building_type = serializers.SlugField(required=True)
     position = serializers.DictField(required=True)  # {x, y}
     level = serializers.IntegerField(default=1)
+    
+    def validate_position(self, value):
+        return validate_grid_position(value)
+
+
+class MoveBuildingSerializer(serializers.Serializer):
+    """Serializer for moving a building."""
+    position = serializers.DictField(required=True)  # {x, y}
+    
+    def validate_position(self, value):
+        return validate_grid_position(value)
+
+
+class LayoutBuildingSerializer(serializers.Serializer):
+    """One building in a desired village layout; omit `id` for new buildings."""
+    id = serializers.IntegerField(required=False)
+    building_type = serializers.SlugField(required=False)
+    position = serializers.DictField(required=True)  # {x, y}
+    
+    def validate_position(self, value):
+        return validate_grid_position(value)
+    
+    def validate(self, data):
+        if 'id' not in data and 'building_type' not in data:
+            raise serializers.ValidationError('New buildings need a building_type.')
+        return data
+
+
+class VillageLayoutSerializer(serializers.Serializer):
+    """Serializer for replacing the whole village layout."""
+    buildings = LayoutBuildingSerializer(many=True)
+    decorations = serializers.ListField(required=False)
+    
+    def validate_buildings(self, value):
+        ids = [b['id'] for b in value if 'id' in b]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError('A building appears more than once.')
+        return value
 
 
 class UpgradeBuildingSerializer(serializers.Serializer):
@@ -326,10 +408,10 @@ class UpgradeBuildingSerializer(serializers.Serializer):
 
 class UpdateResourcesSerializer(serializers.Serializer):
     """Serializer for updating village resources."""
-    coins = serializers.IntegerField(required=False)
-    knowledge = serializers.IntegerField(required=False)
-    books = serializers.IntegerField(required=False)
-    energy = serializers.IntegerField(required=False)
+    coins = serializers.IntegerField(min_value=0, required=False)
+    knowledge = serializers.IntegerField(min_value=0, required=False)
+    books = serializers.IntegerField(min_value=0, required=False)
+    energy = serializers.IntegerField(min_value=0, required=False)
     operation = serializers.ChoiceField(choices=['add', 'subtract'], required=True)
 
 
@@ -544,15 +626,15 @@ class GameListSerializer(serializers.ModelSerializer):
         ]
     
     def get_user_high_score(self, obj):
+        # Views listing many games pass the user's best scores in one map
+        if 'high_scores' in self.context:
+            return self.context['high_scores'].get(obj.id, 0)
+        
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return 0
         
-        session = GameSession.objects.filter(
-            user=request.user, game=obj
-        ).order_by('-score').first()
-        
-        return session.score if session else 0
+        return leaderboards.best_scores(request.user.id, games=[obj]).get(obj.id, 0)
 
 
 class GameDetailSerializer(serializers.ModelSerializer):
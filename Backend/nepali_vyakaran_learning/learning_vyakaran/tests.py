@@ -1,3 +1,852 @@
-from django.test import TestCase
+"""
+Tests for the learning_vyakaran app.
+"""
 
-# Create your tests here.
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import GameState
+from accounts.testing import (
+    FreshCacheMixin, MigrationTestCase, api_client, make_admin, make_game, make_user, make_villager,
+)
+
+from . import building_types, economy, game_catalog, game_stats, leaderboards, rank_index, score_validation, village_grid
+from .models import (
+    BuildingType, GameDailyRollup, GameSession, GameStart, ResourceTransaction, Village, VillageBuilding,
+)
+from .village_grid import OccupancyGrid
+
+
+User = get_user_model()
+
+
+# =============================================================================
+# ECONOMY
+# =============================================================================
+
+class EconomyTests(TestCase):
+    def setUp(self):
+        self.user, _ = make_villager(books=5)
+
+    def test_spend_debits_and_records_ledger(self):
+        economy.spend(self.user, {'coins': 30, 'books': 2}, reason='build')
+
+        self.assertEqual(economy.balances(self.user)['coins'], 70)
+        self.assertEqual(economy.balances(self.user)['books'], 3)
+        self.assertEqual(
+            sorted(ResourceTransaction.objects.values_list('resource', 'amount', 'reason')),
+            [('books', -2, 'build'), ('coins', -30, 'build')]
+        )
+
+    def test_spend_is_all_or_nothing(self):
+        with self.assertRaises(economy.InsufficientResources):
+            economy.spend(self.user, {'coins': 30, 'books': 50})
+
+        self.assertEqual(economy.balances(self.user)['coins'], 100)
+        self.assertFalse(ResourceTransaction.objects.exists())
+
+    def test_grant_rejects_negative_amounts(self):
+        with self.assertRaises(ValueError):
+            economy.grant(self.user, {'coins': -5})
+
+    def test_reward_does_not_overwrite_concurrent_spend(self):
+        # A reward path holding a stale GameState must not restore spent coins
+        stale = GameState.objects.get(user=self.user)
+        economy.spend(self.user, {'coins': 60})
+
+        stale.add_points(10)
+        economy.grant(self.user, {'coins': 5}, reason='lesson_complete')
+
+        game_state = GameState.objects.get(user=self.user)
+        self.assertEqual(game_state.coins, 45)
+        self.assertEqual(game_state.points, 10)
+
+    def test_update_resources_rejects_negative_amounts(self):
+        client = api_client(self.user)
+        response = client.post(
+            '/api/v1/village/resources/update/', {'coins': -5, 'operation': 'add'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_village_put_cannot_change_balances(self):
+        village = Village.objects.get(user=self.user)
+        # A spend made after the view loaded the village must survive its save
+        stale_save = Village.save
+
+        def spend_then_save(instance, *args, **kwargs):
+            economy.spend(self.user, {'books': 2})
+            stale_save(instance, *args, **kwargs)
+
+        with mock.patch.object(Village, 'save', spend_then_save):
+            response = api_client(self.user).put('/api/v1/village/', {
+                'name': 'Gaun', 'knowledge_points': 999, 'books': 999, 'max_energy': 999,
+                'level': 9, 'experience': 999, 'grid_width': 99, 'grid_height': 99,
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        updated = Village.objects.get(user=self.user)
+        self.assertEqual(updated.name, 'Gaun')
+        self.assertEqual(
+            [getattr(updated, field) for field in ('knowledge_points', 'books', 'max_energy', 'level',
+                                                   'experience', 'grid_width', 'grid_height')],
+            [village.knowledge_points, 3, village.max_energy, village.level,
+             village.experience, village.grid_width, village.grid_height]
+        )
+        self.assertEqual(list(ResourceTransaction.objects.values_list('resource', 'amount')), [('books', -2)])
+
+    def set_energy(self, energy, seconds_ago, max_energy=100):
+        anchor = timezone.now() - timezone.timedelta(seconds=seconds_ago)
+        Village.objects.filter(user=self.user).update(energy=energy, max_energy=max_energy, energy_updated_at=anchor)
+        return anchor
+
+    @override_settings(VILLAGE_ENERGY_REGEN_SECONDS=60)
+    def test_energy_regeneration_is_capped_at_max_energy(self):
+        self.set_energy(10, seconds_ago=60 * 50, max_energy=40)
+        self.assertEqual(economy.balances(self.user)['energy'], 40)
+
+        economy.grant(self.user, {'energy': 15})
+        self.assertEqual(economy.balances(self.user)['energy'], 40)
+
+    @override_settings(VILLAGE_ENERGY_REGEN_SECONDS=60)
+    def test_energy_change_keeps_partial_regeneration(self):
+        anchor = self.set_energy(10, seconds_ago=150)  # Two points regained, halfway to a third
+
+        economy.spend(self.user, {'energy': 5})
+        village = Village.objects.get(user=self.user)
+        self.assertEqual(village.energy, 7)
+        self.assertEqual(village.energy_updated_at, anchor + timezone.timedelta(seconds=120))
+
+    @override_settings(VILLAGE_ENERGY_REGEN_SECONDS=60)
+    def test_full_energy_resets_the_anchor(self):
+        self.set_energy(95, seconds_ago=150)
+
+        before = timezone.now()
+        economy.grant(self.user, {'energy': 10})
+        village = Village.objects.get(user=self.user)
+        self.assertEqual(village.energy, 100)
+        self.assertGreaterEqual(village.energy_updated_at, before)
+
+    def test_lost_energy_races_are_not_reported_as_insufficient(self):
+        client = api_client(self.user)
+        lose_every_race = mock.patch('django.db.models.query.QuerySet.update', return_value=0)
+
+        with lose_every_race, mock.patch.object(economy, 'ENERGY_CAS_BACKOFF', 0):
+            with self.assertRaises(economy.ResourceContention):
+                economy.grant(self.user, {'energy': 5})
+            response = client.post(
+                '/api/v1/village/resources/update/', {'energy': 5, 'operation': 'add'}, format='json'
+            )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['error']['code'], 'CONFLICT')
+        self.assertFalse(ResourceTransaction.objects.exists())
+
+
+def lose_first_energy_race(attempts):
+    """A stand-in for economy._change_energy whose first compare-and-swap loses."""
+    change_energy = economy._change_energy
+
+    def change(*args):
+        attempts.append(connection.in_atomic_block)
+        if len(attempts) == 1:
+            raise economy.ResourceContention('energy')
+        change_energy(*args)
+    return change
+
+
+class EconomyRetryTests(TransactionTestCase):
+    def setUp(self):
+        self.user, _ = make_villager()
+
+    def test_lost_energy_race_restarts_the_whole_spend(self):
+        attempts, backoffs = [], []
+        with mock.patch.object(economy, '_change_energy', lose_first_energy_race(attempts)), \
+                mock.patch.object(economy.time, 'sleep', lambda _: backoffs.append(connection.in_atomic_block)):
+            economy.spend(self.user, {'coins': 30, 'energy': 5})
+
+        self.assertEqual(attempts, [True, True])
+        # The failed attempt rolled back, releasing its locks, before the backoff
+        self.assertEqual(backoffs, [False])
+        self.assertEqual(economy.balances(self.user)['coins'], 70)
+        self.assertEqual(ResourceTransaction.objects.count(), 2)
+
+    def test_no_backoff_inside_a_callers_transaction(self):
+        attempts = []
+        with mock.patch.object(economy, '_change_energy', lose_first_energy_race(attempts)), \
+                mock.patch.object(economy.time, 'sleep', side_effect=AssertionError('slept holding locks')):
+            with transaction.atomic():
+                economy.spend(self.user, {'coins': 30, 'energy': 5})
+
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(economy.balances(self.user)['coins'], 70)
+
+
+# =============================================================================
+# VILLAGE BUILDINGS
+# =============================================================================
+
+def make_building_type(slug, **fields):
+    return BuildingType.objects.create(
+        name=slug.title(), name_nepali=slug, slug=slug, icon=slug, **fields
+    )
+
+
+class BuildingTypeRegistryTests(FreshCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.hut = make_building_type('hut', coin_cost=30)
+
+    def test_registry_is_cached(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(building_types.get_by_slug('hut'), self.hut)
+        with self.assertNumQueries(0):
+            self.assertEqual(building_types.get_by_slug('hut'), self.hut)
+
+    def test_saves_and_deletes_start_a_new_version(self):
+        building_types.all_types()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hut.coin_cost = 99
+            self.hut.save()
+        self.assertEqual(building_types.get_by_slug('hut').coin_cost, 99)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_building_type('well')
+        self.assertEqual([bt.slug for bt in building_types.active_types()], ['hut', 'well'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BuildingType.objects.filter(slug='hut').delete()
+        self.assertIsNone(building_types.get_by_slug('hut'))
+
+    def test_bulk_updates_call_invalidate(self):
+        building_types.all_types()
+
+        BuildingType.objects.filter(slug='hut').update(coin_cost=99)
+        self.assertEqual(building_types.get_by_slug('hut').coin_cost, 30)
+        with self.captureOnCommitCallbacks(execute=True):
+            building_types.invalidate()
+        self.assertEqual(building_types.get_by_slug('hut').coin_cost, 99)
+
+
+class VillageBuildingTests(FreshCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, self.village = make_villager(coins=500)
+        self.school = make_building_type('school', coin_cost=50, upgrade_time=600)
+        self.client = api_client(self.user)
+
+    def upgrade(self, building, target_level):
+        return self.client.put(
+            f'/api/v1/village/buildings/{building.id}/upgrade/', {'target_level': target_level}, format='json'
+        )
+
+    def test_finished_upgrade_is_completed_on_read(self):
+        building = VillageBuilding.objects.create(village=self.village, building_type=self.school)
+        self.assertEqual(self.upgrade(building, 3).status_code, 200)
+        self.assertEqual(GameState.objects.get(user=self.user).coins, 400)
+
+        building = VillageBuilding.objects.get(id=building.id)
+        self.assertFalse(building.settle())
+        self.assertEqual((building.level, building.upgrade_level), (1, 3))
+
+        later = building.upgrade_complete_at + timezone.timedelta(seconds=1)
+        self.assertTrue(building.settle(later))
+        self.assertEqual((building.level, building.is_upgrading, building.upgrade_level), (3, False, None))
+
+        VillageBuilding.objects.filter(id=building.id).update(upgrade_complete_at=timezone.now())
+        data = self.client.get('/api/v1/village/').json()['data']
+        self.assertEqual([(b['level'], b['is_upgrading']) for b in data['buildings']], [(3, False)])
+
+    def test_upgrade_lost_to_a_concurrent_change_is_refunded(self):
+        building = VillageBuilding.objects.create(village=self.village, building_type=self.school)
+
+        def spend_then_race(*args, **kwargs):
+            economy_spend(*args, **kwargs)
+            VillageBuilding.objects.filter(id=building.id).update(
+                updated_at=timezone.now() + timezone.timedelta(seconds=1)
+            )
+
+        economy_spend = economy.spend
+        with mock.patch.object(economy, 'spend', side_effect=spend_then_race):
+            response = self.upgrade(building, 2)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['error']['code'], 'CONFLICT')
+        self.assertEqual(GameState.objects.get(user=self.user).coins, 500)
+        self.assertFalse(ResourceTransaction.objects.exists())
+
+    def test_village_read_does_not_query_per_building(self):
+        hut = make_building_type('hut')
+
+        def queries_for(count):
+            VillageBuilding.objects.filter(village=self.village).delete()
+            VillageBuilding.objects.bulk_create([
+                VillageBuilding(village=self.village, building_type=building_type, position_x=x)
+                for x, building_type in zip(range(count), [self.school, hut] * count)
+            ])
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get('/api/v1/village/').json()['data']
+            self.assertEqual(len(data['buildings']), count)
+            return len(queries)
+
+        self.assertEqual(queries_for(6), queries_for(2))
+
+
+class VillageGridTests(FreshCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        self.village = Village.objects.create(user=self.user, grid_width=6, grid_height=6)
+        self.hall = make_building_type('hall', size_width=2, size_height=2, max_count=2)
+        self.hut = make_building_type('hut')
+        self.halls = [
+            VillageBuilding.objects.create(village=self.village, building_type=self.hall, position_x=x, position_y=0)
+            for x in (0, 3)
+        ]
+        self.client = api_client(self.user)
+
+    def move(self, building, x, y):
+        return self.client.put(
+            f'/api/v1/village/buildings/{building.id}/move/', {'position': {'x': x, 'y': y}}, format='json'
+        )
+
+    def position(self, building):
+        return tuple(VillageBuilding.objects.filter(id=building.id).values_list('position_x', 'position_y').get())
+
+    def test_placement_checks(self):
+        grid = OccupancyGrid.for_village(self.village)
+
+        self.assertIsNone(grid.check_placement(self.hut, 2, 0))
+        self.assertEqual(grid.check_placement(self.hut, 1, 1), 'Another building occupies that position.')
+        self.assertEqual(grid.check_placement(self.hall, 5, 4), 'Building does not fit inside the village grid.')
+        self.assertEqual(grid.check_placement(self.hall, 0, 3), 'Maximum of 2 Hall buildings reached.')
+        # Overlapping its own footprint is fine when moving, but not another building's
+        self.assertIsNone(grid.check_placement(self.hall, 1, 1, ignore=self.halls[0].id))
+        self.assertIsNotNone(grid.check_placement(self.hall, 2, 0, ignore=self.halls[0].id))
+
+    def test_overlapping_move_is_rejected(self):
+        response = self.move(self.halls[0], 2, 0)
+
+        self.assertEqual(response.json()['error']['code'], 'INVALID_PLACEMENT')
+        self.assertEqual(self.position(self.halls[0]), (0, 0))
+
+    def test_move_onto_own_footprint(self):
+        self.assertEqual(self.move(self.halls[0], 1, 1).status_code, 200)
+        self.assertEqual(self.position(self.halls[0]), (1, 1))
+
+        # The cached grid follows the move under the new layout version
+        self.village.refresh_from_db()
+        grid = cache.get(OccupancyGrid.cache_key(self.village.id, self.village.layout_version))
+        self.assertEqual(grid.footprints[self.halls[0].id][:2], (1, 1))
+        self.assertIsNone(grid.check_placement(self.hut, 0, 0))
+        self.assertEqual(self.move(self.halls[1], 2, 4).status_code, 200)
+
+    def test_stale_layout_version_is_a_conflict(self):
+        load = OccupancyGrid.for_village
+
+        def load_then_race(village):
+            grid = load(village)
+            village_grid.invalidate(village.id)  # Another writer changes the layout
+            return grid
+
+        with mock.patch.object(OccupancyGrid, 'for_village', side_effect=load_then_race):
+            response = self.move(self.halls[0], 0, 3)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.position(self.halls[0]), (0, 0))
+        # The next request loads the grid under the bumped version
+        self.assertEqual(self.move(self.halls[0], 0, 3).status_code, 200)
+
+
+class VillageLayoutTests(FreshCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, self.village = make_villager(grid_width=6, grid_height=6)
+        self.hall = make_building_type('hall', size_width=2, size_height=2, coin_cost=80)
+        self.hut = make_building_type('hut', coin_cost=30)
+        self.halls = [
+            VillageBuilding.objects.create(village=self.village, building_type=self.hall, position_x=x, position_y=0)
+            for x in (0, 3)
+        ]
+        self.client = api_client(self.user)
+
+    def put_layout(self, *buildings):
+        return self.client.put('/api/v1/village/layout/', {'buildings': list(buildings)}, format='json')
+
+    def state(self):
+        return (
+            sorted(VillageBuilding.objects.values_list('id', 'building_type__slug', 'position_x', 'position_y')),
+            GameState.objects.get(user=self.user).coins,
+            Village.objects.get(id=self.village.id).layout_version,
+            ResourceTransaction.objects.count(),
+        )
+
+    def test_layout_adds_moves_and_removes(self):
+        response = self.put_layout(
+            {'id': self.halls[0].id, 'position': {'x': 0, 'y': 4}},
+            {'building_type': 'hut', 'position': {'x': 5, 'y': 5}},
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        self.assertEqual((data['added'], data['moved'], data['removed']), (1, 1, 1))
+
+        buildings, coins, version, _ = self.state()
+        hut_id = VillageBuilding.objects.get(building_type=self.hut).id
+        self.assertEqual(buildings, sorted([(self.halls[0].id, 'hall', 0, 4), (hut_id, 'hut', 5, 5)]))
+        self.assertEqual(coins, 100 + 80 // 2 - 30)
+        self.assertEqual(version, 1)
+        self.assertEqual(
+            sorted(ResourceTransaction.objects.values_list('reason', 'amount')),
+            [('building_add', -30), ('building_remove', 40)]
+        )
+
+        # The cached grid matches the new layout
+        grid = OccupancyGrid.for_village(Village.objects.get(id=self.village.id))
+        self.assertEqual(set(grid.footprints), {self.halls[0].id, hut_id})
+        self.assertIsNone(grid.check_placement(self.hall, 3, 0))
+
+    def test_overlapping_layout_writes_nothing(self):
+        before = self.state()
+
+        response = self.put_layout(
+            {'id': self.halls[0].id, 'position': {'x': 0, 'y': 0}},
+            {'id': self.halls[1].id, 'position': {'x': 1, 'y': 1}},
+            {'building_type': 'hut', 'position': {'x': 5, 'y': 5}},
+        )
+
+        self.assertEqual(response.json()['error']['code'], 'INVALID_PLACEMENT')
+        self.assertEqual(self.state(), before)
+
+    def test_unaffordable_layout_is_rolled_back(self):
+        before = self.state()
+
+        response = self.put_layout(
+            {'id': self.halls[0].id, 'position': {'x': 0, 'y': 3}},
+            {'building_type': 'hall', 'position': {'x': 3, 'y': 3}},
+            {'building_type': 'hall', 'position': {'x': 0, 'y': 0}},
+        )
+
+        self.assertEqual(response.json()['error']['code'], 'INSUFFICIENT_RESOURCES')
+        self.assertEqual(self.state(), before)
+
+
+# =============================================================================
+# LEADERBOARDS AND RANK INDEX
+# =============================================================================
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        rank_index.get_rank_index().clear()
+        self.users = [make_user(f'player{i}') for i in range(4)]
+        with self.captureOnCommitCallbacks(execute=True):
+            for user, level in zip(self.users, [5, 3, 3, 1]):
+                leaderboards.record(user.id, 'level', level, mode='set')
+
+    def tearDown(self):
+        rank_index.get_rank_index().clear()
+
+    def test_top_shares_ranks_between_equal_scores(self):
+        entries = leaderboards.top('level')
+        self.assertEqual([(entry['rank'], entry['score']) for entry in entries], [(1, 5), (2, 3), (2, 3), (4, 1)])
+
+    def test_around_returns_neighbours_in_board_order(self):
+        window = leaderboards.around(self.users[3].id, 'level', size=1)
+        self.assertEqual([entry['score'] for entry in window], [3, 1])
+        self.assertEqual(window[-1]['rank'], 4)
+
+    def test_points_events_feed_periodic_and_all_time_boards(self):
+        user = self.users[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            leaderboards.record_points(user.id, 40, 240)
+            leaderboards.record_points(user.id, 10, 250)
+
+        self.assertEqual(leaderboards.rank_of(user.id, 'points', 'daily'), (1, 50))
+        self.assertEqual(leaderboards.rank_of(user.id, 'points'), (1, 250))
+
+    def test_local_index_syncs_rows_changed_by_other_workers(self):
+        user = self.users[3]
+        self.assertEqual(leaderboards.rank_of(user.id, 'level'), (4, 1))
+
+        # Written by another process, so this index was not told about it
+        leaderboards.board('level').filter(user=user).update(score=9, updated_at=timezone.now())
+        self.assertEqual(leaderboards.rank_of(user.id, 'level'), (4, 1))
+
+        with mock.patch.object(rank_index, 'LOCAL_INDEX_TTL', 0):
+            self.assertEqual(leaderboards.rank_of(user.id, 'level'), (1, 9))
+
+    def test_load_rereads_rows_written_while_loading(self):
+        user = self.users[3]
+        index = rank_index.get_rank_index()
+        load = index.load
+
+        def load_then_write(key, entries, period_end=None):
+            entries = list(entries)
+            # Committed after the snapshot was read; its update found no board to apply to
+            leaderboards.board('level').filter(user=user).update(score=9, updated_at=timezone.now())
+            load(key, entries, period_end)
+
+        with mock.patch.object(index, 'load', load_then_write):
+            self.assertEqual(leaderboards.rank_of(user.id, 'level'), (1, 9))
+
+    def test_rollover_warms_the_user_boards(self):
+        index = rank_index.get_rank_index()
+        index.clear()
+        call_command('rollover_leaderboards', stdout=StringIO())
+
+        for period in leaderboards.PERIODS:
+            self.assertTrue(index.is_loaded(leaderboards.board_key('points', period)))
+        with self.assertNumQueries(0):
+            self.assertEqual(leaderboards.rank_of(self.users[3].id, 'level'), (4, 1))
+
+    def test_local_index_keeps_scores_sorted_through_changes(self):
+        index = rank_index.LocalRankIndex()
+        index.load('board', [(1, 5), (2, 3), (3, 3)])
+        index.apply('board', 3, 4, 'add')
+        index.apply('board', 2, 1, 'max')
+        index.remove_member(1)
+
+        self.assertEqual([index.rank('board', member) for member in (1, 2, 3)], [(0, 0), (2, 3), (1, 7)])
+        self.assertEqual(index.rank_of_score('board', 5), 2)
+
+    def test_deleted_user_leaves_the_index(self):
+        self.assertEqual(leaderboards.rank_of(self.users[3].id, 'level'), (4, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.users[0].delete()
+        self.assertEqual(leaderboards.rank_of(self.users[3].id, 'level'), (3, 1))
+
+    def test_local_index_keeps_a_bounded_number_of_boards(self):
+        index = rank_index.LocalRankIndex(max_boards=2)
+        today = timezone.localdate()
+        index.load('a', [(1, 5)], period_end=today)
+        index.load('b', [(1, 5)], period_end=today)
+        self.assertTrue(index.is_loaded('a'))
+
+        # 'b' is now the least recently used board
+        index.load('c', [(1, 5)], period_end=today)
+        self.assertEqual([key for key in 'abc' if index.is_loaded(key)], ['a', 'c'])
+
+    def test_local_index_drops_boards_of_ended_periods(self):
+        index = rank_index.LocalRankIndex()
+        today = timezone.localdate()
+        index.load('yesterday', [(1, 5)], period_end=today - timezone.timedelta(days=1))
+        index.load('today', [(1, 5)], period_end=today)
+
+        self.assertFalse(index.is_loaded('yesterday'))
+        self.assertEqual(index.rank('today', 1), (1, 5))
+
+    def test_benchmark_uses_a_private_index_and_refuses_live_data(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark_leaderboards', sizes=[50], runs=1, stdout=StringIO())
+
+        shared = rank_index.get_rank_index()
+        leaderboards.rank_of(self.users[0].id, 'level')
+        call_command('benchmark_leaderboards', sizes=[50], runs=1, force=True, stdout=StringIO())
+
+        self.assertIs(rank_index.get_rank_index(), shared)
+        self.assertTrue(shared.is_loaded(leaderboards.board_key('level')))
+        self.assertFalse(shared.is_loaded(leaderboards.board_key('points')))
+        self.assertEqual(User.objects.count(), 4)
+
+    def test_progress_reset_updates_all_time_boards(self):
+        user = self.users[0]
+        GameState.objects.create(user=user, level=5, points=800)
+        client = api_client(user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(
+                '/api/v1/settings/reset-progress/', {'confirmation': 'RESET_MY_PROGRESS'}, format='json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(leaderboards.rank_of(user.id, 'level'), (3, 1))
+        self.assertEqual(leaderboards.rank_of(user.id, 'points')[1], 0)
+
+    def test_invalid_window_size_is_a_validation_error(self):
+        client = api_client(self.users[0])
+
+        response = client.get('/api/v1/stats/leaderboard/?type=level&mode=around&size=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error']['code'], 'VALIDATION_ERROR')
+
+        response = client.get('/api/v1/stats/leaderboard/?type=level&mode=around&size=-1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['data']['leaderboard']), 2)
+
+
+# =============================================================================
+# GAME CATALOG
+# =============================================================================
+
+class GameCatalogTests(FreshCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.games = [
+            make_game(name) for name in ('Alpha', 'Beta')
+        ]
+
+    def listed(self):
+        return [(game['name'], game['is_featured']) for game in game_catalog.snapshot()]
+
+    def test_snapshot_is_cached(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.listed(), [('Alpha', False), ('Beta', False)])
+        with self.assertNumQueries(0):
+            self.listed()
+
+    def test_admin_feature_action_is_seen(self):
+        self.listed()
+        admin = make_admin()
+        self.client.force_login(admin)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/admin/learning_vyakaran/game/', {
+                'action': 'feature_games', '_selected_action': [str(self.games[1].id)]
+            })
+        self.assertEqual(self.listed(), [('Beta', True), ('Alpha', False)])
+
+    def test_saves_and_deletes_start_a_new_version(self):
+        self.listed()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.games[0].is_active = False
+            self.games[0].save()
+        self.assertEqual(self.listed(), [('Beta', False)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.games[1].delete()
+        self.assertEqual(self.listed(), [])
+
+    def test_game_list_queries_do_not_grow_with_games(self):
+        user = make_user()
+        client = api_client(user)
+
+        def queries_for_list():
+            counts = []
+            for _ in range(2):  # Cold, then cached catalog
+                with CaptureQueriesContext(connection) as queries:
+                    games = client.get('/api/v1/games/').json()['data']['games']['results']
+                counts.append(len(queries))
+            self.assertEqual({game['user_high_score'] for game in games}, {70})
+            return counts
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for game in self.games:
+                leaderboards.record(user.id, 'game', 70, game=game)
+        few = queries_for_list()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for name in ('Gamma', 'Delta', 'Epsilon', 'Zeta'):
+                leaderboards.record(user.id, 'game', 70, game=make_game(name))
+        self.assertEqual(queries_for_list(), few)
+        self.assertLess(few[1], few[0])
+
+
+# =============================================================================
+# SCORE VALIDATION
+# =============================================================================
+
+class ScoreValidationTests(FreshCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        GameState.objects.create(user=self.user)
+        self.game = make_game(settings={'max_score': 500})
+        self.client = api_client(self.user)
+
+    def start(self):
+        response = self.client.post(f'/api/v1/games/{self.game.id}/start/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']['sessionId']
+
+    def end(self, session_id, score=100, time_spent=0):
+        return self.client.post(
+            f'/api/v1/games/{self.game.id}/end/',
+            {'session_id': session_id, 'score': score, 'stats': {}, 'time_spent': time_spent},
+            format='json'
+        )
+
+    def assertRejected(self, response, reason):
+        self.assertEqual(response.status_code, 400)
+        error = response.json()['error']
+        self.assertEqual(error['code'], 'SCORE_REJECTED')
+        self.assertIn(reason, error['details']['reasons'])
+
+    def test_session_can_only_be_ended_once(self):
+        session_id = self.start()
+
+        self.assertEqual(self.end(session_id).status_code, 200)
+        self.assertRejected(self.end(session_id), 'Session already ended.')
+        self.assertEqual(GameSession.objects.count(), 1)
+
+    def test_unknown_session_is_rejected(self):
+        self.assertRejected(self.end('8c1f7a3e-1d2b-4c5d-9e6f-0a1b2c3d4e5f'), 'Unknown session.')
+        self.assertFalse(GameSession.objects.exists())
+
+    def test_score_above_game_maximum_is_rejected(self):
+        self.assertRejected(self.end(self.start(), score=900), 'Score exceeds the maximum of 500.')
+
+    def test_rejected_end_leaves_the_session_open(self):
+        session_id = self.start()
+
+        self.assertRejected(self.end(session_id, score=900), 'Score exceeds the maximum of 500.')
+        self.assertIsNone(GameStart.objects.get(id=session_id).ended_at)
+        self.assertEqual(self.end(session_id).status_code, 200)
+
+    def test_claimed_time_beyond_wall_clock_is_flagged(self):
+        response = self.end(self.start(), score=100, time_spent=600)
+
+        self.assertEqual(response.status_code, 200)
+        session = GameSession.objects.get()
+        self.assertTrue(session.flagged)
+        self.assertEqual(session.flag_reasons, ['Claimed time exceeds elapsed time.'])
+
+    def test_prune_starts_removes_abandoned_sessions(self):
+        self.start()
+        later = timezone.now() + timezone.timedelta(seconds=score_validation.START_TIMEOUT + 60)
+
+        self.assertEqual(score_validation.prune_starts(now=later), 1)
+        self.assertFalse(GameStart.objects.exists())
+
+    def test_claiming_a_session_prunes_expired_starts(self):
+        abandoned = self.start()
+        GameStart.objects.filter(id=abandoned).update(
+            started_at=timezone.now() - timezone.timedelta(seconds=score_validation.START_TIMEOUT + 60)
+        )
+
+        self.assertEqual(self.end(self.start()).status_code, 200)
+        self.assertFalse(GameStart.objects.filter(id=abandoned).exists())
+
+
+# =============================================================================
+# GAME SESSION ROLLUPS
+# =============================================================================
+
+class GameStatsTests(TestCase):
+    def setUp(self):
+        self.users = [make_user(f'player{i}') for i in range(2)]
+        self.game = make_game()
+        self.today = timezone.localdate()
+
+    def play(self, user, days_ago, score, flagged=False):
+        """A game session ended `days_ago` days back, folded in as game end does."""
+        session = GameSession.objects.create(
+            user=user, game=self.game, score=score, flagged=flagged, time_spent=score // 10,
+            points_earned=score // 5, coins_earned=score // 20, started_at=timezone.now()
+        )
+        session.ended_at = game_stats.day_start(self.today - timezone.timedelta(days=days_ago)) + timezone.timedelta(hours=12)
+        GameSession.objects.filter(pk=session.pk).update(ended_at=session.ended_at)
+        if not flagged:
+            game_stats.record_session(session)
+        return session
+
+    def rollups(self):
+        return sorted(GameDailyRollup.objects.values_list(
+            'user_id', 'day', 'plays', 'total_score', 'max_score', 'total_time', 'points_earned', 'coins_earned'
+        ))
+
+    def test_compacted_rollups_match_the_sessions(self):
+        for user, score in ((self.users[0], 100), (self.users[0], 300), (self.users[1], 200)):
+            self.play(user, 40, score)
+        self.play(self.users[0], 41, 50)
+        incremental = self.rollups()
+        day = self.today - timezone.timedelta(days=40)
+
+        self.assertEqual(game_stats.compact_day(day), 3)
+        self.assertEqual(self.rollups(), incremental)
+        self.assertIn((self.users[0].pk, day, 2, 400, 300, 40, 80, 20), self.rollups())
+        self.assertEqual(GameSession.objects.count(), 1)
+
+    def test_flagged_sessions_are_left_out_and_deleted(self):
+        self.play(self.users[0], 40, 100)
+        self.play(self.users[0], 40, 5000, flagged=True)
+        self.play(self.users[1], 40, 9000, flagged=True)
+
+        self.assertEqual(game_stats.compact_day(self.today - timezone.timedelta(days=40)), 3)
+        self.assertEqual(
+            list(GameDailyRollup.objects.values_list('user_id', 'plays', 'max_score')),
+            [(self.users[0].pk, 1, 100)]
+        )
+        self.assertFalse(GameSession.objects.exists())
+
+    def test_compacting_again_changes_nothing(self):
+        self.play(self.users[0], 40, 100)
+        day = self.today - timezone.timedelta(days=40)
+        game_stats.compact_day(day)
+        compacted = self.rollups()
+
+        self.assertEqual(game_stats.compact_day(day), 0)
+        call_command('compact_game_sessions', days=30, stdout=StringIO())
+        self.assertEqual(self.rollups(), compacted)
+
+    def test_sessions_inside_the_retention_window_are_kept(self):
+        old = self.play(self.users[0], 31, 100)
+        kept = [self.play(self.users[0], days_ago, 100) for days_ago in (30, 1, 0)]
+        before = self.rollups()
+
+        call_command('compact_game_sessions', days=30, stdout=StringIO())
+        self.assertEqual(set(GameSession.objects.values_list('pk', flat=True)), {session.pk for session in kept})
+        self.assertFalse(GameSession.objects.filter(pk=old.pk).exists())
+        self.assertEqual(self.rollups(), before)
+
+
+# =============================================================================
+# MIGRATIONS
+# =============================================================================
+
+class LeaderboardBackfillTests(MigrationTestCase):
+    migrate_from = '0007_village_layout_version'
+    migrate_to = '0008_leaderboard_materialization'
+
+    def setUpBeforeMigration(self, apps):
+        User = apps.get_model('accounts', 'CustomUser')
+        GameState = apps.get_model('accounts', 'GameState')
+        Game = apps.get_model('learning_vyakaran', 'Game')
+        GameSession = apps.get_model('learning_vyakaran', 'GameSession')
+
+        self.user_id = User.objects.create(username='veteran', email='veteran@example.com').id
+        GameState.objects.create(user_id=self.user_id, points=900, level=4, current_streak=6)
+        game = Game.objects.create(name='Word Match', description='d', game_type='word_match', instructions='i')
+        self.game_id = game.id
+        GameSession.objects.create(
+            user_id=self.user_id, game=game, score=70, points_earned=15, started_at=timezone.now()
+        )
+        # An older, lower score
+        old = GameSession.objects.create(user_id=self.user_id, game=game, score=40, started_at=timezone.now())
+        GameSession.objects.filter(id=old.id).update(ended_at=timezone.now() - timezone.timedelta(days=400))
+
+    def scores(self, **filters):
+        Leaderboard = self.apps.get_model('learning_vyakaran', 'Leaderboard')
+        rows = Leaderboard.objects.filter(user_id=self.user_id, **filters)
+        return dict(rows.values_list('leaderboard_type', 'score'))
+
+    def test_existing_progress_is_on_the_boards(self):
+        self.assertEqual(self.scores(period='all_time', game=None), {'points': 900, 'level': 4, 'streak': 6})
+        for period in ('daily', 'weekly', 'monthly'):
+            self.assertEqual(self.scores(period=period, game=None), {'points': 15})
+
+    def test_existing_high_score_survives(self):
+        for period in ('daily', 'weekly', 'monthly', 'all_time'):
+            self.assertEqual(self.scores(period=period, game=self.game_id), {'game': 70})
+
+        self.tearDown()  # migrate to the latest state to use the views
+        cache.clear()
+        user = User.objects.get(id=self.user_id)
+        client = api_client(user)
+
+        games = client.get('/api/v1/games/').json()['data']['games']['results']
+        self.assertEqual(games[0]['user_high_score'], 70)
+
+        session_id = client.post(f'/api/v1/games/{self.game_id}/start/').json()['data']['sessionId']
+        response = client.post(
+            f'/api/v1/games/{self.game_id}/end/',
+            {'session_id': session_id, 'score': 50, 'stats': {}, 'time_spent': 0}, format='json'
+        )
+        self.assertFalse(response.json()['data']['newHighScore'])
@@ -39,10 +39,12 @@ urlpatterns = [
     # VILLAGE
     # ==========================================================================
     path('village/', views.VillageView.as_view(), name='village'),
+    path('village/layout/', views.VillageLayoutView.as_view(), name='village-layout'),
     path('village/buildings/types/', views.BuildingTypesView.as_view(), name='building-types'),
     path('village/buildings/add/', views.AddBuildingView.as_view(), name='add-building'),
-    path('village/buildings/<uuid:building_id>/upgrade/', views.UpgradeBuildingView.as_view(), name='upgrade-building'),
-    path('village/buildings/<uuid:building_id>/', views.RemoveBuildingView.as_view(), name='remove-building'),
+    path('village/buildings/<int:building_id>/upgrade/', views.UpgradeBuildingView.as_view(), name='upgrade-building'),
+    path('village/buildings/<int:building_id>/move/', views.MoveBuildingView.as_view(), name='move-building'),
+    path('village/buildings/<int:building_id>/', views.RemoveBuildingView.as_view(), name='remove-building'),
     path('village/resources/', views.VillageResourcesView.as_view(), name='village-resources'),
     path('village/resources/update/', views.VillageResourcesView.as_view(), name='village-resources-update'),
 
@@ -5,7 +5,8 @@ Handles lessons, quizzes, gamification, and content APIs.
 
 import uuid
 from django.utils import timezone
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Q, Prefetch
 from rest_framework import status, generics, permissions, viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -17,9 +18,11 @@ from drf_spectacular.utils import extend_schema, OpenApiParameter
 from accounts.utils import success_response, error_response
 from accounts.models import GameState, ActivityLog
 
+from . import economy, building_types, leaderboards, game_stats, game_catalog, score_validation
+from .village_grid import OccupancyGrid, LayoutConflict, invalidate as invalidate_grid
 from .models import (
     Category, Lesson, LessonProgress, Quiz, Question, QuizResult,
-    Village, BuildingType, VillageBuilding,
+    Village, VillageBuilding,
     Quest, QuestProgress,
     Achievement, UserAchievement, Badge, UserBadge,
     WritingPrompt, WritingSubmission,
@@ -33,7 +36,8 @@ from .serializers import (
     QuestionWithAnswerSerializer, SubmitQuizSerializer, QuizResultSerializer,
     QuizResultDetailSerializer, GrammarAssessmentSerializer, VocabularyAssessmentSerializer,
     VillageSerializer, BuildingTypeSerializer, VillageBuildingSerializer,
-    AddBuildingSerializer, UpgradeBuildingSerializer, UpdateResourcesSerializer,
+    AddBuildingSerializer, MoveBuildingSerializer, UpgradeBuildingSerializer, UpdateResourcesSerializer,
+    VillageLayoutSerializer,
     QuestListSerializer, QuestDetailSerializer, QuestProgressSerializer, CompleteQuestSerializer,
     AchievementSerializer, UserAchievementSerializer, BadgeSerializer, UserBadgeSerializer,
     WritingPromptListSerializer, WritingPromptDetailSerializer,
@@ -232,18 +236,20 @@ class CompleteLessonAPIView(APIView):
         
         # Update game state
         game_state, _ = GameState.objects.get_or_create(user=request.user)
-        if str(lesson_id) not in game_state.completed_lessons:
+        first_completion = str(lesson_id) not in game_state.completed_lessons
+        if first_completion:
             game_state.completed_lessons.append(str(lesson_id))
         game_state.add_points(points_earned, f'Completed lesson: {lesson.title}')
-        game_state.coins += coins_earned
+        economy.grant(request.user, {'coins': coins_earned}, reason='lesson_complete',
+                      metadata={'lesson_id': str(lesson_id)})
         game_state.total_time_spent += time_spent
         game_state.update_streak()
-        game_state.save()
+        game_state.save(update_fields=['completed_lessons', 'total_time_spent', 'updated_at'])
         
         ActivityLog.log_activity(
             request.user, 'lesson_complete',
             f'Completed lesson: {lesson.title} with score {score}%',
-            metadata={'lesson_id': str(lesson_id), 'score': score},
+            metadata={'lesson_id': str(lesson_id), 'score': score, 'first_completion': first_completion},
             request=request
         )
         
@@ -506,12 +512,15 @@ class SubmitQuizView(APIView):
         # Update game state
         game_state, _ = GameState.objects.get_or_create(user=request.user)
         game_state.add_points(points_earned, f'Completed quiz: {quiz.title}')
-        game_state.coins += coins_earned
+        economy.grant(request.user, {'coins': coins_earned}, reason='quiz_complete',
+                      metadata={'quiz_id': str(quiz_id)})
         game_state.total_correct_answers += correct_count
         game_state.total_questions_attempted += total_questions
         game_state.total_time_spent += time_spent
         game_state.update_streak()
-        game_state.save()
+        game_state.save(update_fields=[
+            'total_correct_answers', 'total_questions_attempted', 'total_time_spent', 'updated_at'
+        ])
         
         ActivityLog.log_activity(
             request.user, 'quiz_complete',
@@ -618,7 +627,7 @@ class GrammarAssessmentView(APIView):
             game_state.total_correct_answers += 1
             game_state.add_points(points, 'Grammar assessment')
         game_state.total_questions_attempted += 1
-        game_state.save()
+        game_state.save(update_fields=['total_correct_answers', 'total_questions_attempted', 'updated_at'])
         
         return success_response(data={
             'correct': correct,
@@ -663,7 +672,7 @@ class VocabularyAssessmentView(APIView):
             game_state.total_correct_answers += 1
             game_state.add_points(points, 'Vocabulary assessment')
         game_state.total_questions_attempted += 1
-        game_state.save()
+        game_state.save(update_fields=['total_correct_answers', 'total_questions_attempted', 'updated_at'])
         
         return success_response(data={
             'correct': correct,
@@ -677,6 +686,18 @@ class VocabularyAssessmentView(APIView):
 # VILLAGE VIEWS
 # =============================================================================
 
+def get_user_village(user):
+    """
+    Get or create the user's village with everything VillageSerializer reads:
+    the owner's GameState joined in, buildings and their types prefetched.
+    """
+    queryset = Village.objects.select_related('user__game_state').prefetch_related(
+        Prefetch('buildings', queryset=VillageBuilding.objects.select_related('building_type'))
+    )
+    village, _ = queryset.get_or_create(user=user)
+    return village
+
+
 class VillageView(APIView):
     """
     GET /api/v1/village - Get user's village
@@ -690,7 +711,7 @@ class VillageView(APIView):
         tags=["Village"]
     )
     def get(self, request):
-        village, _ = Village.objects.get_or_create(user=request.user)
+        village = get_user_village(request.user)
         return success_response(data=VillageSerializer(village).data)
     
     @extend_schema(
@@ -699,7 +720,7 @@ class VillageView(APIView):
         tags=["Village"]
     )
     def put(self, request):
-        village, _ = Village.objects.get_or_create(user=request.user)
+        village = get_user_village(request.user)
         serializer = VillageSerializer(village, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -712,10 +733,12 @@ class BuildingTypesView(generics.ListAPIView):
     GET /api/v1/village/buildings/types
     Get available building types.
     """
-    queryset = BuildingType.objects.filter(is_active=True)
     serializer_class = BuildingTypeSerializer
     permission_classes = [permissions.IsAuthenticated]
     
+    def get_queryset(self):
+        return building_types.active_types()
+    
     @extend_schema(
         summary="Get Building Types",
         description="Get all available building types",
@@ -746,38 +769,54 @@ class AddBuildingView(APIView):
         
         village, _ = Village.objects.get_or_create(user=request.user)
         
-        try:
-            building_type = BuildingType.objects.get(slug=serializer.validated_data['building_type'])
-        except BuildingType.DoesNotExist:
+        building_type = building_types.get_by_slug(serializer.validated_data['building_type'])
+        if building_type is None:
             return error_response('Building type not found.', code='NOT_FOUND')
         
         # Check requirements
         if village.level < building_type.min_village_level:
             return error_response(f'Village level {building_type.min_village_level} required.')
         
-        if village.coins < building_type.coin_cost:
-            return error_response('Insufficient coins.')
-        
-        # Create building
         position = serializer.validated_data['position']
-        building = VillageBuilding.objects.create(
-            village=village,
-            building_type=building_type,
-            position_x=position.get('x', 0),
-            position_y=position.get('y', 0),
-            level=serializer.validated_data.get('level', 1)
-        )
         
-        # Deduct cost
-        village.coins -= building_type.coin_cost
-        village.knowledge_points -= building_type.knowledge_cost
-        village.save()
+        # Validate bounds, collisions and max_count against the cached grid
+        grid = OccupancyGrid.for_village(village)
+        placement_error = grid.check_placement(building_type, position['x'], position['y'])
+        if placement_error:
+            return error_response(placement_error, code='INVALID_PLACEMENT')
+        
+        # Deduct cost and create building together
+        try:
+            with transaction.atomic():
+                grid.claim()
+                economy.spend(
+                    request.user,
+                    {'coins': building_type.coin_cost, 'knowledge': building_type.knowledge_cost},
+                    reason='building_add',
+                    metadata={'building_type': building_type.slug}
+                )
+                building = VillageBuilding.objects.create(
+                    village=village,
+                    building_type=building_type,
+                    position_x=position['x'],
+                    position_y=position['y'],
+                    level=serializer.validated_data.get('level', 1)
+                )
+        except economy.InsufficientResources as e:
+            return error_response(f'Insufficient {e.resource}.', code='INSUFFICIENT_RESOURCES')
+        except LayoutConflict as e:
+            return error_response(str(e), code='CONFLICT', status_code=status.HTTP_409_CONFLICT)
+        
+        grid.place(building)
+        grid.commit()
+        
+        remaining = economy.balances(request.user)
         
         return success_response(data={
             'building': VillageBuildingSerializer(building).data,
             'remainingResources': {
-                'coins': village.coins,
-                'knowledge': village.knowledge_points
+                'coins': remaining['coins'],
+                'knowledge': remaining['knowledge']
             },
             'success': True
         })
@@ -802,7 +841,7 @@ class UpgradeBuildingView(APIView):
             return error_response('Invalid data', details=serializer.errors)
         
         try:
-            building = VillageBuilding.objects.get(
+            building = VillageBuilding.objects.select_related('building_type').get(
                 id=building_id,
                 village__user=request.user
             )
@@ -810,27 +849,119 @@ class UpgradeBuildingView(APIView):
             return error_response('Building not found.', code='NOT_FOUND')
         
         target_level = serializer.validated_data['target_level']
+        now = timezone.now()
+        building.settle(now)
+        
+        if building.is_upgrading:
+            return error_response('Building is already upgrading.', code='UPGRADE_IN_PROGRESS')
         
         if target_level <= building.level:
             return error_response('Target level must be higher than current level.')
         
         # Calculate upgrade cost (simple formula)
-        upgrade_cost = building.building_type.coin_cost * (target_level - building.level)
+        building_type = building.building_type
+        upgrade_cost = building_type.coin_cost * (target_level - building.level)
+        upgrade_seconds = building_type.upgrade_time * (target_level - building.level)
+        
+        if upgrade_seconds:
+            changes = {
+                'level': building.level,
+                'is_upgrading': True,
+                'upgrade_level': target_level,
+                'upgrade_complete_at': now + timezone.timedelta(seconds=upgrade_seconds),
+            }
+        else:
+            changes = {
+                'level': target_level,
+                'is_upgrading': False,
+                'upgrade_level': None,
+                'upgrade_complete_at': None,
+            }
+        
+        # Perform upgrade; the updated_at guard makes a concurrent change roll back the payment
+        try:
+            with transaction.atomic():
+                economy.spend(
+                    request.user, {'coins': upgrade_cost},
+                    reason='building_upgrade',
+                    metadata={'building_id': building.id, 'target_level': target_level}
+                )
+                upgraded = VillageBuilding.objects.filter(
+                    id=building.id, updated_at=building.updated_at
+                ).update(updated_at=now, **changes)
+                if not upgraded:
+                    transaction.set_rollback(True)
+        except economy.InsufficientResources:
+            return error_response('Insufficient coins for upgrade.', code='INSUFFICIENT_RESOURCES')
+        if not upgraded:
+            return error_response(
+                'Building changed during the upgrade; try again.',
+                code='CONFLICT', status_code=status.HTTP_409_CONFLICT
+            )
+        
+        building.refresh_from_db()
+        
+        return success_response(data={
+            'building': VillageBuildingSerializer(building).data,
+            'remainingResources': {'coins': economy.balances(request.user)['coins']},
+            'success': True
+        })
+
+
+class MoveBuildingView(APIView):
+    """
+    PUT /api/v1/village/buildings/{building_id}/move
+    Move a building to a new position.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @extend_schema(
+        summary="Move Building",
+        description="Move a village building to a new grid position",
+        tags=["Village"],
+        request=MoveBuildingSerializer
+    )
+    def put(self, request, building_id):
+        serializer = MoveBuildingSerializer(data=request.data)
+        if not serializer.is_valid():
+            return error_response('Invalid data', details=serializer.errors)
+        
+        try:
+            building = VillageBuilding.objects.select_related('village', 'building_type').get(
+                id=building_id,
+                village__user=request.user
+            )
+        except VillageBuilding.DoesNotExist:
+            return error_response('Building not found.', code='NOT_FOUND')
         
-        village = building.village
-        if village.coins < upgrade_cost:
-            return error_response('Insufficient coins for upgrade.')
+        position = serializer.validated_data['position']
         
-        # Perform upgrade
-        village.coins -= upgrade_cost
-        village.save()
+        grid = OccupancyGrid.for_village(building.village)
+        placement_error = grid.check_placement(
+            building.building_type, position['x'], position['y'], ignore=building.id
+        )
+        if placement_error:
+            return error_response(placement_error, code='INVALID_PLACEMENT')
         
-        building.level = target_level
-        building.save()
+        try:
+            with transaction.atomic():
+                grid.claim()
+                VillageBuilding.objects.filter(id=building.id).update(
+                    position_x=position['x'],
+                    position_y=position['y'],
+                    updated_at=timezone.now()
+                )
+        except LayoutConflict as e:
+            return error_response(str(e), code='CONFLICT', status_code=status.HTTP_409_CONFLICT)
+        
+        grid.move(building.id, position['x'], position['y'])
+        grid.commit()
+        
+        building.position_x = position['x']
+        building.position_y = position['y']
         
         return success_response(data={
             'building': VillageBuildingSerializer(building).data,
-            'remainingResources': {'coins': village.coins},
             'success': True
         })
 
@@ -849,7 +980,7 @@ class RemoveBuildingView(APIView):
     )
     def delete(self, request, building_id):
         try:
-            building = VillageBuilding.objects.get(
+            building = VillageBuilding.objects.select_related('building_type').get(
                 id=building_id,
                 village__user=request.user
             )
@@ -859,11 +990,16 @@ class RemoveBuildingView(APIView):
         # Calculate refund (50% of original cost)
         refund = building.building_type.coin_cost // 2
         
-        village = building.village
-        village.coins += refund
-        village.save()
-        
-        building.delete()
+        with transaction.atomic():
+            # Only the request that actually deletes the row gets the refund
+            deleted, _ = VillageBuilding.objects.filter(id=building.id).delete()
+            if deleted:
+                invalidate_grid(building.village_id)
+                economy.grant(
+                    request.user, {'coins': refund},
+                    reason='building_remove',
+                    metadata={'building_id': building.id}
+                )
         
         return success_response(data={
             'success': True,
@@ -871,6 +1007,123 @@ class RemoveBuildingView(APIView):
         })
 
 
+class VillageLayoutView(APIView):
+    """
+    PUT /api/v1/village/layout
+    Replace the whole village layout in one request.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @extend_schema(
+        summary="Update Village Layout",
+        description="Submit the full desired building layout. Buildings with an id are moved, "
+                    "new entries are built and charged, and missing buildings are removed "
+                    "with a 50% refund, all in one transaction.",
+        tags=["Village"],
+        request=VillageLayoutSerializer
+    )
+    def put(self, request):
+        serializer = VillageLayoutSerializer(data=request.data)
+        if not serializer.is_valid():
+            return error_response('Invalid data', details=serializer.errors)
+        
+        village, _ = Village.objects.get_or_create(user=request.user)
+        existing = {
+            b.id: b for b in VillageBuilding.objects.filter(village=village).select_related('building_type')
+        }
+        now = timezone.now()
+        
+        # Diff the desired layout against the current buildings
+        planned, to_create, to_move = [], [], []
+        for entry in serializer.validated_data['buildings']:
+            x, y = entry['position']['x'], entry['position']['y']
+            
+            if 'id' in entry:
+                building = existing.pop(entry['id'], None)
+                if building is None:
+                    return error_response(f'Building {entry["id"]} not found.', code='NOT_FOUND')
+                if (building.position_x, building.position_y) != (x, y):
+                    building.position_x, building.position_y = x, y
+                    building.updated_at = now
+                    to_move.append(building)
+            else:
+                building_type = building_types.get_by_slug(entry['building_type'])
+                if building_type is None:
+                    return error_response(f'Building type {entry["building_type"]} not found.', code='NOT_FOUND')
+                if village.level < building_type.min_village_level:
+                    return error_response(f'Village level {building_type.min_village_level} required.')
+                building = VillageBuilding(
+                    village=village, building_type=building_type, position_x=x, position_y=y
+                )
+                to_create.append(building)
+            
+            planned.append(building)
+        to_remove = list(existing.values())
+        
+        # Validate the complete layout on a fresh grid
+        grid = OccupancyGrid.empty(village)
+        for building in planned:
+            placement_error = grid.check_placement(
+                building.building_type, building.position_x, building.position_y
+            )
+            if placement_error:
+                return error_response(placement_error, code='INVALID_PLACEMENT')
+            grid.place(building)
+        
+        costs = {
+            'coins': sum(b.building_type.coin_cost for b in to_create),
+            'knowledge': sum(b.building_type.knowledge_cost for b in to_create),
+        }
+        refund = sum(b.building_type.coin_cost // 2 for b in to_remove)
+        
+        try:
+            with transaction.atomic():
+                grid.claim()
+                # Refunds first, so they can pay for the new buildings
+                economy.grant(
+                    request.user, {'coins': refund},
+                    reason='building_remove',
+                    metadata={'building_ids': [b.id for b in to_remove]}
+                )
+                economy.spend(
+                    request.user, costs,
+                    reason='building_add',
+                    metadata={'building_types': [b.building_type.slug for b in to_create]}
+                )
+                if to_remove:
+                    VillageBuilding.objects.filter(id__in=[b.id for b in to_remove]).delete()
+                if to_move:
+                    VillageBuilding.objects.bulk_update(to_move, ['position_x', 'position_y', 'updated_at'])
+                if to_create:
+                    VillageBuilding.objects.bulk_create(to_create)
+                if 'decorations' in serializer.validated_data:
+                    Village.objects.filter(id=village.id).update(
+                        decorations=serializer.validated_data['decorations'], updated_at=now
+                    )
+        except economy.InsufficientResources as e:
+            return error_response(f'Insufficient {e.resource}.', code='INSUFFICIENT_RESOURCES')
+        except LayoutConflict as e:
+            return error_response(str(e), code='CONFLICT', status_code=status.HTTP_409_CONFLICT)
+        
+        # Re-key the grid now that new buildings have ids, then cache it
+        final_grid = OccupancyGrid.empty(village)
+        final_grid.version = grid.version
+        for building in planned:
+            final_grid.place(building)
+        final_grid.commit()
+        
+        return success_response(data={
+            'buildings': VillageBuildingSerializer(planned, many=True).data,
+            'added': len(to_create),
+            'moved': len(to_move),
+            'removed': len(to_remove),
+            'spentResources': costs,
+            'refundedResources': {'coins': refund},
+            'remainingResources': economy.balances(request.user),
+            'success': True
+        }, message='Village layout updated.')
+
+
 class VillageResourcesView(APIView):
     """
     GET /api/v1/village/resources
@@ -884,13 +1137,8 @@ class VillageResourcesView(APIView):
         tags=["Village"]
     )
     def get(self, request):
-        village, _ = Village.objects.get_or_create(user=request.user)
-        return success_response(data={
-            'coins': village.coins,
-            'knowledge': village.knowledge_points,
-            'books': village.books,
-            'energy': village.energy
-        })
+        Village.objects.get_or_create(user=request.user)
+        return success_response(data=economy.balances(request.user))
     
     @extend_schema(
         summary="Update Village Resources",
@@ -903,42 +1151,27 @@ class VillageResourcesView(APIView):
         if not serializer.is_valid():
             return error_response('Invalid data', details=serializer.errors)
         
-        village, _ = Village.objects.get_or_create(user=request.user)
+        Village.objects.get_or_create(user=request.user)
         operation = serializer.validated_data['operation']
         
-        if 'coins' in serializer.validated_data:
-            if operation == 'add':
-                village.coins += serializer.validated_data['coins']
-            else:
-                village.coins = max(0, village.coins - serializer.validated_data['coins'])
-        
-        if 'knowledge' in serializer.validated_data:
-            if operation == 'add':
-                village.knowledge_points += serializer.validated_data['knowledge']
-            else:
-                village.knowledge_points = max(0, village.knowledge_points - serializer.validated_data['knowledge'])
-        
-        if 'books' in serializer.validated_data:
-            if operation == 'add':
-                village.books += serializer.validated_data['books']
-            else:
-                village.books = max(0, village.books - serializer.validated_data['books'])
+        amounts = {
+            resource: serializer.validated_data[resource]
+            for resource in economy.RESOURCE_FIELDS
+            if resource in serializer.validated_data
+        }
         
-        if 'energy' in serializer.validated_data:
+        try:
             if operation == 'add':
-                village.energy = min(village.max_energy, village.energy + serializer.validated_data['energy'])
+                economy.grant(request.user, amounts, reason='resources_update')
             else:
-                village.energy = max(0, village.energy - serializer.validated_data['energy'])
-        
-        village.save()
+                economy.spend(request.user, amounts, reason='resources_update')
+        except economy.InsufficientResources as e:
+            return error_response(f'Insufficient {e.resource}.', code='INSUFFICIENT_RESOURCES')
+        except economy.ResourceContention as e:
+            return error_response(str(e), code='CONFLICT', status_code=status.HTTP_409_CONFLICT)
         
         return success_response(data={
-            'resources': {
-                'coins': village.coins,
-                'knowledge': village.knowledge_points,
-                'books': village.books,
-                'energy': village.energy
-            },
+            'resources': economy.balances(request.user),
             'success': True
         })
 
@@ -1061,10 +1294,12 @@ class CompleteQuestView(APIView):
         
         # Award rewards
         game_state, _ = GameState.objects.get_or_create(user=request.user)
-        game_state.add_points(quest.points_reward, f'Completed quest: {quest.name}')
-        game_state.coins += quest.coins_reward
-        game_state.experience += quest.experience_reward
-        game_state.save()
+        game_state.add_points(
+            quest.points_reward, f'Completed quest: {quest.name}',
+            experience=quest.points_reward + quest.experience_reward
+        )
+        economy.grant(request.user, {'coins': quest.coins_reward}, reason='quest_complete',
+                      metadata={'quest_id': str(quest_id)})
         
         ActivityLog.log_activity(
             request.user, 'quest_completed',
@@ -1226,8 +1461,8 @@ class ClaimAchievementView(APIView):
         # Award rewards
         game_state, _ = GameState.objects.get_or_create(user=request.user)
         game_state.add_points(achievement.points_reward, f'Achievement: {achievement.name}')
-        game_state.coins += achievement.coins_reward
-        game_state.save()
+        economy.grant(request.user, {'coins': achievement.coins_reward}, reason='achievement_reward',
+                      metadata={'achievement_id': str(achievement.id)})
         
         user_achievement.rewards_claimed = True
         user_achievement.claimed_at = timezone.now()
@@ -1360,8 +1595,8 @@ class SubmitWritingView(APIView):
         # Update game state
         game_state, _ = GameState.objects.get_or_create(user=request.user)
         game_state.add_points(points, 'Writing submission')
-        game_state.coins += coins
-        game_state.save()
+        economy.grant(request.user, {'coins': coins}, reason='writing_submission',
+                      metadata={'submission_id': str(submission.id)})
         
         ActivityLog.log_activity(
             request.user, 'writing_submitted',
@@ -1538,12 +1773,15 @@ class GameListView(generics.ListAPIView):
         tags=["Games"]
     )
     def get(self, request, *args, **kwargs):
-        response = super().get(request, *args, **kwargs)
-        featured = Game.objects.filter(is_active=True, is_featured=True)
+        # Cached catalog plus one query for the caller's high scores
+        games = game_catalog.for_user(leaderboards.best_scores(request.user.id))
+        featured = [game for game in games if game['is_featured']]
+        
+        page = self.paginate_queryset(games)
         
         return success_response(data={
-            'games': response.data,
-            'featured': GameListSerializer(featured, many=True, context={'request': request}).data
+            'games': self.get_paginated_response(page).data if page is not None else games,
+            'featured': featured
         })
 
 
@@ -1579,6 +1817,7 @@ class StartGameView(APIView):
         
         session_id = str(uuid.uuid4())
         start_time = timezone.now()
+        score_validation.remember_start(session_id, request.user, game, start_time)
         
         ActivityLog.log_activity(
             request.user, 'game_played',
@@ -1621,48 +1860,70 @@ class EndGameView(APIView):
         stats = serializer.validated_data['stats']
         time_spent = serializer.validated_data['time_spent']
         
-        # Check for high score
-        previous_best = GameSession.objects.filter(
-            user=request.user, game=game
-        ).order_by('-score').first()
-        
-        is_high_score = previous_best is None or score > previous_best.score
-        
-        # Calculate rewards
-        points_earned = game.base_points + (score // 10)
-        coins_earned = game.base_coins + (score // 20)
-        
-        # Create session record
-        session = GameSession.objects.create(
-            user=request.user,
-            game=game,
-            score=score,
-            high_score=is_high_score,
-            stats=stats,
-            time_spent=time_spent,
-            points_earned=points_earned,
-            coins_earned=coins_earned,
-            started_at=timezone.now() - timezone.timedelta(seconds=time_spent)
+        # Validate the submission before writing anything
+        attempt = score_validation.ScoreAttempt(
+            request.user, game, score, time_spent,
+            stats=stats, session_id=serializer.validated_data['session_id']
         )
+        verdict, reasons = score_validation.validate(attempt)
+        if verdict == score_validation.REJECT:
+            return error_response('Score rejected.', code='SCORE_REJECTED', details={'reasons': reasons})
+        flagged = verdict == score_validation.FLAG
+        
+        # Calculate rewards; flagged scores only earn the base rewards
+        points_earned = game.base_points + (0 if flagged else score // 10)
+        coins_earned = game.base_coins + (0 if flagged else score // 20)
+        
+        with transaction.atomic():
+            # Validation only reads; the session is ended here, once per session
+            if not score_validation.claim_session(attempt):
+                return error_response('Score rejected.', code='SCORE_REJECTED',
+                                      details={'reasons': ['Session already ended.']})
+            
+            # Conditional upsert of the best-score rows; the all-time row only
+            # changes when this beats the previous best
+            is_high_score = False
+            if not flagged:
+                improved = leaderboards.record(request.user.id, 'game', score, game=game)
+                is_high_score = improved['all_time']
+            
+            # Create session record
+            session = GameSession.objects.create(
+                user=request.user,
+                game=game,
+                score=score,
+                high_score=is_high_score,
+                flagged=flagged,
+                flag_reasons=reasons,
+                stats=stats,
+                time_spent=time_spent,
+                points_earned=points_earned,
+                coins_earned=coins_earned,
+                started_at=timezone.now() - timezone.timedelta(seconds=time_spent)
+            )
+            if not flagged:
+                game_stats.record_session(session)
+        
+        score_validation.record_result(attempt, flagged)
         
         # Update game state
         game_state, _ = GameState.objects.get_or_create(user=request.user)
         game_state.add_points(points_earned, f'Game: {game.name}')
-        game_state.coins += coins_earned
+        economy.grant(request.user, {'coins': coins_earned}, reason='game_complete',
+                      metadata={'game_id': str(game.id)})
         game_state.total_time_spent += time_spent
-        game_state.save()
+        game_state.save(update_fields=['total_time_spent', 'updated_at'])
         
         # Get ranking
-        rank = GameSession.objects.filter(
-            game=game, score__gt=score
-        ).values('user').distinct().count() + 1
+        rank, _ = leaderboards.rank_of(request.user.id, 'game', game=game)
         
         return success_response(data={
             'finalScore': score,
             'pointsEarned': points_earned,
             'coinsEarned': coins_earned,
             'newHighScore': is_high_score,
-            'ranking': rank
+            'ranking': rank,
+            'flagged': flagged
         })
 
 
@@ -1679,56 +1940,32 @@ class GameLeaderboardView(APIView):
         tags=["Games"],
         parameters=[
             OpenApiParameter(name='period', description='Time period', enum=['daily', 'weekly', 'monthly', 'all-time']),
-            OpenApiParameter(name='limit', description='Number of entries', type=int),
+            OpenApiParameter(name='limit', description='Number of entries (max 100)', type=int),
+            OpenApiParameter(name='mode', description='Top entries, or the entries around the user', enum=['top', 'around']),
+            OpenApiParameter(name='size', description='Neighbours on each side in around mode (max 50)', type=int),
         ]
     )
     def get(self, request, game_id):
-        period = request.query_params.get('period', 'all-time')
-        limit = int(request.query_params.get('limit', 10))
+        period = leaderboards.normalize_period(request.query_params.get('period'))
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+            size = min(max(int(request.query_params.get('size', 10)), 1), 50)
+        except ValueError:
+            return error_response('Invalid limit or size', code='VALIDATION_ERROR')
         
         try:
             game = Game.objects.get(id=game_id)
         except Game.DoesNotExist:
             return error_response('Game not found.', code='NOT_FOUND')
         
-        # Filter by period
-        sessions = GameSession.objects.filter(game=game)
-        
-        if period == 'daily':
-            sessions = sessions.filter(ended_at__date=timezone.now().date())
-        elif period == 'weekly':
-            week_ago = timezone.now() - timezone.timedelta(days=7)
-            sessions = sessions.filter(ended_at__gte=week_ago)
-        elif period == 'monthly':
-            month_ago = timezone.now() - timezone.timedelta(days=30)
-            sessions = sessions.filter(ended_at__gte=month_ago)
-        
-        # Get top scores per user
-        from django.db.models import Max
-        top_scores = sessions.values('user').annotate(
-            max_score=Max('score')
-        ).order_by('-max_score')[:limit]
-        
-        leaderboard = []
-        for rank, entry in enumerate(top_scores, 1):
-            from django.contrib.auth import get_user_model
-            User = get_user_model()
-            user = User.objects.get(id=entry['user'])
-            leaderboard.append({
-                'rank': rank,
-                'user_id': str(user.id),
-                'username': user.username,
-                'avatar': user.avatar.url if user.avatar else None,
-                'score': entry['max_score']
-            })
+        # Best score per user for the period, read from the materialized board
+        if request.query_params.get('mode') == 'around':
+            leaderboard = leaderboards.around(request.user.id, 'game', period, game=game, size=size)
+        else:
+            leaderboard = leaderboards.top('game', period, game=game, limit=limit)
         
         # Get user's rank
-        user_best = sessions.filter(user=request.user).order_by('-score').first()
-        user_rank = 0
-        user_score = 0
-        if user_best:
-            user_score = user_best.score
-            user_rank = sessions.filter(score__gt=user_score).values('user').distinct().count() + 1
+        user_rank, user_score = leaderboards.rank_of(request.user.id, 'game', period, game=game)
         
         return success_response(data={
             'leaderboard': leaderboard,
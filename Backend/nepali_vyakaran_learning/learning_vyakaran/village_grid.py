@@ -0,0 +1,177 @@
+"""
+Occupancy grid for village building placement.
+
+Each village has a compact occupancy map (one byte per cell, sized
+grid_width * grid_height) plus the footprint of every placed building and a
+count per building type. The grid is rebuilt from VillageBuilding rows in a
+single query and cached under the village's layout_version, so placement,
+bounds and max_count checks run in memory in O(footprint).
+
+Writers bump Village.layout_version with a compare-and-swap in the same
+transaction as the building write. That both serialises concurrent layout
+changes and invalidates every cached copy, including other workers' caches.
+"""
+
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Village, VillageBuilding
+
+
+GRID_CACHE_TIMEOUT = 60 * 60  # 1 hour
+
+
+class LayoutConflict(Exception):
+    """Raised when the village layout changed since the grid was loaded."""
+
+
+class OccupancyGrid:
+    """
+    In-memory occupancy map of a single village.
+    """
+
+    def __init__(self, village_id, width, height, version):
+        self.village_id = village_id
+        self.width = width
+        self.height = height
+        self.version = version
+        self.cells = bytearray(width * height)  # Buildings covering each cell
+        self.footprints = {}  # building id -> (x, y, w, h, building_type_id)
+        self.type_counts = {}  # building_type_id -> count
+
+    # -------------------------------------------------------------------------
+    # Loading & caching
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def cache_key(village_id, version):
+        return f'village_grid:{village_id}:{version}'
+
+    @classmethod
+    def for_village(cls, village):
+        """Return the cached grid for the village, rebuilding it if needed."""
+        grid = cache.get(cls.cache_key(village.id, village.layout_version))
+        if grid is None or (grid.width, grid.height) != (village.grid_width, village.grid_height):
+            grid = cls.build(village)
+            grid.save()
+        return grid
+
+    @classmethod
+    def empty(cls, village):
+        """An empty grid at the village's current version, for planning a layout."""
+        return cls(village.id, village.grid_width, village.grid_height, village.layout_version)
+
+    @classmethod
+    def build(cls, village):
+        """Rebuild the grid from VillageBuilding rows in one query."""
+        grid = cls.empty(village)
+        rows = VillageBuilding.objects.filter(village_id=village.id).values_list(
+            'id', 'position_x', 'position_y', 'building_type_id',
+            'building_type__size_width', 'building_type__size_height'
+        )
+        for building_id, x, y, type_id, w, h in rows:
+            grid._add(building_id, x, y, w, h, type_id)
+        return grid
+
+    def save(self):
+        cache.set(self.cache_key(self.village_id, self.version), self, GRID_CACHE_TIMEOUT)
+
+    # -------------------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------------------
+
+    def _cells(self, x, y, w, h):
+        """Cell indexes covered by a footprint, clipped to the grid."""
+        for row in range(max(0, y), min(self.height, y + h)):
+            offset = row * self.width
+            for col in range(max(0, x), min(self.width, x + w)):
+                yield offset + col
+
+    def in_bounds(self, x, y, w, h):
+        return x >= 0 and y >= 0 and x + w <= self.width and y + h <= self.height
+
+    def is_free(self, x, y, w, h, ignore=None):
+        """Check a footprint is empty, optionally ignoring one building."""
+        own = set()
+        if ignore is not None and ignore in self.footprints:
+            ox, oy, ow, oh, _ = self.footprints[ignore]
+            own = set(self._cells(ox, oy, ow, oh))
+        return all(
+            self.cells[i] == 0 or (i in own and self.cells[i] == 1)
+            for i in self._cells(x, y, w, h)
+        )
+
+    def count(self, building_type_id):
+        return self.type_counts.get(building_type_id, 0)
+
+    def check_placement(self, building_type, x, y, ignore=None):
+        """
+        Validate placing (or moving) a building of `building_type` at (x, y).
+        Returns an error message, or None if the placement is valid.
+        """
+        w, h = building_type.size_width, building_type.size_height
+
+        if not self.in_bounds(x, y, w, h):
+            return 'Building does not fit inside the village grid.'
+
+        if not self.is_free(x, y, w, h, ignore=ignore):
+            return 'Another building occupies that position.'
+
+        if ignore is None and building_type.max_count and self.count(building_type.id) >= building_type.max_count:
+            return f'Maximum of {building_type.max_count} {building_type.name} buildings reached.'
+
+        return None
+
+    # -------------------------------------------------------------------------
+    # Mutations (in memory; call commit() after the database write)
+    # -------------------------------------------------------------------------
+
+    def _add(self, building_id, x, y, w, h, type_id):
+        for i in self._cells(x, y, w, h):
+            self.cells[i] = min(255, self.cells[i] + 1)
+        self.footprints[building_id] = (x, y, w, h, type_id)
+        self.type_counts[type_id] = self.type_counts.get(type_id, 0) + 1
+
+    def place(self, building):
+        bt = building.building_type
+        self._add(building.id, building.position_x, building.position_y, bt.size_width, bt.size_height, bt.id)
+
+    def remove(self, building_id):
+        footprint = self.footprints.pop(building_id, None)
+        if footprint is None:
+            return
+        x, y, w, h, type_id = footprint
+        for i in self._cells(x, y, w, h):
+            if self.cells[i]:
+                self.cells[i] -= 1
+        self.type_counts[type_id] -= 1
+
+    def move(self, building_id, x, y):
+        _, _, w, h, type_id = self.footprints[building_id]
+        self.remove(building_id)
+        self._add(building_id, x, y, w, h, type_id)
+
+    # -------------------------------------------------------------------------
+    # Versioning
+    # -------------------------------------------------------------------------
+
+    def claim(self):
+        """
+        Bump the village's layout_version if nobody else has since this grid
+        was loaded. Call inside the transaction that writes the buildings.
+        """
+        updated = Village.objects.filter(
+            id=self.village_id, layout_version=self.version
+        ).update(layout_version=F('layout_version') + 1)
+        if not updated:
+            raise LayoutConflict('Village layout changed, please retry.')
+        self.version += 1
+
+    def commit(self):
+        """Cache the mutated grid under the claimed version."""
+        self.save()
+
+
+def invalidate(village_id):
+    """Bump layout_version so every cached grid for the village is dropped."""
+    Village.objects.filter(id=village_id).update(layout_version=F('layout_version') + 1)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import os
 from dotenv import load_dotenv
@@ -96,6 +97,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'nepali_vyakaran_learning.wsgi.application'
 
+# Writes activity logs synchronously under test (see test_runner.py)
+TEST_RUNNER = 'nepali_vyakaran_learning.test_runner.TestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
@@ -297,6 +301,75 @@ FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
 # OTP Configuration
 OTP_EXPIRY_MINUTES = 3
 
+# =============================================================================
+# CACHE CONFIGURATION
+# =============================================================================
+
+# Use Redis when configured (shared across workers) and the redis package is
+# installed, otherwise per-process memory
+REDIS_URL = os.getenv('REDIS_URL', '')
+
+if REDIS_URL and find_spec('redis') is not None:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'nepali-vyakaran',
+        }
+    }
+
+# =============================================================================
+# GAMIFICATION CONFIGURATION
+# =============================================================================
+
+# Seconds for a village to regain one point of energy (0 disables regen)
+VILLAGE_ENERGY_REGEN_SECONDS = int(os.getenv('VILLAGE_ENERGY_REGEN_SECONDS', '300'))
+
+# Days of raw game sessions kept before compaction into daily rollups
+GAME_SESSION_RETENTION_DAYS = int(os.getenv('GAME_SESSION_RETENTION_DAYS', '90'))
+
+# Checks run on every submitted game score, in order (see score_validation.py)
+GAME_SCORE_VALIDATORS = [
+    'learning_vyakaran.score_validation.check_submission_rate',
+    'learning_vyakaran.score_validation.check_game_limits',
+    'learning_vyakaran.score_validation.check_score_rate',
+    'learning_vyakaran.score_validation.check_session_timing',
+    'learning_vyakaran.score_validation.check_recent_scores',
+]
+
+# =============================================================================
+# ACTIVITY LOG CONFIGURATION
+# =============================================================================
+
+# Write activity logs from a background thread in batches (see accounts/activity.py).
+# The test runner turns this off so rows are visible right away.
+ACTIVITY_LOG_ASYNC = os.getenv('ACTIVITY_LOG_ASYNC', 'True').lower() == 'true'
+ACTIVITY_LOG_BATCH_SIZE = int(os.getenv('ACTIVITY_LOG_BATCH_SIZE', '200'))
+ACTIVITY_LOG_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_LOG_FLUSH_INTERVAL', '2'))
+
+# Whole months older than this are moved to gzipped archives (see accounts/activity_archive.py)
+ACTIVITY_LOG_RETENTION_DAYS = int(os.getenv('ACTIVITY_LOG_RETENTION_DAYS', '180'))
+ACTIVITY_LOG_ARCHIVE_DIR = os.getenv('ACTIVITY_LOG_ARCHIVE_DIR', str(BASE_DIR / 'archive' / 'activity_log'))
+
+# =============================================================================
+# BACKGROUND JOB CONFIGURATION
+# =============================================================================
+
+# Jobs are stored in the database and run by `manage.py run_jobs` (see accounts/jobs.py).
+# With REDIS_URL set, idle workers are woken through Redis instead of polling.
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '2'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETRY_BACKOFF = int(os.getenv('JOB_RETRY_BACKOFF', '30'))  # seconds, doubled per attempt
+JOB_HEARTBEAT_INTERVAL = int(os.getenv('JOB_HEARTBEAT_INTERVAL', '15'))
+# Running jobs without a heartbeat for this long are retried (their worker died)
+JOB_STALE_AFTER = int(os.getenv('JOB_STALE_AFTER', '300'))
+
 # =============================================================================
 # DRF-SPECTACULAR (API Documentation)
 # =============================================================================
@@ -0,0 +1,22 @@
+"""
+Test runner for the project.
+"""
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    DiscoverRunner that writes activity logs synchronously, so tests see
+    logged rows right away whatever ACTIVITY_LOG_ASYNC the environment sets.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(ACTIVITY_LOG_ASYNC=False)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -922,7 +922,6 @@ class GamificationGenerator:
                     user=user,
                     level=random.randint(1, 5),
                     experience=random.randint(0, 1000),
-                    coins=random.randint(100, 1000),
                     knowledge_points=random.randint(0, 500),
                     books=random.randint(0, 50),
                     energy=random.randint(50, 100)